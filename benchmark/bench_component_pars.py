@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/12 15:02:47
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+Benchmark of retrieving component parameters for many components (`SProvHelper.get_components_info`), against a local rdflib-backed endpoint.
+It compares the single `FILTER (... IN ...)` query with the chunked `VALUES` queries.
+
+Run it from the repository root, with `draid` importable (e.g. installed through `pip install .`). Example:
+
+    python benchmark/bench_component_pars.py -n 10000 --chunk-size 250 500 1000
+'''
+
+import argparse
+import json
+import time
+
+from rdflib import Literal, Namespace, URIRef
+from rdflib.namespace import RDF
+
+from draid import setting
+from draid.sparql_helper import SProvHelper
+from draid.sparql_helper.local_dataset import LocalDataset
+from draid.sparql_helper.sparql_helper import _rdu
+
+from local_endpoint import LocalEndpoint
+
+
+PROV = Namespace('http://www.w3.org/ns/prov#')
+S_PROV = Namespace('http://s-prov/ns/#')
+EX = Namespace('http://example.org/bench/')
+
+GRAPH_ID = URIRef('http://example.org/bench/graph')
+
+
+def build_dataset(n_components: int, n_pars: int) -> LocalDataset:
+    ds = LocalDataset()
+    g = ds.graph(GRAPH_ID)
+    for i in range(n_components):
+        component = EX[f'component{i}']
+        instance = EX[f'instance{i}']
+        invocation = EX[f'invocation{i}']
+        usage = EX[f'usage{i}']
+        par = EX[f'par{i}']
+        g.add((component, RDF.type, S_PROV.Component))
+        g.add((component, S_PROV.functionName, Literal(f'function{i % 10}')))
+        g.add((instance, RDF.type, S_PROV.ComponentInstance))
+        g.add((instance, PROV.actedOnBehalfOf, component))
+        g.add((invocation, PROV.wasAssociatedWith, instance))
+        g.add((invocation, PROV.qualifiedUsage, usage))
+        g.add((usage, RDF.type, PROV.Usage))
+        g.add((usage, PROV.entity, par))
+        g.add((par, RDF.type, S_PROV.ComponentParameters))
+        for j in range(n_pars):
+            g.add((par, EX[f'p{j}'], Literal(f'value{i}-{j}')))
+    return ds
+
+
+def time_filter(helper: SProvHelper, components):
+    start = time.perf_counter()
+    results = helper._q(helper.q.Q(helper.q.F_COMPONENT_PARS_IN(helper.graph, components)))
+    count = len({_rdu(b, 'component') for b in results['results']['bindings']})
+    return time.perf_counter() - start, count
+
+
+def time_values(helper: SProvHelper, components, chunk_size: int, concurrency: int):
+    setting.COMPONENT_CHUNK_SIZE = chunk_size
+    setting.QUERY_CONCURRENCY = concurrency
+    start = time.perf_counter()
+    info = helper.get_components_info(components)
+    return time.perf_counter() - start, len(info)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--components', type=int, default=10000)
+    parser.add_argument('--pars', type=int, default=3, help='Number of parameters per component')
+    parser.add_argument('--chunk-size', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--concurrency', type=int, default=setting.QUERY_CONCURRENCY)
+    parser.add_argument('--with-filter', action='store_true',
+            help='Also run the single FILTER-IN query. This can take very long on large inputs.')
+    args = parser.parse_args()
+
+    report = {'components': args.components, 'pars': args.pars, 'runs': []}
+    ds = build_dataset(args.components, args.pars)
+    with LocalEndpoint(ds) as endpoint:
+        helper = SProvHelper(endpoint.url)
+        helper.set_graph(GRAPH_ID)
+        components = [EX[f'component{i}'] for i in range(args.components)]
+        query_size = len(helper.q.Q(helper.q.F_COMPONENT_PARS_IN(helper.graph, components)))
+        report['filter_query_bytes'] = query_size
+        if args.with_filter:
+            elapsed, count = time_filter(helper, components)
+            report['runs'].append({'mode': 'filter', 'seconds': elapsed, 'components_found': count})
+        for chunk_size in args.chunk_size:
+            elapsed, count = time_values(helper, components, chunk_size, args.concurrency)
+            report['runs'].append({'mode': 'values', 'chunk_size': chunk_size, 'concurrency': args.concurrency, 'seconds': elapsed, 'components_found': count})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/17 15:26:40
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+End-to-end benchmark of the reasoning (`main.propagate_single`) over synthetic S-Prov graphs (see `synthetic.py`), in both the per-batch and the all-in-one (AIO) modes.
+Every case runs in a fresh process, and reports the wall time of every phase (generate, load, recognise, reason; the per-batch mode also splits reason into dispatch and augment) and the peak memory (max RSS) in a JSON report.
+
+Run it from the repository root, with `draid` importable and SWI-Prolog installed. Example:
+
+    python benchmark/bench_propagate.py --shape chain layered -n 1000 10000 --mode batch aio -o report.json
+
+`--no-reason` stops after recognising, e.g. to measure loading alone, or where SWI-Prolog is not available.
+'''
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+
+MODES = ['batch', 'aio']
+
+
+@contextmanager
+def _phase(phases, name):
+    start = time.perf_counter()
+    yield
+    phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / (1024 if sys.platform == 'darwin' else 1)  # Bytes on macOS, KiB elsewhere
+
+
+def run_case(shape: str, n: int, mode: str, width: int, seed: int, reason_phase: bool = True) -> dict:
+    '''
+    Run one case in the current process. The same steps as `main.propagate_single`, timed separately.
+    '''
+    from synthetic import GRAPH_ID, build, inject_rules
+
+    from draid import setting
+    from draid import recognizer as rcg
+    from draid import reason
+    from draid.graph_wrapper import GraphWrapper
+    from draid.sparql_helper import SProvHelper
+
+    phases = {}
+    report = {'shape': shape, 'components': n, 'mode': mode, 'width': width, 'seed': seed}
+    setting.AIO = mode == 'aio'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'prov.trig')
+        with _phase(phases, 'generate'):
+            ds, sources = build(shape, n, width, seed)
+            ds.serialize(filename, format='trig')
+            del ds
+            inject_rules(sources, seed)
+        report['triples_file_bytes'] = os.path.getsize(filename)
+
+        with _phase(phases, 'load'):
+            graph = GraphWrapper.from_sprov(SProvHelper(filename), subgraph=GRAPH_ID)
+
+    with _phase(phases, 'recognise'):
+        rcg.recognise(graph)
+
+    obligations = {}
+    if reason_phase:
+        with _phase(phases, 'reason'):
+            if setting.AIO:
+                augmentations, obs = reason.reason_in_total(graph)
+                obligations.update(obs)
+                graph.apply_augmentation(augmentations)
+            else:
+                with _phase(phases, 'batching'):
+                    batches = graph.component_to_batches()
+                report['batches'] = len(batches)
+                for batch in batches:
+                    with _phase(phases, 'dispatch'):
+                        augmentations, obs = reason.propagate(graph, batch)
+                    obligations.update(obs)
+                    with _phase(phases, 'augment'):
+                        graph.apply_augmentation(augmentations)
+
+    report['phases'] = phases
+    report['seconds'] = sum(v for k, v in phases.items() if k in ('generate', 'load', 'recognise', 'reason'))
+    report['components_with_obligations'] = len(obligations)
+    report['rdf_triples'] = len(graph.rdf_graph)
+    report['max_rss_mb'] = _max_rss_mb()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shape', nargs='+', default=['chain', 'fan-out', 'fan-in', 'layered'])
+    parser.add_argument('-n', '--components', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--width', type=int, default=100, help='The width of the layers (layered only)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-reason', dest='reason', action='store_false', help='Stop after recognising (no Prolog needed)')
+    parser.add_argument('--in-process', action='store_true', help='Run all cases in this process (the memory is then not per case)')
+    parser.add_argument('-o', '--output', help='Write the report to this file (default: stdout)')
+    parser.add_argument('--single', help=argparse.SUPPRESS)  # Used internally to run one case in a child process
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    if args.single:
+        case = json.loads(args.single)
+        print(json.dumps(run_case(**case)))
+        return
+
+    report = {'python': sys.version.split()[0], 'runs': []}
+    for shape in args.shape:
+        for n in args.components:
+            for mode in args.mode:
+                case = {'shape': shape, 'n': n, 'mode': mode, 'width': args.width, 'seed': args.seed, 'reason_phase': args.reason}
+                if args.in_process:
+                    result = run_case(**case)
+                else:
+                    proc = subprocess.run([sys.executable, __file__, '--single', json.dumps(case)], stdout=subprocess.PIPE, text=True)
+                    if proc.returncode:
+                        result = {**case, 'error': f'exit code {proc.returncode}'}
+                    else:
+                        result = json.loads(proc.stdout.strip().splitlines()[-1])
+                print(f"{shape} n={n} {mode}: {result.get('seconds', float('nan')):.2f}s", file=sys.stderr)
+                report['runs'].append(result)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            fd.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
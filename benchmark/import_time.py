@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/15 10:21:44
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+Benchmark of the cold start of DR.Aid: the wall time of fresh Python processes running `draid --help`, or importing the main modules.
+It optionally lists the modules which take the longest to import (from `python -X importtime`).
+
+Run it from the repository root, with `draid` importable. Example:
+
+    python benchmark/import_time.py -r 10 --top 15
+'''
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+TARGETS = {
+        'help': ['-m', 'draid', '--help'],
+        'import draid.__main__': ['-c', 'import draid.__main__'],
+        'import draid.main': ['-c', 'import draid.main'],
+        'import draid.service': ['-c', 'import draid.service'],
+        }
+
+
+def time_run(args, repeats: int):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def top_imports(args, top: int):
+    '''
+    The `top` modules with the largest cumulative import time (in seconds), parsed from `-X importtime`.
+    '''
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(cumulative) / 1e6))
+    entries.sort(key=lambda e: e[1], reverse=True)
+    return [{'module': name, 'seconds': seconds} for name, seconds in entries[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--repeats', type=int, default=5)
+    parser.add_argument('--target', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--top', type=int, default=0, help='Also list the N modules which take the longest to import, for each target')
+    args = parser.parse_args()
+
+    report = {'python': sys.version.split()[0], 'repeats': args.repeats, 'runs': []}
+    baseline = statistics.median(time_run(['-c', 'pass'], args.repeats))
+    report['interpreter_seconds'] = baseline
+    for target in args.target:
+        times = time_run(TARGETS[target], args.repeats)
+        run = {'target': target, 'median_seconds': statistics.median(times), 'min_seconds': min(times)}
+        if args.top:
+            run['top_imports'] = top_imports(TARGETS[target], args.top)
+        report['runs'].append(run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
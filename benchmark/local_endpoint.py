@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/12 14:20:31
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+A minimal SPARQL endpoint backed by an in-memory rdflib `Dataset`, used as a stand-in for a real triple store in the benchmarks.
+It understands the query (and update) operations of the SPARQL 1.1 Protocol through GET and POST (both form-encoded and direct), which is what SPARQLWrapper sends.
+It is not meant to be fast, nor complete, only to be a local and reproducible target.
+'''
+
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from rdflib import Dataset
+
+from draid.sparql_helper.local_dataset import LocalDataset, register_bgp_eval
+
+
+register_bgp_eval()
+
+
+_RESULT_FORMATS = [
+        ('application/n-triples', 'nt'),
+        ('text/turtle', 'turtle'),
+        ('application/turtle', 'turtle'),
+        ('application/rdf+xml', 'xml'),
+        ]
+
+
+def _graph_format(accept: str):
+    for mime, fmt in _RESULT_FORMATS:
+        if mime in accept:
+            return mime, fmt
+    return 'application/rdf+xml', 'xml'
+
+
+def make_handler(dataset: Dataset, lock: threading.Lock):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def _params(self):
+            params = parse_qs(urlparse(self.path).query)
+            if self.command == 'POST':
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8')
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/x-www-form-urlencoded'):
+                    params.update(parse_qs(body))
+                elif content_type.startswith('application/sparql-update'):
+                    params['update'] = [body]
+                else:
+                    params['query'] = [body]
+            return params
+
+        def _reply(self, status, content_type, body: bytes):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self):
+            params = self._params()
+            try:
+                if 'update' in params:
+                    with lock:
+                        dataset.update(params['update'][0])
+                    self._reply(204, 'text/plain', b'')
+                    return
+                with lock:
+                    result = dataset.query(params['query'][0])
+                if result.type in ('CONSTRUCT', 'DESCRIBE'):
+                    mime, fmt = _graph_format(self.headers.get('Accept', ''))
+                    body = result.graph.serialize(format=fmt, encoding='utf-8')
+                    self._reply(200, mime, body)
+                else:
+                    body = result.serialize(format='json')
+                    self._reply(200, 'application/sparql-results+json', body)
+            except Exception as e:
+                self._reply(400, 'text/plain', str(e).encode('utf-8'))
+
+        do_GET = _handle
+        do_POST = _handle
+
+    return Handler
+
+
+class LocalEndpoint:
+    '''
+    Serves `dataset` on `http://127.0.0.1:{port}/sparql` in a background thread. Use as a context manager.
+    Use a `LocalDataset` to have the BGPs ordered dynamically, as a real triple store does.
+    '''
+
+    def __init__(self, dataset: Dataset, port: int = 0):
+        self.dataset = dataset
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(dataset, threading.Lock()))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/sparql"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve RDF files through a local SPARQL endpoint.')
+    parser.add_argument('files', nargs='*', help='RDF files (in a format rdflib can guess) to load into the default graph')
+    parser.add_argument('--port', type=int, default=3030)
+    args = parser.parse_args()
+    ds = LocalDataset(default_union=True)
+    for filename in args.files:
+        ds.parse(filename)
+    with LocalEndpoint(ds, args.port) as endpoint:
+        print(endpoint.url)
+        threading.Event().wait()
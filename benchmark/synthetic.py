@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/17 14:05:12
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+Generator of synthetic S-Prov provenance graphs, for benchmarks. It needs neither dispel4py nor S-ProvFlow: the graph is built directly in the shape S-ProvFlow records (component, instance, invocation, and the data with their generation and usage through named ports), which is what `SProvHelper` turns into the `mine:` dependency graph.
+
+Shapes (`n` is the number of components):
+    chain       c0 -> c1 -> ... -> c(n-1)
+    fan-out     c0 -> c1..c(n-1), through a port each (like `workflow/one-to-multi.py`)
+    fan-in      c1..c(n-1) -> c0, through a port each (like `workflow/multi-to-one.py`)
+    layered     layers of `width` components; every component consumes from 1-3 random components of the previous layer
+
+The source components get random imported rules (the acknowledgement rules of `draid.rule.data_rule`, as used by `random_rule`), injected through `setting.INJECTED_IMPORTED_RULE` by `inject_rules()`.
+
+Run it as a script to write a graph into a TriG file. Example:
+
+    python benchmark/synthetic.py layered -n 10000 --width 100 -o layered.trig
+'''
+
+import argparse
+import random
+
+from rdflib import Dataset, Literal, Namespace, URIRef
+from rdflib.namespace import RDF, XSD
+
+from typing import Dict, List, Tuple
+
+
+PROV = Namespace('http://www.w3.org/ns/prov#')
+PROVONE = Namespace('http://purl.dataone.org/provone/2015/01/15/ontology#')
+S_PROV = Namespace('http://s-prov/ns/#')
+EX = Namespace('http://example.org/synthetic/')
+
+GRAPH_ID = URIRef('http://example.org/synthetic/graph')
+
+SHAPES = ['chain', 'fan-out', 'fan-in', 'layered']
+
+T_EDGE = Tuple[int, str, int, str]  # (producer, output port, consumer, input port)
+
+
+def edges_of(shape: str, n: int, width: int = 10, rng: random.Random = None) -> List[T_EDGE]:
+    rng = rng or random.Random(0)
+    if shape == 'chain':
+        return [(i, 'output', i + 1, 'input') for i in range(n - 1)]
+    if shape == 'fan-out':
+        return [(0, f'output{i}', i, 'input') for i in range(1, n)]
+    if shape == 'fan-in':
+        return [(i, 'output', 0, f'input{i}') for i in range(1, n)]
+    if shape == 'layered':
+        edges = []
+        for i in range(width, n):
+            layer_start = (i // width - 1) * width
+            producers = rng.sample(range(layer_start, layer_start + width), rng.randint(1, min(3, width)))
+            for j, producer in enumerate(producers):
+                edges.append((producer, f'output{i}', i, f'input{j}'))
+        return edges
+    raise ValueError(f"Unknown shape {shape}. Must be one of {SHAPES}")
+
+
+def build(shape: str, n: int, width: int = 10, seed: int = 0) -> Tuple[Dataset, List[URIRef]]:
+    '''
+    Build the provenance graph (in the named graph `GRAPH_ID`). Returns the dataset and the source components (those without inputs).
+    '''
+    rng = random.Random(seed)
+    edges = edges_of(shape, n, width, rng)
+    ds = Dataset()
+    g = ds.graph(GRAPH_ID)
+    g.add((EX.run, RDF.type, S_PROV.WFExecution))
+    g.add((EX.run, PROV.startedAtTime, Literal('2021-07-17T14:00:00', datatype=XSD.dateTime)))
+    g.add((EX.run, S_PROV.username, Literal('bench')))
+
+    consumers = {consumer for _p, _o, consumer, _i in edges}
+    sources = []
+    for i in range(n):
+        component, instance, invocation = EX[f'c{i}'], EX[f'inst{i}'], EX[f'inv{i}']
+        is_source = i not in consumers
+        g.add((component, RDF.type, S_PROV.Component))
+        g.add((component, S_PROV.functionName, Literal('Source' if is_source else f'F{i % 10}')))
+        g.add((instance, RDF.type, S_PROV.ComponentInstance))
+        g.add((instance, PROV.actedOnBehalfOf, component))
+        g.add((invocation, RDF.type, PROV.Activity))
+        g.add((invocation, PROV.wasAssociatedWith, instance))
+        if is_source:
+            sources.append(component)
+
+    for k, (producer, output_port, consumer, input_port) in enumerate(edges):
+        data, generation, usage = EX[f'd{k}'], EX[f'gen{k}'], EX[f'use{k}']
+        g.add((data, PROV.qualifiedGeneration, generation))
+        g.add((generation, PROV.activity, EX[f'inv{producer}']))
+        g.add((generation, PROVONE.hadOutPort, Literal(output_port)))
+        g.add((EX[f'inv{consumer}'], PROV.qualifiedUsage, usage))
+        g.add((usage, PROV.entity, data))
+        g.add((usage, PROVONE.hadInPort, Literal(input_port)))
+    return ds, sources
+
+
+def random_rules(sources: List[URIRef], seed: int = 0) -> Dict[URIRef, Dict[None, str]]:
+    '''
+    A random imported rule for every source component, in the form of `setting.INJECTED_IMPORTED_RULE`.
+    The `Account` rules of `random_rule` are not used, because `Account` is not (any more) in the core ontology.
+    '''
+    from draid.rule.data_rule import rule_acknowledge
+    rng = random.Random(seed)
+    return {source: {None: rule_acknowledge('MySource', str(rng.randint(0, 20)), activate_on_import=rng.random() < 0.5)} for source in sources}
+
+
+def inject_rules(sources: List[URIRef], seed: int = 0) -> None:
+    from draid import setting
+    setting.INJECTED_IMPORTED_RULE = {None: {}, GRAPH_ID: random_rules(sources, seed)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('shape', choices=SHAPES)
+    parser.add_argument('-n', '--components', type=int, default=1000)
+    parser.add_argument('--width', type=int, default=10, help='The width of the layers (layered only)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', required=True, help='The TriG file to write to')
+    args = parser.parse_args()
+
+    ds, _sources = build(args.shape, args.components, args.width, args.seed)
+    ds.serialize(args.output, format='trig')
+
+
+if __name__ == '__main__':
+    main()
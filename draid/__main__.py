@@ -11,18 +11,43 @@
 
 '''
 
-import logging, coloredlogs
-import logging.config
-
-logging.basicConfig()
-coloredlogs.install(level='DEBUG')
+import logging
 logger = logging.getLogger()
 
 import argparse
-import yaml
 
-from draid.main import main
-from draid import setting
+from draid import setting  # Only the (light) settings are imported here. Everything else is imported after the arguments are parsed, so e.g. `--help` is fast.
+
+
+def setup_logging(verbosity: int) -> None:
+    '''
+    Configure logging from `logging.yml` first, and install coloredlogs on top of it (at the level asked by `verbosity`, or DEBUG).
+    '''
+    import coloredlogs
+    import logging.config
+    import yaml
+
+    with open('logging.yml','rt') as f:
+        config=yaml.safe_load(f.read())
+    logging.config.dictConfig(config)
+    logging_level = logging.DEBUG
+    coloredlogs.install(level=logging_level)
+    if verbosity:
+        if verbosity == 1:
+            logging_level = logging.CRITICAL
+        elif verbosity == 2:
+            logging_level = logging.ERROR
+        elif verbosity == 3:
+            logging_level = logging.WARN
+        elif verbosity == 4:
+            logging_level = logging.INFO
+        elif verbosity == 5:
+            logging_level = logging.DEBUG
+        for handler in logging.getLogger().handlers:
+            handler.setLevel(logging_level)
+        logger.setLevel(logging_level)
+        for logger_name in config['loggers']:
+            logging.getLogger(logger_name).setLevel(logging_level)
 
 
 def console_entry():
@@ -37,39 +62,61 @@ def console_entry():
     parser.set_defaults(aio=False)
     parser.add_argument('--rule-db',
             default=','.join(setting.RULE_DB),
-            help='The database where the data rules and flow rules are stored. Use comma to separate multiple values. Every database should be a JSON file. If the file does not exist, it will be ignored.')
+            help='The database where the data rules and flow rules are stored. Use comma to separate multiple values. Every database should be a JSON file, or an (indexed) SQLite database if the name ends with .db, .sqlite or .sqlite3. If the file does not exist, it will be ignored.')
     parser.add_argument('-w', '--write',
             action='store', nargs='?', default=None, const=True,
             help='Write the reasoning results into database. Optionally specifies the location it writes to. The default location is the last rule database.')  # See https://stackoverflow.com/questions/21997933/how-to-make-an-optional-value-for-argument-using-argparse
     parser.add_argument('--obligation-db',
             default=setting.OBLIGATION_DB,
-            help='The obligation database path. If present, the identified obligations will be stored to the database.')
+            help='The obligation database path. If present, the identified obligations will be stored to the database. A path ending with .db, .sqlite or .sqlite3 is an (indexed) SQLite database; with .jsonl an append-only JSON-Lines file; otherwise a JSON file.')
+    parser.add_argument('--stream', action='store_true', dest='stream_ingestion',
+            help='Retrieve the provenance graphs as N-Triples and parse them while they are being received. This reduces the peak memory for large graphs, but the endpoint must support N-Triples.')
+    parser.set_defaults(stream_ingestion=False)
+    parser.add_argument('--bulk-fetch', action='store_true', dest='bulk_fetch',
+            help='(S-Prov only) Retrieve the information of all the graphs in one go, rather than querying each graph separately. Useful when there are many small graphs.')
+    parser.set_defaults(bulk_fetch=False)
+    parser.add_argument('--write-back', action='store_true', dest='write_back',
+            help='Write the augmented graphs (with the rules and activated obligations) back to the RDF store, each into a dedicated named graph. The named graph is replaced if it exists.')
+    parser.set_defaults(write_back=False)
+    parser.add_argument('--ledger',
+            default=setting.LEDGER,
+            help='(S-Prov only) The run ledger path. If present, only the graphs which are new or changed since they were recorded in the ledger are processed, and the processed graphs are recorded.')
+    parser.add_argument('-j', '--jobs', type=int,
+            default=setting.JOBS,
+            help='(S-Prov only) The number of worker processes reasoning over different graphs in parallel.')
+    parser.add_argument('--pipeline', action='store_true',
+            help='(S-Prov only) Fetch the next graphs and write back the previous graphs while reasoning the current graph.')
+    parser.set_defaults(pipeline=False)
+    parser.add_argument('--prefetch', type=int,
+            default=setting.PIPELINE_PREFETCH,
+            help='The number of graphs fetched ahead when using --pipeline.')
+    parser.add_argument('--checkpoint',
+            default=setting.CHECKPOINT,
+            help='The checkpoint path. If present, the progress is recorded there after every batch of components, so an interrupted run can be resumed with --resume. It is removed when the run finishes.')
+    parser.add_argument('--resume', action='store_true',
+            help='Resume the interrupted run from the checkpoint, rather than starting over.')
+    parser.set_defaults(resume=False)
+    parser.add_argument('--draw',
+            action='store', nargs='?', default=None, const=setting.DRAW_FORMAT,
+            help='Draw every reasoned graph into `graph_{i}.<format>` (requires pygraphviz). Optionally specifies the format (any Graphviz output format, e.g. png, svg, pdf); the default is %(const)s.')
+    parser.add_argument('--draw-jobs', type=int,
+            default=setting.DRAW_JOBS,
+            help='The number of background processes drawing the graphs. 0 means drawing in the main process.')
+    parser.add_argument('--draw-cache',
+            default=setting.DRAW_CACHE,
+            help='A directory caching the drawn graphs. Graphs (and rules) which did not change are not laid out again.')
+    parser.add_argument('--draw-dir',
+            default=setting.DRAW_DIR,
+            help='The directory the graphs are drawn into (default: the current directory).')
     parser.add_argument("-v", "--verbosity", action="count", default=0,
             help='Increase the verbosity of messages. Overrides "logging.yml"')
     args = parser.parse_args()
 
-    with open('logging.yml','rt') as f:
-        config=yaml.safe_load(f.read())
-    logging.config.dictConfig(config)
-    if args.verbosity:
-        logging_level = logging.DEBUG
-        if args.verbosity == 1:
-            logging_level = logging.CRITICAL
-        elif args.verbosity == 2:
-            logging_level = logging.ERROR
-        elif args.verbosity == 3:
-            logging_level = logging.WARN
-        elif args.verbosity == 4:
-            logging_level = logging.INFO
-        elif args.verbosity == 5:
-            logging_level = logging.DEBUG
-        for handler in logging.getLogger().handlers:
-            handler.setLevel(logging_level)
-        logger.setLevel(logging_level)
-        for logger_name in config['loggers']:
-            logging.getLogger(logger_name).setLevel(logging_level)
+    setup_logging(args.verbosity)
+
+    from draid.main import main
 
-    main(args.url, args.scheme, args.aio, args.rule_db.split(','), args.write, args.obligation_db)
+    main(args.url, args.scheme, args.aio, args.rule_db.split(','), args.write, args.obligation_db, args.stream_ingestion, args.bulk_fetch, args.write_back, args.ledger, args.jobs, args.draw, args.draw_jobs, args.draw_cache, args.checkpoint, args.resume, args.pipeline, args.prefetch, args.draw_dir)
 
 
 if __name__ == '__main__':
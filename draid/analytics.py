@@ -0,0 +1,174 @@
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/19 14:08:33
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+Analytics over the obligation store (any backend; see `obligation_store.open_store`). The store is loaded once (through the store itself, so the values are as stored, whatever the backend) into two columnar frames (pandas), and the queries are answered with grouped (vectorised) operations on them:
+    obligations     one row per activated obligation: `obligation` (its position in the store), `component`, `action`
+    attributes      one row per attribute of an obligation: `obligation`, `name`, `type`, `value`
+The frames are cached (per store file) until the file changes.
+
+The store does not record when an obligation was activated, so the time windows are taken from a (date-like) attribute of the obligations, e.g. the date in an acknowledgement.
+
+Run it as a script for a quick summary, or to export the frames. Example:
+
+    python -m draid.analytics obligation-db.json --by action
+'''
+
+import os
+
+import pandas as pd
+
+from typing import Dict, Optional, Tuple
+
+from .obligation_store import open_store
+
+
+_frames = {}  # type: Dict[str, Tuple[Tuple[int, ...], pd.DataFrame, pd.DataFrame]]
+
+
+def _signature(filename: str) -> Tuple[int, ...]:
+    '''
+    The modification time and size of the store file, and of the write-ahead log of an SQLite store (`<filename>-wal`) if any, which holds the changes not checkpointed into the file yet.
+    '''
+    signature = ()  # type: Tuple[int, ...]
+    for name in (filename, filename + '-wal'):
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            if name == filename:
+                raise
+            continue
+        signature += (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+
+def _load_store(filename: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    store = open_store(filename)
+    try:
+        ob_list = store.list()
+    finally:
+        store.close()
+    obligations = pd.DataFrame({
+        'obligation': range(len(ob_list)),
+        'component': [str(component) for component, _ob in ob_list],
+        'action': [ob.name for _component, ob in ob_list],
+        })
+    rows = [(i, attr.name, attr.type, attr.value) for i, (_component, ob) in enumerate(ob_list) for attr in ob.attributes]
+    attributes = pd.DataFrame(rows, columns=['obligation', 'name', 'type', 'value'])
+    return obligations, attributes
+
+
+def load_frames(filename: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    '''
+    The frames (`obligations`, `attributes`) of the obligation store in `filename`, cached until the file changes. The frames should not be modified.
+    '''
+    signature = _signature(filename)
+    cached = _frames.get(filename)
+    if cached and cached[0] == signature:
+        return cached[1], cached[2]
+    obligations, attributes = _load_store(filename)
+    obligations['component'] = obligations['component'].astype('category')
+    obligations['action'] = obligations['action'].astype('category')
+    attributes['name'] = attributes['name'].astype('category')
+    attributes['type'] = attributes['type'].astype('category')
+    _frames[filename] = (signature, obligations, attributes)
+    return obligations, attributes
+
+
+class ObligationAnalytics:
+    '''
+    The queries over the obligation store in `filename`. The counts are of (distinct) obligations, sorted in descending order.
+    '''
+
+    def __init__(self, filename: str):
+        self._filename = filename
+
+    @property
+    def obligations(self) -> pd.DataFrame:
+        return load_frames(self._filename)[0]
+
+    @property
+    def attributes(self) -> pd.DataFrame:
+        return load_frames(self._filename)[1]
+
+    def _attributes_of(self, attribute: Optional[str]) -> pd.DataFrame:
+        attributes = self.attributes
+        if attribute is not None:
+            attributes = attributes[attributes['name'] == attribute]
+        return attributes
+
+    def per_action(self) -> pd.Series:
+        return self.obligations['action'].value_counts()
+
+    def per_component(self, action: Optional[str] = None) -> pd.Series:
+        obligations = self.obligations
+        if action is not None:
+            obligations = obligations[obligations['action'] == action]
+        return obligations['component'].value_counts()
+
+    def per_action_and_component(self) -> pd.DataFrame:
+        '''
+        The number of obligations of every action (the columns) for every component (the rows).
+        '''
+        obligations = self.obligations
+        return pd.crosstab(obligations['component'], obligations['action'])
+
+    def per_attribute_value(self, attribute: Optional[str] = None) -> pd.Series:
+        '''
+        The number of obligations with every (attribute name, value), or every value of `attribute` if given.
+        '''
+        attributes = self._attributes_of(attribute)
+        keys = ['value'] if attribute is not None else ['name', 'value']
+        counts = attributes.drop_duplicates(['obligation'] + keys).groupby(keys, observed=True, sort=False).size()
+        return counts.sort_values(ascending=False, kind='stable')
+
+    def per_time_window(self, attribute: str, freq: str = 'D') -> pd.Series:
+        '''
+        The number of obligations in every time window (of the pandas frequency `freq`, e.g. 'D', 'W' or 'MS'; the windows without obligations are included), by the time in their `attribute`. Obligations without (a valid time in) the attribute are not counted.
+        '''
+        attributes = self._attributes_of(attribute)
+        times = pd.to_datetime(attributes['value'], errors='coerce', utc=True, format='mixed')
+        times = times.groupby(attributes['obligation']).min().dropna()  # One time per obligation
+        return pd.Series(1, index=pd.DatetimeIndex(times)).resample(freq).size().rename_axis('window')
+
+    def table(self) -> pd.DataFrame:
+        '''
+        One row for every attribute of every obligation (and one for every obligation without attributes).
+        '''
+        return self.obligations.merge(self.attributes, on='obligation', how='left')
+
+    def export(self, filename: str) -> None:
+        '''
+        Export `table()` to a Parquet file (if `filename` ends with '.parquet'; requires pyarrow or fastparquet) or a CSV file.
+        '''
+        table = self.table()
+        if filename.endswith('.parquet'):
+            table['value'] = table['value'].astype('string')  # Mixed types can't be stored in a Parquet column
+            table.to_parquet(filename, index=False)
+        else:
+            table.to_csv(filename, index=False)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Summarise the obligation store')
+    parser.add_argument('obligation_db', help='The obligation store (JSON, JSON-Lines or SQLite)')
+    parser.add_argument('--by', choices=['action', 'component', 'attribute'], default='action', help='What to count the obligations by')
+    parser.add_argument('--attribute', help='Only count the values of this attribute (with `--by attribute`)')
+    parser.add_argument('--export', help='Also export all obligations to this file (.parquet or .csv)')
+    args = parser.parse_args()
+
+    analytics = ObligationAnalytics(args.obligation_db)
+    if args.by == 'action':
+        print(analytics.per_action().to_string())
+    elif args.by == 'component':
+        print(analytics.per_component().to_string())
+    else:
+        print(analytics.per_attribute_value(args.attribute).to_string())
+    if args.export:
+        analytics.export(args.export)
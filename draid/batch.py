@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/15 16:12:30
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The batch runner. It runs all the jobs listed in a manifest (YAML or JSON) with a global concurrency limit, in worker processes which stay warm across jobs (see `draid.jobs`), and writes the result of every job and a summary.
+
+The manifest is either a list of jobs, or a mapping with the `jobs` list and optional `defaults` (applied to every job). Every job has the fields of `draid.jobs.JobSpec`, and optionally a `name` (default: `job<index>`; not `summary`), which names its result file. Because the jobs run at the same time, no two jobs may write to the same rule DB, obligation store (except the JSON-Lines ones, which can be shared), ledger or `draw_dir` (by default, the graphs of every job are drawn into its own directory under the output directory). Example:
+
+    defaults:
+      rule_db: [rule-db.json]
+    jobs:
+      - name: seismic
+        source: http://127.0.0.1:3030/prov
+        scheme: SPROV
+      - source: runs/run1.ttl
+        scheme: CWLPROV
+'''
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import setting
+from .jobs import JobSpec, init_job_process, run_job
+
+logger = logging.getLogger(__name__)
+
+
+RESERVED_NAMES = {'summary'}  # The names of the files written by the batch itself
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+def _outputs(spec: JobSpec) -> List[Tuple[str, str]]:
+    '''
+    The files the job writes to (besides its result), which can't be shared by concurrent jobs, as pairs of the field and the (absolute) path.
+    '''
+    outputs = []
+    if spec.db_write_to:
+        rule_db = spec.rule_db or setting.RULE_DB
+        outputs.append(('db_write_to', rule_db[-1] if spec.db_write_to is True else spec.db_write_to))
+    if spec.obligation_db and not spec.obligation_db.endswith('.jsonl'):  # The JSON-Lines store is locked when written
+        outputs.append(('obligation_db', spec.obligation_db))
+    if spec.ledger:
+        outputs.append(('ledger', spec.ledger))
+    if spec.draw and spec.draw_dir:
+        outputs.append(('draw_dir', spec.draw_dir))
+    return [(field, os.path.abspath(path)) for field, path in outputs]
+
+
+def load_manifest(filename: str) -> List[Tuple[str, JobSpec]]:
+    '''
+    Read the manifest, and return the (unique) name and the spec of every job. Raises `ValueError` if the manifest (or any job) is not valid.
+    '''
+    import yaml
+    with open(filename) as fd:
+        manifest = yaml.safe_load(fd)  # JSON is also valid YAML
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list):
+        raise ValueError("The manifest must be a list of jobs, or a mapping with the `jobs` list")
+    defaults = manifest.get('defaults') or {}
+    unknown = set(manifest) - {'jobs', 'defaults'}
+    if unknown:
+        raise ValueError("Unknown manifest fields: {}".format(', '.join(sorted(unknown))))
+
+    ret = []
+    names = set()
+    writers = {}  # type: Dict[str, str]  # Output file -> the job writing to it
+    for i, job in enumerate(manifest['jobs']):
+        if not isinstance(job, dict):
+            raise ValueError("Job {}: must be a mapping".format(i))
+        job = {**defaults, **job}
+        name = _safe_name(str(job.pop('name', 'job{}'.format(i))))
+        if name in names:
+            raise ValueError("Job {}: duplicated name `{}`".format(i, name))
+        if name in RESERVED_NAMES:
+            raise ValueError("Job {}: the name `{}` is reserved".format(i, name))
+        names.add(name)
+        try:
+            spec = JobSpec.from_dict(job)
+        except ValueError as e:
+            raise ValueError("Job {} ({}): {}".format(i, name, e)) from e
+        for field, path in _outputs(spec):
+            if path in writers:
+                raise ValueError("Job {} ({}): `{}` {} is also written by job {}".format(i, name, field, path, writers[path]))
+            writers[path] = name
+        ret.append((name, spec))
+    return ret
+
+
+def _timed_run(spec: JobSpec) -> Tuple[Dict[str, Any], float]:
+    start = time.perf_counter()
+    result = run_job(spec)
+    return result, time.perf_counter() - start
+
+
+def _summary_entry(name: str, spec: JobSpec, result: Optional[Dict[str, Any]] = None, seconds: Optional[float] = None, error: Optional[BaseException] = None) -> Dict[str, Any]:
+    entry = {
+            'name': name,
+            'source': spec.source,
+            'scheme': spec.scheme,
+            'status': 'failed' if error else 'done',
+            'seconds': seconds,
+            }
+    if error:
+        entry['error'] = repr(error)
+    elif result is not None:
+        entry['graphs'] = len(result['graphs'])
+        entry['obligations'] = sum(len(graph['obligations']) for graph in result['graphs'])
+    return entry
+
+
+def run_batch(jobs: List[Tuple[str, JobSpec]], output_dir: str, workers: Optional[int] = None, runner: Callable = _timed_run) -> Dict[str, Any]:
+    '''
+    Run the `jobs` in `workers` processes (or in this process if `workers` is 0), writing the result of every job into `output_dir/<name>.json` as soon as it finishes, and the summary into `output_dir/summary.json`. A failing job does not stop the others.
+    The jobs drawing their graphs without a `draw_dir` draw them into `output_dir/<name>/`.
+    Returns the summary.
+    '''
+    workers = setting.BATCH_WORKERS if workers is None else workers
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(name, replace(spec, draw_dir=os.path.join(output_dir, name)) if spec.draw and not spec.draw_dir else spec) for name, spec in jobs]
+    start = time.perf_counter()
+    entries = {}
+
+    def finish(name, spec, get_result):
+        try:
+            result, seconds = get_result()
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %r", name, spec.source, e)
+            entries[name] = _summary_entry(name, spec, error=e)
+            return
+        with open(os.path.join(output_dir, name + '.json'), 'w') as fd:
+            json.dump({'name': name, 'spec': spec.to_dict(), **result}, fd, indent=1)
+        entries[name] = _summary_entry(name, spec, result, seconds)
+        logger.info("Job %s (%s) done in %.2fs", name, spec.source, seconds)
+
+    if workers < 1:
+        for name, spec in jobs:
+            finish(name, spec, lambda: runner(spec))
+    else:
+        context = multiprocessing.get_context('spawn')  # Every worker has its own Prolog engine
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_job_process) as executor:
+            futures = {executor.submit(runner, spec): (name, spec) for name, spec in jobs}
+            for future in as_completed(futures):
+                name, spec = futures[future]
+                finish(name, spec, future.result)
+
+    summary = {
+            'jobs': [entries[name] for name, _spec in jobs],
+            'failed': sum(1 for entry in entries.values() if entry['status'] == 'failed'),
+            'seconds': time.perf_counter() - start,
+            }
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as fd:
+        json.dump(summary, fd, indent=1)
+    return summary
+
+
+def console_entry():
+    import argparse
+    import coloredlogs
+
+    logging.basicConfig()
+    coloredlogs.install(level='INFO')
+
+    parser = argparse.ArgumentParser(description='Run DR.Aid over all the jobs (endpoints, RDF files) listed in a manifest, in warm worker processes.')
+    parser.add_argument('manifest', help='The manifest (YAML or JSON). See `draid/batch.py` for the format.')
+    parser.add_argument('-o', '--output', default='draid-results',
+            help='The directory where the result of every job and the summary (summary.json) are written.')
+    parser.add_argument('--workers', type=int, default=setting.BATCH_WORKERS,
+            help='The number of worker processes, i.e. the maximum number of jobs running at the same time.')
+    args = parser.parse_args()
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except ValueError as e:
+        parser.error(str(e))
+    summary = run_batch(jobs, args.output, args.workers)
+    logger.log(99, "%d jobs finished (%d failed) in %.2fs", len(summary['jobs']), summary['failed'], summary['seconds'])
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    console_entry()
@@ -0,0 +1,135 @@
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/16 09:41:17
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The checkpoint of a propagation run. After every batch (topological level) of every graph, the augmentations applied and the obligations activated in it are appended to the checkpoint file (one JSON line per batch), so a run which died can be resumed from the last completed level rather than from scratch.
+'''
+
+import json
+import logging
+import os
+
+from rdflib import URIRef
+from typing import Dict, List, Optional, Tuple
+
+from draid import setting
+from draid.graph_wrapper import ComponentAugmentation, GraphWrapper
+from draid.obligation_store import _dump_activated_obligation, _load_activated_obligation
+from draid.rule import ActivatedObligation
+from draid.rule.parser import parse_data_rule
+
+logger = logging.getLogger(__name__)
+
+
+VERSION = 1
+
+
+class CheckpointMismatchError(Exception):
+    pass
+
+
+def _header():
+    return {'version': VERSION, 'scheme': setting.SCHEME, 'aio': bool(setting.AIO)}
+
+
+def _line(record) -> str:
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def _graph_key(graph_id: Optional[URIRef]) -> str:
+    return str(graph_id) if graph_id else ''
+
+
+def _dump_augmentations(augmentations: List[ComponentAugmentation]) -> Dict[str, Dict[str, Optional[str]]]:
+    return {str(aug.id): {port: rule.dump() if rule else None for port, rule in aug.rules.items()} for aug in augmentations}
+
+
+def _load_augmentations(d: Dict[str, Dict[str, Optional[str]]]) -> List[ComponentAugmentation]:
+    return [ComponentAugmentation(URIRef(component), {port: parse_data_rule(rule) if rule else None for port, rule in rules.items()}) for component, rules in d.items()]
+
+
+class Checkpoint:
+    '''
+    The checkpoint file. Without `resume`, any existing checkpoint is discarded. With `resume`, the recorded levels are loaded (ignoring a partially written last line), and can be re-applied to the graphs by `restore()`.
+    Raises `CheckpointMismatchError` if resuming a checkpoint made with a different scheme or reasoning mode (`setting.AIO`).
+    '''
+
+    def __init__(self, filename: str, resume: bool = False):
+        self._filename = filename
+        self._levels = {}  # type: Dict[str, List[Dict]]  # The records of every graph, in the order of the levels
+        if resume and os.path.exists(filename) and os.path.getsize(filename):
+            self._load()
+            self._fd = open(filename, 'a')
+        else:
+            self._fd = open(filename, 'w')
+            self._write(_header())
+
+    def _load(self) -> None:
+        with open(self._filename) as fd:
+            lines = fd.read().split('\n')
+        header = json.loads(lines[0])
+        if header != _header():
+            raise CheckpointMismatchError("The checkpoint {} is made with different settings: {}".format(self._filename, header))
+        count = 0
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # The process died when writing it
+                logger.warning("Ignoring the incomplete last record of the checkpoint")
+                break
+            levels = self._levels.setdefault(record['graph'], [])
+            if record['level'] == len(levels):
+                levels.append(record)
+                count += 1
+        logger.info("Loaded %d levels of %d graphs from the checkpoint", count, len(self._levels))
+        with open(self._filename, 'w') as fd:  # Drop the incomplete record, if any
+            fd.write(_line(header))
+            for levels in self._levels.values():
+                for record in levels:
+                    fd.write(_line(record))
+
+    def _write(self, record) -> None:
+        self._fd.write(_line(record))
+        self._fd.flush()
+
+    def completed(self, graph_id: Optional[URIRef]) -> int:
+        '''
+        The number of levels of the graph which have been completed.
+        '''
+        return len(self._levels.get(_graph_key(graph_id), []))
+
+    def restore(self, graph: GraphWrapper) -> Tuple[int, Dict[URIRef, List[ActivatedObligation]]]:
+        '''
+        Apply the recorded augmentations of the completed levels to `graph` (which should have its initial rules applied), and return the number of these levels and the obligations activated in them.
+        '''
+        obligations = {}  # type: Dict[URIRef, List[ActivatedObligation]]
+        levels = self._levels.get(_graph_key(graph.subgraph), [])
+        for record in levels:
+            graph.apply_augmentation(_load_augmentations(record['augmentations']))
+            for component, ob_list in record['obligations'].items():
+                obligations[URIRef(component)] = [_load_activated_obligation(ob) for ob in ob_list]
+        return len(levels), obligations
+
+    def record(self, graph_id: Optional[URIRef], level: int, augmentations: List[ComponentAugmentation], obligations: Dict[URIRef, List[ActivatedObligation]]) -> None:
+        record = {
+                'graph': _graph_key(graph_id),
+                'level': level,
+                'augmentations': _dump_augmentations(augmentations),
+                'obligations': {str(component): [_dump_activated_obligation(ob) for ob in ob_list] for component, ob_list in obligations.items()},
+                }
+        self._write(record)
+
+    def close(self, remove: bool = False) -> None:
+        '''
+        Close the file. If `remove`, the checkpoint is deleted (e.g. when the run finished and the results are stored).
+        '''
+        self._fd.close()
+        if remove:
+            os.remove(self._filename)
@@ -6,11 +6,12 @@ Details about prolog_handle and sparql_handle should be hid by this class.
 import functools
 
 from dataclasses import dataclass
-from networkx import MultiDiGraph
 from pprint import pformat
-from rdflib import Literal, URIRef
-from rdflib.extras.external_graph_libs import rdflib_to_networkx_multidigraph
-from typing import Callable, Dict, Iterable, List, Optional, Union
+from rdflib import URIRef
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Set, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from networkx import MultiDiGraph
 
 import logging
 logger = logging.getLogger(__name__)
@@ -43,7 +44,7 @@ def virtual_port_for_import(component: URIRef, vport_name: Optional[str]) -> str
     return f"{str(component)}#{vport_name}"
 
 
-def graph_into_batches(graph: MultiDiGraph) -> List[List[URIRef]]:
+def graph_into_batches(graph: 'MultiDiGraph') -> List[List[URIRef]]:
     g = graph.copy()
     # for node in nx.algorithms.dag.topological_sort(g):
     ret: List[List[URIRef]] = []
@@ -90,6 +91,8 @@ class GraphWrapper:
 
     def __init__(self, s_helper, subgraph=None, streaming=True):
         self.s_helper = s_helper
+        self._component_graph = None  # type: Optional[MultiDiGraph]
+        self._graph_info = None  # type: Optional[Dict[str, str]]
         self.subgraph = subgraph
         if subgraph:  # Currently only used by SProvHelper
             self.s_helper.set_graph(subgraph)
@@ -259,26 +262,86 @@ class GraphWrapper:
             components_info.append(ComponentInfo(component, function, info_dict))
         return components_info
 
-    def component_to_batches(self) -> List[List[URIRef]]:
-        rdf_component_graph = self.s_helper.get_graph_component()
-        component_graph = rdflib_to_networkx_multidigraph(rdf_component_graph)
-        batches = graph_into_batches(component_graph)
+    def component_graph(self) -> 'MultiDiGraph':
+        '''
+        The graph of components (an edge means the target receives data from the source), including the isolated components. It is retrieved once and kept.
+        '''
+        if self._component_graph is None:
+            from rdflib.extras.external_graph_libs import rdflib_to_networkx_multidigraph  # Imports networkx
+            rdf_component_graph = self.s_helper.get_graph_component()
+            self._component_graph = rdflib_to_networkx_multidigraph(rdf_component_graph)
+            self._component_graph.add_nodes_from(self.components())  # Components not connected to others are not in the query result
+        return self._component_graph
+
+    def component_to_batches(self, components: Optional[Collection[URIRef]]=None) -> List[List[URIRef]]:
+        '''
+        Split the components into batches, where the components of a batch only depend on the components of the previous batches.
+        If `components` is given, only these components are kept in the batches (in the same order), and empty batches are removed.
+        '''
+        batches = graph_into_batches(self.component_graph())
         if not batches:
             batches = [self.components()]
         if self._virtual_process:
             batches.append(self._virtual_process)
+        if components is not None:
+            batches = [[component for component in batch if component in components] for batch in batches]
+            batches = [batch for batch in batches if batch]
         return batches
 
+    def components_consuming(self, data: URIRef) -> List[URIRef]:
+        return [self.component_of_port(port) for port in self.data_to(data)]
+
+    def dirty_components(self, changed: Iterable[URIRef]) -> Set[URIRef]:
+        '''
+        The components affected by the change of the rules of `changed`, i.e. the downstream cone of them.
+        @param changed: The data items whose data rules changed, and the components whose flow rules or imported rules changed.
+        '''
+        import networkx as nx
+        component_graph = self.component_graph()
+        components = set(self.components())
+        roots = set()
+        for node in changed:
+            if node in components:
+                roots.add(node)
+            else:
+                roots.update(self.components_consuming(node))
+        dirty = set(roots)
+        for root in roots:
+            if root in component_graph:
+                dirty.update(nx.descendants(component_graph, root))
+        if dirty and self._virtual_process:  # Virtual processes are attached to the final outputs
+            dirty.update(self._virtual_process)
+        return dirty
+
+    def clear_output_rules(self, component: URIRef) -> None:
+        '''
+        Remove the data rules produced by (the reasoning of) `component`, i.e. on its output ports or their data.
+        '''
+        for out_port in self.output_ports(component):
+            if self._data_streaming:
+                rh.remove_rule(self.rdf_graph, out_port)
+            else:
+                data = self.downstream_data(out_port)
+                if data:
+                    rh.remove_rule(self.rdf_graph, data)
+
     def initial_components(self) -> List[URIRef]:
         return self.component_to_batches()[0]
 
+    def remove_rules(self, nodes: Iterable[URIRef]) -> None:
+        '''
+        Remove the data rules, flow rules and imported rules set on the `nodes` (data items or components).
+        '''
+        for node in nodes:
+            rh.remove_rule(self.rdf_graph, node)
+            rh.remove_flow_rule(self.rdf_graph, node)
+            rh.remove_imported_rule(self.rdf_graph, node)
+
     def set_flow_rules(self, flow_rules: Dict[URIRef, str]) -> None:
-        for component, fr in flow_rules.items():
-            rh.set_flow_rule(self.rdf_graph, component, Literal(fr))
+        rh.set_flow_rules(self.rdf_graph, flow_rules)
 
     def set_data_rules(self, data_rules: Dict[URIRef, DataRuleContainer]) -> None:
-        for node, data_rule in data_rules.items():
-            rh.insert_rule(self.rdf_graph, node, data_rule)
+        rh.insert_rules(self.rdf_graph, data_rules)
 
     def set_imported_rules(self, imported_rules: Dict[URIRef, Dict[str, DataRuleContainer]]) -> None:
         for component, dr_dic in imported_rules.items():
@@ -288,7 +351,15 @@ class GraphWrapper:
                     assert IMPORT_PORT_NAME not in input_ports
                 else:
                     assert port not in input_ports
-            rh.insert_imported_rule(self.rdf_graph, component, dr_dic)
+        rh.insert_imported_rules(self.rdf_graph, imported_rules)
+
+    def set_rules(self, flow_rules: Dict[URIRef, str], imported_rules: Dict[URIRef, Dict[str, DataRuleContainer]], data_rules: Dict[URIRef, DataRuleContainer]) -> None:
+        '''
+        The same as `set_flow_rules`, `set_imported_rules` and `set_data_rules` together.
+        '''
+        self.set_flow_rules(flow_rules)
+        self.set_imported_rules(imported_rules)
+        self.set_data_rules(data_rules)
 
     def get_imported_rules(self, component: URIRef) -> Dict[str, DataRuleContainer]:
         return rh.imported_rule(self.rdf_graph, component)
@@ -392,7 +463,19 @@ class GraphWrapper:
         self.info['purpose'] = purpose
 
     def get_graph_info(self) -> Dict[str, str]:
-        return self.s_helper.get_graph_info()
+        '''
+        The information of the (whole) graph, e.g. the start time. It is retrieved once and kept; every call returns a new copy.
+        '''
+        if self._graph_info is None:
+            self._graph_info = self.s_helper.get_graph_info()
+        return dict(self._graph_info)
+
+    def fetch_all(self) -> None:
+        '''
+        Retrieve now what is otherwise retrieved when first needed by the reasoning (the component graph and the graph information), e.g. to overlap the queries with reasoning other graphs.
+        '''
+        self.component_graph()
+        self.get_graph_info()
 
 
     def apply_augmentation(self, augmentations: List[ComponentAugmentation]) -> None:
@@ -212,18 +212,67 @@ def flow_rule(graph: Graph, component: URIRef) -> Optional[FlowRule]:
     return parser.parse_flow_rule(flow_rule_str)
 
 
+def set_all(graph: Graph, predicate: URIRef, values: Dict[URIRef, Literal]) -> None:
+    '''
+    The same as `graph.set((node, predicate, value))` for every `node: value` in `values`, but the triples are added in bulk.
+    '''
+    for node in values:
+        if (node, predicate, None) in graph:
+            graph.remove((node, predicate, None))
+    graph.addN((node, predicate, value, graph) for node, value in values.items())
+
+
+def insert_imported_rules(graph: Graph, rules: Dict[URIRef, Dict[str, DataRuleContainer]]) -> None:
+    '''
+    The same as `insert_imported_rule` for all components in `rules`, in bulk.
+    '''
+    set_all(graph, NS['mine']['importedRule'], {component: Literal(json.dumps({k: v.dump() for k, v in rule.items()})) for component, rule in rules.items()})
+
+
+def insert_rules(graph: Graph, rules: Dict[URIRef, DataRuleContainer]) -> None:
+    '''
+    The same as `insert_rule` for all nodes in `rules`, in bulk. Every (distinct) rule object is only dumped once.
+    '''
+    dumped = {}  # type: Dict[int, Literal]
+    values = {}
+    for node, rule in rules.items():
+        if id(rule) not in dumped:
+            dumped[id(rule)] = Literal(rule.dump())
+        values[node] = dumped[id(rule)]
+    set_all(graph, NS['mine']['rule'], values)
+
+
+def set_flow_rules(graph: Graph, flow_rules: Dict[URIRef, str]) -> None:
+    '''
+    The same as `set_flow_rule` for all components in `flow_rules`, in bulk.
+    '''
+    set_all(graph, NS['mine']['flowRule'], {component: Literal(fr) for component, fr in flow_rules.items()})
+
+
 def insert_imported_rule(graph: Graph, component: URIRef, rule: Dict[str, DataRuleContainer]) -> None:
     imported_rule_literal_dict = {k: v.dump() for k, v in rule.items()}
     imported_rule_dict_literal = json.dumps(imported_rule_literal_dict)
-    graph.add((component, NS['mine']['importedRule'], Literal(imported_rule_dict_literal)))
+    graph.set((component, NS['mine']['importedRule'], Literal(imported_rule_dict_literal)))
 
 
 def insert_rule(graph: Graph, component: URIRef, rule: DataRuleContainer) -> None:
-    graph.add((component, NS['mine']['rule'], Literal(rule.dump())))
+    graph.set((component, NS['mine']['rule'], Literal(rule.dump())))
 
 
 def set_flow_rule(graph: Graph, component: URIRef, flow_rule: str) -> None:
-    graph.add((component, NS['mine']['flowRule'], flow_rule))
+    graph.set((component, NS['mine']['flowRule'], flow_rule))
+
+
+def remove_imported_rule(graph: Graph, component: URIRef) -> None:
+    graph.remove((component, NS['mine']['importedRule'], None))
+
+
+def remove_rule(graph: Graph, node: URIRef) -> None:
+    graph.remove((node, NS['mine']['rule'], None))
+
+
+def remove_flow_rule(graph: Graph, component: URIRef) -> None:
+    graph.remove((component, NS['mine']['flowRule'], None))
 
 
 def insert_virtual_process(graph: Graph, from_port: URIRef, action: str, via_data: Optional[URIRef]=None) -> URIRef:
@@ -8,15 +8,17 @@
 #
 
 '''
-This module contains the definitions and functions to deal with rule injections. The injection is populated by calling relevant functions in `rule_database_helper`.
+This module contains the definitions and functions to deal with rule injections. The injection is populated by calling relevant functions in `rule_database_helper`, and is looked up through it (because the rule DBs are not loaded into `setting`).
 '''
 
+import logging
+
 from dataclasses import dataclass
 from rdflib import URIRef
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from . import setting
 
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Link:
@@ -27,30 +29,62 @@ class Link:
 
 
 def find_upstream_in_link(to_graph, to_uri):
+    '''
+    The link to `to_uri`, preferring the one specific to `to_graph` over the universal one (without `to_graph`).
+    '''
+    from .rule_database_helper import links_to
     best_match = None
-    for link in setting.LINK:
-        if link.to_uri == to_uri:
-            if link.to_graph:
-                if link.to_graph == to_graph:
-                    best_match = link
-                else:
-                    continue
+    for link in links_to(to_uri):
+        if link.to_graph:
+            if link.to_graph == to_graph:
+                best_match = link
             else:
-                if not best_match:
-                    best_match = link
+                continue
+        else:
+            if not best_match:
+                best_match = link
     return best_match
 
-def get_rule_from_link(to_graph, to_uri):
-    link = find_upstream_in_link(to_graph, to_uri)
-    if link:
-        try:
-            if link.from_graph in setting.INJECTED_DATA_RULE:
-                return setting.INJECTED_DATA_RULE[link.from_graph][link.from_uri]
-        except KeyError:
-            try:
-                return setting.INJECTED_DATA_RULE[None][link.from_uri]
-            except KeyError:
-                pass
-    return None
+_resolved = {}  # type: Dict[Tuple[Optional[URIRef], URIRef], Optional[str]]
 
+def clear_cache():
+    '''
+    Forget the resolved links. Called when the rule DBs are (re-)opened (by `rule_database_helper.init_default`, and in every worker process) or written; call it also after changing `setting.LINK` or `setting.INJECTED_DATA_RULE` otherwise, because the changes are not noticed.
+    '''
+    _resolved.clear()
 
+def _injected_data_rule(graph, uri):
+    from .rule_database_helper import injected_rules
+    for g in (graph, None):
+        rules = injected_rules('data', g, [uri])
+        if uri in rules:
+            return rules[uri]
+    return None
+
+def get_rule_from_link(to_graph, to_uri):
+    '''
+    The (injected) data rule of `to_uri` inherited through links. If the upstream of the link has no rule either, the links to it are followed in turn, until a rule is found (or there are no more links, or a cycle is found). The results are memoised for all the nodes on the way, until `clear_cache` is called.
+    '''
+    key = (to_graph, to_uri)
+    chain = []
+    seen = set()
+    rule = None
+    while True:
+        if key in _resolved:
+            rule = _resolved[key]
+            break
+        if key in seen:
+            logger.warning("Cycle in the links to %s (graph %s)", key[1], key[0])
+            break
+        seen.add(key)
+        chain.append(key)
+        link = find_upstream_in_link(*key)
+        if not link:
+            break
+        rule = _injected_data_rule(link.from_graph, link.from_uri)
+        if rule is not None:
+            break
+        key = (link.from_graph, link.from_uri)
+    for k in chain:
+        _resolved[k] = rule
+    return rule
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/14 09:46:20
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+This module defines the reasoning jobs, as run by the long-running service (`draid.service`).
+A job is the same as one `draid` CLI invocation, and is run in a process which is kept alive (and warm) across jobs: the Prolog engine, the ontology, the rule parsers and the rule DBs are only loaded once in it.
+'''
+
+import copy
+from dataclasses import asdict, dataclass, fields
+import logging
+
+from rdflib import URIRef
+from typing import Any, Dict, List, Optional, Union
+
+from . import setting
+from .obligation_store import _dump_activated_obligation
+from .worker import _init_worker, settings_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMES = ['SPROV', 'CWLPROV']
+
+
+@dataclass
+class JobSpec:
+    '''
+    The description of a job. The fields (except `source`, `draw` and `draw_dir`) have the same meaning as the arguments of `main.main` (and of the CLI).
+    '''
+    source: str  # The SPARQL endpoint, or a local RDF file
+    scheme: str = setting.SCHEME
+    aio: bool = False
+    rule_db: Optional[List[str]] = None
+    db_write_to: Optional[Union[bool, str]] = None
+    obligation_db: Optional[str] = None
+    stream_ingestion: bool = False
+    bulk_fetch: bool = False
+    write_back: bool = False
+    ledger: Optional[str] = None
+    draw: bool = False
+    draw_dir: Optional[str] = None  # Where the graphs are drawn (if `draw`); the current directory by default
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'JobSpec':
+        '''
+        Build the spec from the (JSON) dict `d`. Raises `ValueError` if it is not valid.
+        '''
+        if not isinstance(d, dict):
+            raise ValueError("The job must be a JSON object")
+        known = {f.name for f in fields(cls)}
+        unknown = set(d) - known
+        if unknown:
+            raise ValueError("Unknown fields: {}".format(', '.join(sorted(unknown))))
+        if not isinstance(d.get('source'), str) or not d['source']:
+            raise ValueError("`source` is required")
+        spec = cls(**d)
+        if spec.scheme not in SCHEMES:
+            raise ValueError("`scheme` must be one of {}".format(SCHEMES))
+        if isinstance(spec.rule_db, str):
+            spec.rule_db = spec.rule_db.split(',')
+        return spec
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_base_settings = None  # type: Optional[Dict[str, Any]]
+
+
+def init_job_process() -> None:
+    '''
+    Initialise a process for running jobs: load everything expensive (Prolog, ontology, parsers) now, and keep the pristine settings, which are restored before every job.
+    '''
+    global _base_settings
+    from . import main
+    from .reason import prolog_handle
+    from .rule.proto import obligation
+    from .rule import parser
+    prolog_handle._get_prolog()
+    obligation._load_base()
+    parser.parse_data_rule('begin end')
+    parser.parse_flow_rule('')
+    _base_settings = copy.deepcopy(settings_snapshot())
+    logger.info("Job process ready")
+
+
+def _graph_id(result) -> Optional[str]:
+    graph = getattr(result, 'subgraph', getattr(result, 'graph', None))
+    return str(graph) if graph else None
+
+
+def run_job(spec: JobSpec) -> Dict[str, Any]:
+    '''
+    Run the job, and return a (JSON-serialisable) summary: the graphs processed and the activated obligations of each.
+    The settings are reset before the job, so jobs don't affect each other. The graphs are not drawn unless `spec.draw` is set.
+    '''
+    from .main import main
+
+    if _base_settings is None:
+        init_job_process()
+    assert _base_settings is not None
+    _init_worker(copy.deepcopy(_base_settings))
+    setting.JOBS = 1
+
+    results, activated_obligations = main(spec.source, scheme=spec.scheme, aio=spec.aio, rule_db=spec.rule_db, db_write_to=spec.db_write_to, obligation_db=spec.obligation_db,
+            stream_ingestion=spec.stream_ingestion, bulk_fetch=spec.bulk_fetch, write_back=spec.write_back, ledger=spec.ledger, draw_graphs=spec.draw, draw_dir=spec.draw_dir)
+
+    graphs = []
+    for result, obligations in zip(results, activated_obligations):
+        graphs.append({
+            'graph': _graph_id(result),
+            'obligations': [(str(component), _dump_activated_obligation(ob)) for component, ob_list in obligations.items() for ob in ob_list],
+            })
+    return {'graphs': graphs}
@@ -10,136 +10,258 @@
 The main entry of the DRAid system. It can be used by a __main__.py, a Jupyter notebook, or anything similar.
 '''
 
-import json
-
-from rdflib.extras.external_graph_libs import rdflib_to_networkx_multidigraph
-
 from . import recognizer as rcg
 from . import reason as reason
 from . import setting as setting
 from . import sparql_helper as sh
 from . import graph_wrapper as gw
 from . import rule_database_helper as rdbh
-from .obligation_store import ObligationStore
+from .run_ledger import RunLedger
+from .checkpoint import Checkpoint
+from .sinks import default_sinks, put_all
+from . import worker
 
 import logging
 logger = logging.getLogger()
 
 
-def main(service, scheme=None, aio=None, rule_db=None, db_write_to=None, obligation_db=None):
+def main(service, scheme=None, aio=None, rule_db=None, db_write_to=None, obligation_db=None, stream_ingestion=None, bulk_fetch=None, write_back=None, ledger=None, jobs=None, draw_graphs=None, draw_jobs=None, draw_cache=None, checkpoint=None, resume=None, pipeline=None, prefetch=None, draw_dir=None):
+    '''
+    Run the whole process on `service` (a SPARQL endpoint, or a local RDF file), with the settings overridden by the arguments. `draw_graphs` can also be the format to draw in. Returns the results (`worker.GraphResult`s) and the activated obligations of each graph.
+    The outputs of every graph (rule DB, obligation store, write-back, drawing; see `sinks`) are handled as soon as the graph is reasoned, and the graph itself is not kept.
+    '''
     if scheme: setting.SCHEME = scheme
     if aio: setting.AIO = aio
     if rule_db: setting.RULE_DB = rule_db
     if db_write_to: setting.DB_WRITE_TO = db_write_to
     if obligation_db: setting.OBLIGATION_DB = obligation_db
+    if stream_ingestion: setting.STREAM_INGESTION = stream_ingestion
+    if bulk_fetch: setting.BULK_FETCH = bulk_fetch
+    if write_back: setting.WRITE_BACK = write_back
+    if ledger: setting.LEDGER = ledger
+    if jobs: setting.JOBS = jobs
+    if draw_graphs: setting.DRAW = True
+    if isinstance(draw_graphs, str): setting.DRAW_FORMAT = draw_graphs
+    if draw_jobs is not None: setting.DRAW_JOBS = draw_jobs
+    if draw_cache: setting.DRAW_CACHE = draw_cache
+    if draw_dir: setting.DRAW_DIR = draw_dir
+    if checkpoint: setting.CHECKPOINT = checkpoint
+    if resume: setting.RESUME = resume
+    if pipeline: setting.PIPELINE = pipeline
+    if prefetch: setting.PIPELINE_PREFETCH = prefetch
 
     rdbh.init_default()
 
     logger.log(99, "Start")
 
-    if setting.SCHEME == 'CWLPROV':
-        results, activated_obligations = propagate_all_cwl(service)
-    elif setting.SCHEME == 'SPROV':
-        results, activated_obligations = propagate_all_sprov(service)
+    run_ledger = RunLedger(setting.LEDGER) if setting.LEDGER else None
 
-    if setting.DB_WRITE_TO:
-        for graph_wrapper in results:
-            rdbh.update_db_default(graph_wrapper)
+    parallel = setting.SCHEME == 'SPROV' and setting.JOBS > 1
+    if parallel and worker.injected_functions():
+        logger.warning("Injected rules given as functions can't be sent to worker processes. Reasoning in this process.")
+        parallel = False
+    pipelined = setting.SCHEME == 'SPROV' and setting.PIPELINE and not parallel
 
-    if setting.OBLIGATION_DB:
-        store = ObligationStore(setting.OBLIGATION_DB)
-        for activated_obligation_ret in activated_obligations:
-            store.insert(activated_obligation_ret)
-        store.write()
+    run_checkpoint = None
+    if setting.CHECKPOINT:
+        if parallel:
+            logger.warning("Checkpoints are not supported when running in parallel. Ignored.")
+        else:
+            run_checkpoint = Checkpoint(setting.CHECKPOINT, resume=setting.RESUME)
 
-    draw(results, activated_obligations)
+    if setting.SCHEME == 'CWLPROV':
+        if run_ledger:
+            logger.warning("The run ledger is only supported for S-Prov. Ignored.")
+            run_ledger = None
+        stream = iter_cwl(service, checkpoint=run_checkpoint)
+    elif parallel:
+        stream = worker.iter_sprov_parallel(service, setting.JOBS, ledger=run_ledger)
+    elif pipelined:
+        stream = None
+    elif setting.SCHEME == 'SPROV':
+        stream = iter_sprov(service, ledger=run_ledger, checkpoint=run_checkpoint)
+
+    sinks = default_sinks(service, parallel)
+    results = []
+    try:
+        if pipelined:
+            from .pipeline import pipeline_sprov
+            results = pipeline_sprov(service, sinks, ledger=run_ledger, checkpoint=run_checkpoint)
+        else:
+            for i, item in enumerate(stream):
+                if parallel:
+                    result, graph_wrapper = item, None
+                else:
+                    graph_wrapper, obligations = item
+                    result = worker.GraphResult.of(graph_wrapper, obligations)
+                put_all(sinks, i, result, graph_wrapper)
+                results.append(result)
+                del graph_wrapper, item  # Release the graph before reasoning the next one
+    finally:
+        for sink in sinks:
+            sink.close()
+
+    if run_ledger:
+        run_ledger.write()
+
+    if run_checkpoint:  # Everything is stored now
+        run_checkpoint.close(remove=True)
+
+    activated_obligations = [result.obligations for result in results]
+    return results, activated_obligations
 
 
-def propagate_single(graph_wrapper):
+def propagate_single(graph_wrapper, checkpoint=None):
+    '''
+    @param checkpoint: If given (a `Checkpoint`), every completed batch (the whole graph if `setting.AIO`) is recorded into it, and the batches already recorded there are restored rather than reasoned again.
+    '''
     obligations = {}
 
-    rcg.apply_flow_rules(graph_wrapper)
-    rcg.apply_imported_rules(graph_wrapper)
-    rcg.apply_data_rules(graph_wrapper)
+    rcg.recognise(graph_wrapper)
 
     logger.log(99, "Finished Initialization")
 
-    if setting.AIO:
-        augmentations, obs = reason.reason_in_total(graph_wrapper)
+    done = 0
+    if checkpoint:
+        done, obs = checkpoint.restore(graph_wrapper)
         obligations.update(obs)
-        graph_wrapper.apply_augmentation(augmentations)
+        if done:
+            logger.info("Resumed %d levels of graph %s from the checkpoint", done, graph_wrapper.subgraph)
+
+    if setting.AIO:
+        if not done:
+            augmentations, obs = reason.reason_in_total(graph_wrapper)
+            obligations.update(obs)
+            graph_wrapper.apply_augmentation(augmentations)
+            if checkpoint:
+                checkpoint.record(graph_wrapper.subgraph, 0, augmentations, obs)
     else:
         batches = graph_wrapper.component_to_batches()
         length = sum(len(batch) for batch in batches)
         logger.debug('total number of nodes in batches: %d', length)
-        for i, batch in enumerate(batches):
+        for i, batch in enumerate(batches[done:], done):
             logger.debug("batch %d: %s", i, batch)
             augmentations, obs = reason.propagate(graph_wrapper, batch)
             logger.debug('augmentations: %s', augmentations)
             obligations.update(obs)
             graph_wrapper.apply_augmentation(augmentations)
+            if checkpoint:
+                checkpoint.record(graph_wrapper.subgraph, i, augmentations, obs)
 
     return graph_wrapper, obligations
 
 
-def propagate_all_sprov(service, write_back=True):
-    s_helper = sh.SProvHelper(service)
+def propagate_incremental(graph_wrapper, obligations, changed_data=(), changed_components=()):
+    '''
+    Update the reasoning results of `graph_wrapper` (with the activated `obligations`, both from `propagate_single`) after the rules of some data and/or components changed, e.g. after reloading the rule DB.
+    Only the downstream of the changed ones is reasoned again (see `reason.propagate_incremental`). This always works batch by batch, regardless of `setting.AIO`.
+    @param changed_data: The data whose data rules changed.
+    @param changed_components: The components whose flow rules or imported rules changed.
+    '''
+    changed_data = list(changed_data)
+    changed_components = list(changed_components)
+    graph_wrapper.remove_rules(changed_data + changed_components)
+
+    rcg.recognise(graph_wrapper, components=changed_components, data=changed_data)
+
+    dirty, obs = reason.propagate_incremental(graph_wrapper, changed_data + changed_components)
+    obligations = {component: ob_list for component, ob_list in obligations.items() if component not in dirty}
+    obligations.update(obs)
 
+    return graph_wrapper, obligations
+
+
+def pending_sprov_graphs(s_helper, ledger=None):
+    '''
+    The graphs to process, and their summaries (only if `ledger` is given; see `SProvHelper.get_graphs_summary`).
+    '''
     graphs = list(s_helper.get_wfe_graphs())
     assert graphs
 
-    results = []
-    activated_obligations = []
-    for i, graph in enumerate(graphs):
-        graph_wrapper = gw.GraphWrapper.from_sprov(s_helper, subgraph=graph)
+    summaries = {}
+    if ledger:
+        summaries = s_helper.get_graphs_summary()
+        graphs = ledger.pending(graphs, summaries)
+    return graphs, summaries
 
-        graph_wrapper, obligations = propagate_single(graph_wrapper)
 
-        if write_back:
-            a_helper = sh.AugmentedGraphHelper(service)
-            a_helper.write_transformed_graph(graph_wrapper)
+def iter_sprov(service, ledger=None, checkpoint=None):
+    '''
+    Reason over the S-Prov graphs one by one, yielding the reasoned graph (`GraphWrapper`) and the activated obligations of each as soon as it is finished.
+    @param ledger: If given, only the graphs which are new or changed according to the `RunLedger` are processed, and they are recorded into it (without writing the ledger) after the consumer has handled them.
+    @param checkpoint: See `propagate_single`.
+    '''
+    s_helper = sh.SProvHelper(service)
 
-        results.append(graph_wrapper)
-        activated_obligations.append(obligations)
+    graphs, summaries = pending_sprov_graphs(s_helper, ledger)
 
-    return results, activated_obligations
+    if setting.BULK_FETCH:
+        helpers = s_helper.prefetch_graphs(graphs)
 
+    for graph in graphs:
+        if setting.BULK_FETCH:
+            graph_wrapper = gw.GraphWrapper.from_sprov(helpers.pop(graph), subgraph=graph)
+        else:
+            graph_wrapper = gw.GraphWrapper.from_sprov(s_helper, subgraph=graph)
 
-def propagate_all_cwl(service, write_back=True):
-    s_helper = sh.CWLHelper(service)
+        yield propagate_single(graph_wrapper, checkpoint)
+        del graph_wrapper  # Not to keep it while the next graph is loaded
 
-    results = []
-    activated_obligations = []
+        if ledger:
+            ledger.record(graph, summaries.get(graph, {}))
 
-    obligations = {}
+
+def iter_cwl(service, checkpoint=None):
+    '''
+    The CWLProv counterpart of `iter_sprov`. There is only one graph.
+    '''
+    s_helper = sh.CWLHelper(service)
 
     graph_wrapper = gw.GraphWrapper.from_cwl(s_helper)
 
-    graph_wrapper, obligations = propagate_single(graph_wrapper)
+    yield propagate_single(graph_wrapper, checkpoint)
 
-    if write_back:
-        a_helper = sh.AugmentedGraphHelper(service)
-        a_helper.write_transformed_graph(graph_wrapper)
 
-    results.append(graph_wrapper)
-    activated_obligations.append(obligations)
+def _collect(stream, service, write_back):
+    if write_back is None:
+        write_back = setting.WRITE_BACK
+    results = []
+    activated_obligations = []
+    for graph_wrapper, obligations in stream:
+        if write_back:
+            a_helper = sh.AugmentedGraphHelper(service)
+            a_helper.write_transformed_graph(graph_wrapper, obligations)
 
+        results.append(graph_wrapper)
+        activated_obligations.append(obligations)
     return results, activated_obligations
 
 
+def propagate_all_sprov(service, write_back=None, ledger=None, checkpoint=None):
+    '''
+    Same as `iter_sprov`, but keeps all the graphs and returns them (and the activated obligations of each) at the end. Useful for e.g. notebooks; `main` streams instead.
+    '''
+    return _collect(iter_sprov(service, ledger, checkpoint), service, write_back)
+
+
+def propagate_all_cwl(service, write_back=None, checkpoint=None):
+    return _collect(iter_cwl(service, checkpoint), service, write_back)
+
+
 def draw_single(filename, graph, activated_obligations):
+    '''
+    Draw the graph in the current process (but still through the drawing cache, if enabled).
+    '''
     from draid import visualise as vis
-    gb = vis.GraphBuilder(graph, activated_obligations) \
-            .data_flow() \
-            .rules() \
-            .obligation() \
-            .flow_rules()
-    G = gb.build()
-    vis.draw_to_file(G, filename)
+    with vis.Renderer(jobs=0) as renderer:
+        renderer.draw(filename, graph, activated_obligations)
 
 
 def draw(graphs, activated_obligations=[]):
+    '''
+    Draw the graphs into `graph_{i}.{setting.DRAW_FORMAT}` (in `setting.DRAW_DIR`), using `setting.DRAW_JOBS` background processes. Returns when all are drawn.
+    '''
     from draid import visualise as vis
-    for i, graph in enumerate(graphs):
-        filename = "graph_{}.png".format(i)
-        draw_single(filename, graph, activated_obligations[i])
+    with vis.Renderer() as renderer:
+        for i, graph in enumerate(graphs):
+            renderer.draw(renderer.filename(i), graph, activated_obligations[i])
@@ -7,16 +7,27 @@
 #
 
 '''
-
+The obligation store keeps the activated obligations of all runs. There are three backends with the same interface: `ObligationStore` (a JSON file), `JSONLObligationStore` (an append-only JSON-Lines file) and `SQLiteObligationStore` (an SQLite database, indexed, for large stores). Use `open_store` to pick one by the file name.
 '''
 
 import json
+import os
+import sqlite3
+import threading
+
+from contextlib import contextmanager
 
 from rdflib import URIRef
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+from draid import setting
 from draid.rule import ActivatedObligation, Attribute
 
+try:
+    import fcntl
+except ImportError:  # Not on POSIX: no locking
+    fcntl = None  # type: ignore
+
 
 def _dump_activated_obligation(ob: ActivatedObligation):
     obligated_action = ob.name
@@ -60,6 +71,9 @@ class ObligationStore:
         with open(self._filename, 'w') as fd:
             json.dump(ob_list_raw, fd)
 
+    def close(self):
+        pass
+
     def insert(self, activated_obligations: Dict[URIRef, List[ActivatedObligation]]) -> None:
         for component_uri, ob_list in activated_obligations.items():
             for ob in ob_list:
@@ -73,16 +87,334 @@ class ObligationStore:
     def delete(self, *index):
         self._obligation_list = [ob for i, ob in enumerate(self._obligation_list) if i not in index]
 
-    def find(self, component):
-        return []
+    def find(self, component: URIRef) -> List[ActivatedObligation]:
+        return [ob for component_uri, ob in self._obligation_list if component_uri == component]
+
+    def query(self, component: Optional[URIRef] = None, action: Optional[str] = None, attribute: Optional[str] = None, value: Any = None) -> List[Tuple[URIRef, ActivatedObligation]]:
+        '''
+        The obligations matching all the given conditions: of the `component`, with the `action` (IRI), with an attribute named `attribute`, and/or with an attribute (named `attribute`, if given) of `value`.
+        '''
+        return [(component_uri, ob) for component_uri, ob in self._obligation_list if _matches(component_uri, ob, component, action, attribute, value)]
+
+
+def _key(component_uri: URIRef, ob: ActivatedObligation) -> str:
+    '''
+    The canonical form of an obligation, which is also its line in the JSON-Lines store.
+    '''
+    return json.dumps([str(component_uri), _dump_activated_obligation(ob)])
+
+
+class JSONLObligationStore:
+    '''
+    The obligation store as an append-only JSON-Lines file (one `[component, obligation]` per line), with the same interface as `ObligationStore`.
+    `write()` only appends the obligations inserted since the last write, and skips those already in the file (also those appended by other writers meanwhile). The file is locked (through `<filename>.lock`) while being read or written, so multiple processes can share it.
+    The file is compacted (rewritten without duplicated or broken lines) by `close()` if it has more than `setting.OBLIGATION_LOG_COMPACT_RATIO` times as many lines as obligations, so `write()` only ever appends; `compact()` does it explicitly. After `delete()`, the next `write()` rewrites the file.
+    '''
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._lock_filename = filename + '.lock'
+        self.reload()
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_filename, 'a') as fd:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _reset(self):
+        self._pending = {}  # type: Dict[str, Tuple[URIRef, ActivatedObligation]]  # The obligations inserted but not written yet
+        self._obligation_list = []  # type: List[Tuple[URIRef, ActivatedObligation]]
+        self._keys = set()
+        self._inode = None
+        self._offset = 0  # Bytes of the file read so far
+        self._lines = 0  # Lines of the file read (or written) so far
+        self._torn = False  # Whether the file ends with an incomplete line (of a crashed writer)
+
+    def _read_new(self):
+        '''
+        Read the lines appended (by any writer) since the last read. If the file has been replaced (compacted) meanwhile, read it all over again; the obligations inserted but not written yet are kept.
+        '''
+        try:
+            stat = os.stat(self._filename)
+        except FileNotFoundError:
+            return
+        pending = []
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            pending = list(self._pending.values())
+            self._reset()
+            self._inode = stat.st_ino
+        with open(self._filename, 'rb') as fd:
+            fd.seek(self._offset)
+            for line in fd:
+                if not line.endswith(b'\n'):
+                    self._torn = True
+                    break
+                self._offset += len(line)
+                self._lines += 1
+                self._torn = False
+                try:
+                    component_uri_str, ob_item = json.loads(line)
+                    component_uri, ob = URIRef(component_uri_str), _load_activated_obligation(ob_item)
+                except (ValueError, TypeError):
+                    continue
+                key = _key(component_uri, ob)
+                self._pending.pop(key, None)  # Possibly written by another writer
+                if key not in self._keys:
+                    self._keys.add(key)
+                    self._obligation_list.append((component_uri, ob))
+        for item in pending:
+            self._append(*item)
+
+    def _append(self, component_uri, ob):
+        key = _key(component_uri, ob)
+        if key not in self._keys:
+            self._keys.add(key)
+            self._pending[key] = (component_uri, ob)
+            self._obligation_list.append((component_uri, ob))
+
+    def reload(self):
+        self._reset()
+        self._rewrite = False
+        with self._locked(shared=True):
+            self._read_new()
+
+    def write(self):
+        with self._locked():
+            self._read_new()
+            if self._rewrite:
+                self._compact()
+                return
+            if not self._pending:
+                return
+            data = ''.join(key + '\n' for key in self._pending)
+            if self._torn:
+                data = '\n' + data  # Terminate the broken line, which is then skipped
+            with open(self._filename, 'a') as fd:
+                fd.write(data)
+            stat = os.stat(self._filename)
+            self._inode, self._offset = stat.st_ino, stat.st_size
+            self._lines += len(self._pending) + self._torn
+            self._pending = {}
+            self._torn = False
+
+    def _compact(self):
+        tmp_filename = self._filename + '.tmp'
+        with open(tmp_filename, 'w') as fd:
+            fd.write(''.join(_key(component_uri, ob) + '\n' for component_uri, ob in self._obligation_list))
+        os.replace(tmp_filename, self._filename)
+        stat = os.stat(self._filename)
+        self._inode, self._offset = stat.st_ino, stat.st_size
+        self._lines = len(self._obligation_list)
+        self._pending = {}
+        self._rewrite = False
+        self._torn = False
+
+    def compact(self):
+        '''
+        Rewrite the file with every obligation once (including those not written yet).
+        '''
+        with self._locked():
+            self._read_new()
+            self._compact()
+
+    def close(self):
+        '''
+        Compact the file if it has too many duplicated (or broken) lines; see the class. The obligations not written are dropped.
+        '''
+        with self._locked():
+            self._read_new()
+            if self._lines > setting.OBLIGATION_LOG_COMPACT_RATIO * max(len(self._obligation_list) - len(self._pending), 1):
+                self._obligation_list = [item for item in self._obligation_list if _key(*item) not in self._pending]
+                self._compact()
+
+    def insert(self, activated_obligations: Dict[URIRef, List[ActivatedObligation]]) -> None:
+        for component_uri, ob_list in activated_obligations.items():
+            for ob in ob_list:
+                self._append(component_uri, ob)
+
+    def list(self):
+        return self._obligation_list
+
+    def delete(self, *index):
+        '''
+        Delete the obligations by their positions in `list()`. The file is rewritten by the next `write()`.
+        '''
+        self._obligation_list = [ob for i, ob in enumerate(self._obligation_list) if i not in index]
+        self._keys = {_key(component_uri, ob) for component_uri, ob in self._obligation_list}
+        self._pending = {key: item for key, item in self._pending.items() if key in self._keys}
+        self._rewrite = True
+
+    def find(self, component: URIRef) -> List[ActivatedObligation]:
+        return [ob for component_uri, ob in self._obligation_list if component_uri == component]
+
+    def query(self, component: Optional[URIRef] = None, action: Optional[str] = None, attribute: Optional[str] = None, value: Any = None) -> List[Tuple[URIRef, ActivatedObligation]]:
+        '''
+        See `ObligationStore.query`.
+        '''
+        return [(component_uri, ob) for component_uri, ob in self._obligation_list if _matches(component_uri, ob, component, action, attribute, value)]
+
+
+def _matches(component_uri, ob, component, action, attribute, value) -> bool:
+    if component is not None and component_uri != component:
+        return False
+    if action is not None and ob.name != action:
+        return False
+    if attribute is None and value is None:
+        return True
+    return any((attribute is None or attr.name == attribute) and (value is None or attr.value == value) for attr in ob.attributes)
+
+
+def _sql_value(value: Any) -> Any:
+    '''
+    The attribute value as stored (and compared) in the SQLite database. Values which SQLite can't store natively are stored as JSON.
+    '''
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value)
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS obligation (
+    id INTEGER PRIMARY KEY,
+    component TEXT NOT NULL,
+    action TEXT NOT NULL,
+    arguments TEXT NOT NULL,  -- The attributes as JSON, as in the JSON store
+    UNIQUE (component, action, arguments)
+);
+CREATE INDEX IF NOT EXISTS obligation_component ON obligation (component);
+CREATE INDEX IF NOT EXISTS obligation_action ON obligation (action);
+CREATE TABLE IF NOT EXISTS attribute (
+    obligation INTEGER NOT NULL REFERENCES obligation (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT,
+    value,
+    PRIMARY KEY (obligation, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS attribute_name_value ON attribute (name, value);
+CREATE INDEX IF NOT EXISTS attribute_value ON attribute (value);
+'''
+
+
+class SQLiteObligationStore:
+    '''
+    The obligation store backed by SQLite, with the same interface as `ObligationStore`.
+    Every obligation (component, action and attributes) is stored once: inserting it again does nothing. The changes are only persisted by `write()` (the commit).
+    The store can be used from any thread (e.g. opened in the main thread and written in the writing thread of `pipeline`); the changes are serialised.
+    '''
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def reload(self):
+        with self._lock:
+            self._conn.rollback()
+
+    def write(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def insert(self, activated_obligations: Dict[URIRef, List[ActivatedObligation]]) -> None:
+        with self._lock:
+            cur = self._conn.cursor()
+            for component_uri, ob_list in activated_obligations.items():
+                for ob in ob_list:
+                    obligated_action, arguments = _dump_activated_obligation(ob)
+                    cur.execute('INSERT OR IGNORE INTO obligation (component, action, arguments) VALUES (?, ?, ?)',
+                            (str(component_uri), obligated_action, json.dumps(arguments)))
+                    if cur.rowcount == 1:
+                        cur.executemany('INSERT INTO attribute (obligation, position, name, type, value) VALUES (?, ?, ?, ?, ?)',
+                                [(cur.lastrowid, i, name, a_type, _sql_value(a_value)) for i, (name, a_type, a_value) in enumerate(arguments)])
+
+    def _select(self, where: str = '', params=()) -> List[Tuple[URIRef, ActivatedObligation]]:
+        rows = self._conn.execute('SELECT component, action, arguments FROM obligation {} ORDER BY id'.format(where), params)
+        return [(URIRef(component), _load_activated_obligation((action, json.loads(arguments)))) for component, action, arguments in rows]
+
+    def list(self):
+        return self._select()
+
+    def delete(self, *index):
+        '''
+        Delete the obligations by their positions in `list()`.
+        '''
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute('SELECT id FROM obligation ORDER BY id')]
+            self._conn.executemany('DELETE FROM obligation WHERE id = ?', [(ids[i],) for i in index if 0 <= i < len(ids)])
+
+    def find(self, component: URIRef) -> List[ActivatedObligation]:
+        return [ob for _component, ob in self._select('WHERE component = ?', (str(component),))]
+
+    def query(self, component: Optional[URIRef] = None, action: Optional[str] = None, attribute: Optional[str] = None, value: Any = None) -> List[Tuple[URIRef, ActivatedObligation]]:
+        '''
+        See `ObligationStore.query`.
+        '''
+        conditions = []
+        params = []  # type: List[Any]
+        if component is not None:
+            conditions.append('component = ?')
+            params.append(str(component))
+        if action is not None:
+            conditions.append('action = ?')
+            params.append(action)
+        if attribute is not None or value is not None:
+            attr_conditions = ['attribute.obligation = obligation.id']
+            if attribute is not None:
+                attr_conditions.append('attribute.name = ?')
+                params.append(attribute)
+            if value is not None:
+                attr_conditions.append('attribute.value = ?')
+                params.append(_sql_value(value))
+            conditions.append('EXISTS (SELECT 1 FROM attribute WHERE {})'.format(' AND '.join(attr_conditions)))
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return self._select(where, params)
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM obligation').fetchone()[0]
+
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+JSONL_SUFFIXES = ('.jsonl',)
+
+
+def open_store(filename: str):
+    '''
+    Open the obligation store in `filename`: an SQLite database if the name ends with one of `SQLITE_SUFFIXES`, a JSON-Lines file if with one of `JSONL_SUFFIXES`, or a JSON file otherwise.
+    '''
+    if filename.endswith(SQLITE_SUFFIXES):
+        return SQLiteObligationStore(filename)
+    if filename.endswith(JSONL_SUFFIXES):
+        return JSONLObligationStore(filename)
+    return ObligationStore(filename)
 
 
 def insert_to_store(activated_obligations: Dict[URIRef, List[ActivatedObligation]], filename: str) -> None:
-    ob_store = ObligationStore(filename)
-    ob_store.insert(activated_obligations)
-    ob_store.write()
+    ob_store = open_store(filename)
+    try:
+        ob_store.insert(activated_obligations)
+        ob_store.write()
+    finally:
+        ob_store.close()
 
 
 def read_from_store(filename: str) -> List[Tuple[URIRef, List[ActivatedObligation]]]:
-    ob_store = ObligationStore(filename)
-    return ob_store.list()
+    ob_store = open_store(filename)
+    try:
+        return ob_store.list()
+    finally:
+        ob_store.close()
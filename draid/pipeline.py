@@ -0,0 +1,117 @@
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/17 10:12:46
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The asyncio pipeline of S-Prov runs. The three stages of every graph -- fetching (network-bound), reasoning (CPU and Prolog) and handling the results (the sinks, e.g. write-back; network-bound) -- are overlapped across graphs, with bounded queues between them: while graph N is reasoned, up to `setting.PIPELINE_PREFETCH` next graphs are being fetched, and up to `setting.PIPELINE_WRITE_DEPTH` previous graphs are being written.
+The reasoning stays in the thread running the event loop (the Prolog engine is bound to it); the fetching and the writing run in worker threads.
+'''
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from typing import Any, Callable, Iterable, List, Optional
+
+from . import setting
+from . import sparql_helper as sh
+from . import graph_wrapper as gw
+from .sinks import ResultSink, put_all
+from .worker import GraphResult
+
+logger = logging.getLogger(__name__)
+
+
+async def _run(items: List[Any], fetch: Callable, process: Callable, write: Callable, prefetch: int, write_depth: int) -> List[Any]:
+    loop = asyncio.get_running_loop()
+    fetch_slots = asyncio.Semaphore(prefetch)  # Taken before a fetch starts, and given back once the processor has the fetched data
+    fetched = asyncio.Queue()  # type: asyncio.Queue
+    processed = asyncio.Queue(maxsize=write_depth)  # type: asyncio.Queue
+    failed = []  # type: List[BaseException]  # The writing errors; nothing more is processed after one
+
+    with ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix='draid-fetch') as fetch_pool, \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix='draid-write') as write_pool:  # One writer, so the results are written in order
+
+        async def fetcher():
+            for i, item in enumerate(items):
+                await fetch_slots.acquire()  # At most `prefetch` graphs are being fetched or waiting to be processed
+                await fetched.put((i, item, loop.run_in_executor(fetch_pool, fetch, item)))
+            await fetched.put(None)
+
+        async def processor():
+            try:
+                while not failed:
+                    entry = await fetched.get()
+                    if entry is None:
+                        break
+                    i, item, fetching = entry
+                    data = await fetching
+                    fetch_slots.release()
+                    await asyncio.sleep(0)  # Let the fetcher start the next fetch before blocking the loop
+                    output = process(i, item, data)
+                    del data
+                    await processed.put(loop.run_in_executor(write_pool, write, i, item, output))
+            finally:
+                await processed.put(None)
+
+        async def writer():
+            ret = []
+            while True:
+                writing = await processed.get()
+                if writing is None:
+                    break
+                try:
+                    ret.append(await writing)
+                except Exception as e:  # The writes already started are still waited for
+                    failed.append(e)
+            if failed:
+                raise failed[0]
+            return ret
+
+        _, _, results = await asyncio.gather(fetcher(), processor(), writer())
+    return results
+
+
+def run_pipeline(items: Iterable[Any], fetch: Callable, process: Callable, write: Callable, prefetch: Optional[int] = None, write_depth: Optional[int] = None) -> List[Any]:
+    '''
+    Run `fetch(item)` (in threads), `process(index, item, fetched)` (in this thread) and `write(index, item, processed)` (in a thread) for every item, overlapping the stages of different items. Returns the return values of `write`, in the order of `items`.
+    '''
+    prefetch = max(1, prefetch or setting.PIPELINE_PREFETCH)
+    write_depth = max(1, write_depth or setting.PIPELINE_WRITE_DEPTH)
+    return asyncio.run(_run(list(items), fetch, process, write, prefetch, write_depth))
+
+
+def pipeline_sprov(service, sinks: List[ResultSink], ledger=None, checkpoint=None) -> List[GraphResult]:
+    '''
+    The pipelined counterpart of `main.iter_sprov`, with the results handed to the `sinks` in the writing stage. Returns the results of all graphs.
+    '''
+    from .main import pending_sprov_graphs, propagate_single
+
+    s_helper = sh.SProvHelper(service)
+    graphs, summaries = pending_sprov_graphs(s_helper, ledger)
+
+    helpers = s_helper.prefetch_graphs(graphs) if setting.BULK_FETCH else {}
+
+    def fetch(graph):
+        helper = helpers.pop(graph, None) or sh.SProvHelper(service)  # A helper for each graph, because it keeps the current graph
+        graph_wrapper = gw.GraphWrapper.from_sprov(helper, subgraph=graph)
+        graph_wrapper.fetch_all()  # Otherwise queried in the reasoning stage
+        return graph_wrapper
+
+    def process(index, graph, graph_wrapper):
+        logger.debug("Reasoning graph %d: %s", index, graph)
+        return propagate_single(graph_wrapper, checkpoint)
+
+    def write(index, graph, processed):
+        graph_wrapper, obligations = processed
+        result = GraphResult.of(graph_wrapper, obligations)
+        put_all(sinks, index, result, graph_wrapper)
+        if ledger:
+            ledger.record(graph, summaries.get(graph, {}))
+        return result
+
+    return run_pipeline(graphs, fetch, process, write)
@@ -1,4 +1,5 @@
 from .reason import (
         propagate,
+        propagate_incremental,
         reason_in_total,
         )
@@ -3,7 +3,6 @@ This module contains the handling functions for interacting with the Prolog reas
 '''
 
 import json
-import pyswip
 import tempfile
 
 from collections import defaultdict
@@ -26,8 +25,19 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-prolog = pyswip.Prolog()  # pyswip doesn't support launching multiple Prolog instances (said to be the limition of swi-prolog). So I'm using different initial situations for different ones instead
-prolog.consult(FLOW_RULE_DEF)
+_prolog = None  # pyswip doesn't support launching multiple Prolog instances (said to be the limition of swi-prolog). So I'm using different initial situations for different ones instead
+
+
+def _get_prolog():
+    '''
+    Start Prolog and consult the flow rule definitions on first use, rather than when this module is imported.
+    '''
+    global _prolog
+    if _prolog is None:
+        import pyswip
+        _prolog = pyswip.Prolog()
+        _prolog.consult(FLOW_RULE_DEF)
+    return _prolog
 _uniq_counter = 0
 
 
@@ -212,7 +222,7 @@ def _parse_result(prolog, q_sit, situation_out):
     return ported_drs
 
 def _do_prolog_common(data_rules_facts, q_sit, situation_out):
-    global prolog
+    prolog = _get_prolog()
 
     tmp_dir = tempfile.mkdtemp()
     # with tempfile.TemporaryDirectory() as tmp_dir:
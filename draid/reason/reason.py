@@ -12,7 +12,7 @@ This module contains the functions necessary to do the main reasoning -- propaga
 '''
 
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Set, Tuple
 
 from rdflib import Graph, URIRef
 
@@ -86,6 +86,25 @@ def propagate(graph: GraphWrapper, component_list: List[URIRef]) -> Tuple[List[C
     return (augmentations, activated_obligations)
 
 
+def propagate_incremental(graph: GraphWrapper, changed: Iterable[URIRef]) -> Tuple[Set[URIRef], Dict[URIRef, List[ActivatedObligation]]]:
+    '''
+    Re-reason the part of `graph` affected by the rule changes of `changed` (see `GraphWrapper.dirty_components`), after the graph has been fully reasoned before and the new rules are set on the graph.
+    Only the dirty components are re-dispatched (in the order of the batches), and the augmentations of all other components are kept. The augmentations are applied to `graph` (in-place).
+    Return the dirty components, and the activated obligations of them (which replace the previous ones of these components).
+    '''
+    dirty = graph.dirty_components(changed)
+    for component in dirty:
+        graph.clear_output_rules(component)
+    activated_obligations = {}  # type: Dict[URIRef, List[ActivatedObligation]]
+    for i, batch in enumerate(graph.component_to_batches(dirty)):
+        logger.debug("dirty batch %d: %s", i, batch)
+        augmentations, obs = propagate(graph, batch)
+        activated_obligations.update(obs)
+        graph.apply_augmentation(augmentations)
+    logger.info("Re-reasoned %d dirty components", len(dirty))
+    return dirty, activated_obligations
+
+
 def obtain_rules(graph: GraphWrapper, component_list: List[URIRef]) -> Dict[URIRef, Dict[str, DataRuleContainer]]:
     '''
     Get the data rules of all inputs.
@@ -13,144 +13,194 @@ It used to exist because the graph is exposed as an RDF Graph and all interactio
 '''
 
 import logging
-from typing import Dict, List
+from typing import Collection, Dict, List, Optional, Union
 
 from rdflib import Graph, URIRef, Literal
 
-from . import rule
 from . import setting
+from . import rule_database_helper as rdbh
 from .defs import ComponentInfo
 from .defs.exception import IllegalCaseError
 from .graph_wrapper import GraphWrapper
 from .rule import parser, DataRuleContainer
+from .rule.data_rule import RandomRule
 
 
 logger = logging.getLogger(__name__)
 
 
-def apply_imported_rules(graph: GraphWrapper) -> None:
+def _component_info_of(graph: GraphWrapper, components: Optional[Collection[URIRef]]) -> List[ComponentInfo]:
+    if components is None:
+        return graph.component_info()
+    if not components:
+        return []
+    return graph.component_info(list(components))
+
+
+def _data_of(graph: GraphWrapper, data: Optional[Collection[URIRef]]) -> List[URIRef]:
+    if data is None:
+        return list(graph.data())
+    return [d for d in graph.data() if d in data]
+
+
+def _component_keys(component_info_list: List[ComponentInfo]) -> List[Union[URIRef, str]]:
+    '''
+    The keys the injected rules of the components may be under: their URIs and their functions.
     '''
+    keys = [component_info.id for component_info in component_info_list]  # type: List[Union[URIRef, str]]
+    keys.extend({component_info.function for component_info in component_info_list if component_info.function is not None})
+    return keys
 
-    Modifies the graph in-place
+
+class InjectionLookup:
+    '''
+    The injected rules of the components and data of one graph, looked up once (see `rdbh.injected_rules`; one query per kind of rules and injection layer) and merged over the layers: the rules of the graph (`graph_id`) take precedence over the universal ones (under `None`).
+    The rule strings are parsed once, however many components or data share them.
     '''
-    def translate_rule_injection(component_info, defined_injected_rule):
+
+    def __init__(self, graph_id: Optional[URIRef], component_info_list: List[ComponentInfo], data_list: List[URIRef]):
+        self._layers = [None] if graph_id is None else [None, graph_id]
+        keys = _component_keys(component_info_list)
+        self._flow = [rdbh.injected_rules('flow', layer, keys) for layer in self._layers]
+        self._imported = [rdbh.injected_rules('imported', layer, keys) for layer in self._layers]
+        self._data = [rdbh.injected_rules('data', layer, data_list) for layer in self._layers]
+        self._parsed = {}  # type: Dict[str, Optional[DataRuleContainer]]
+
+    def _parse(self, irules: str) -> Optional[DataRuleContainer]:
+        if irules not in self._parsed:
+            self._parsed[irules] = parser.parse_data_rule(irules)
+        return self._parsed[irules]
+
+    def flow_rule(self, component_info: ComponentInfo) -> Optional[str]:
+        fr = None
+        for section in self._flow:
+            if component_info.function in section:
+                fr = section[component_info.function]
+            if component_info.id in section:
+                fr = section[component_info.id]
+        return fr
+
+    def imported_rules(self, component_info: ComponentInfo) -> Optional[Dict[str, DataRuleContainer]]:
+        defined_imported_rules = None
+        for section in self._imported:
+            if component_info.id in section:
+                defined_imported_rules = section[component_info.id]
+            elif component_info.function in section:
+                defined_imported_rules = section[component_info.function]
+        if defined_imported_rules is None:
+            return None
+        imported_rules = {}
+        for port, defined_rule in defined_imported_rules.items():
+            port_a = port if port else setting.IMPORT_PORT_NAME
+            imported_rules[port_a] = self._translate_imported(component_info, defined_rule)
+        logger.info("component: {} rules: {} imported_rules".format(component_info, imported_rules))
+        return imported_rules
+
+    def _translate_imported(self, component_info, defined_injected_rule) -> DataRuleContainer:
         if isinstance(defined_injected_rule, str):
-            irules = defined_injected_rule
+            rules_obj = self._parse(defined_injected_rule)
         elif callable(defined_injected_rule):
             irules = defined_injected_rule(component_info)
             assert isinstance(irules, str)
+            rules_obj = self._parse(irules)
         elif not defined_injected_rule:
-            irules = rule.RandomRule(True)
+            rules_obj = parser.parse_data_rule(RandomRule(True))
         else:
             raise IllegalCaseError('Injected rule should be any of str, function, or None')
-        rules_obj = parser.parse_data_rule(irules)
         assert rules_obj
         return rules_obj
 
-    def obtain_rules(component_info_list: List[ComponentInfo], injected_imported_rule_graph) -> Dict[URIRef, Dict[str, DataRuleContainer]]:
-        rules = {}
-        for component_info in component_info_list:
-            component_id = component_info.id
-            function = component_info.function
-            if component_id in injected_imported_rule_graph:
-                defined_imported_rules = injected_imported_rule_graph[component_id]
-            elif function in injected_imported_rule_graph:
-                defined_imported_rules = injected_imported_rule_graph[function]
-            else:
-                continue
-            imported_rules = {}
-            for port, defined_rule in defined_imported_rules.items():
-                port_a = port if port else setting.IMPORT_PORT_NAME
-                imported_rules[port_a] = translate_rule_injection(component_info, defined_rule)
-            logger.info("component: {} rules: {} imported_rules".format(component_info, imported_rules))
-            rules[component_id] = imported_rules
-        return rules
-
-    component_info_list = graph.component_info()
+    def data_rule(self, data_id: URIRef) -> Optional[DataRuleContainer]:
+        injected_rule = None
+        found = False
+        for section in self._data:
+            if data_id in section:
+                injected_rule = section[data_id]
+                found = True
+        if not found:
+            return None
+        if isinstance(injected_rule, str):
+            rules_obj = self._parse(injected_rule)
+        elif not injected_rule:
+            rules_obj = parser.parse_data_rule(RandomRule(True))
+        else:
+            raise IllegalCaseError('Injected rule should be any of str, function, or None')
+        assert rules_obj
+        logger.info("data: {} rules: {}ported_rules".format(data_id, rules_obj))
+        return rules_obj
+
+
+def recognise(graph: GraphWrapper, components: Optional[Collection[URIRef]]=None, data: Optional[Collection[URIRef]]=None) -> None:
+    '''
+    Apply the flow rules, the imported rules and the data rules (the same as `apply_flow_rules`, `apply_imported_rules` and `apply_data_rules` together) in one pass, over one snapshot of the components and data, and insert them into the graph in bulk.
+    Modifies the graph in-place
+    If `components` and/or `data` are given, only the rules of these components and/or data are (re-)applied.
+    '''
+    component_info_list = _component_info_of(graph, components)
     logger.debug('component_info_list: %s', component_info_list)
+    data_list = _data_of(graph, data)
+    lookup = InjectionLookup(graph.subgraph, component_info_list, data_list)
+    flow_rules = {}
     imported_rules = {}
-    try:
-        imported_rules.update(obtain_rules(component_info_list, setting.INJECTED_IMPORTED_RULE[None]))
-    except KeyError:
-        pass
-    try:
-        graph_id = graph.subgraph
-        imported_rules.update(obtain_rules(component_info_list, setting.INJECTED_IMPORTED_RULE[graph_id]))
-    except KeyError:
-        pass
-    graph.set_imported_rules(imported_rules)
+    for component_info in component_info_list:
+        fr = lookup.flow_rule(component_info)
+        if fr is not None:
+            flow_rules[component_info.id] = fr
+        irs = lookup.imported_rules(component_info)
+        if irs is not None:
+            imported_rules[component_info.id] = irs
+    data_rules = {}
+    for data_id in data_list:
+        dr = lookup.data_rule(data_id)
+        if dr is not None:
+            data_rules[data_id] = dr
+    graph.set_rules(flow_rules, imported_rules, data_rules)
 
 
-def apply_flow_rules(graph: GraphWrapper) -> None:
+def apply_imported_rules(graph: GraphWrapper, components: Optional[Collection[URIRef]]=None) -> None:
     '''
 
     Modifies the graph in-place
+    If `components` is given, only the rules of these components are (re-)applied.
     '''
-    def obtain_rule(component_info_list, injected_rule_graph):
-        rules = {}
-        logger.debug("injected_flow_rule (graph or maybe not): %s", injected_rule_graph)
-        for component_info in component_info_list:
-            component = component_info.id
-            function = component_info.function
-            if function in injected_rule_graph:
-                fr = injected_rule_graph[function]
-                rules[component] = fr
-            if component in injected_rule_graph:
-                fr = injected_rule_graph[component]
-                rules[component] = fr
-        return rules
-
-
-    pairs = {}
-    component_info_list = graph.component_info()
+    component_info_list = _component_info_of(graph, components)
+    logger.debug('component_info_list: %s', component_info_list)
+    lookup = InjectionLookup(graph.subgraph, component_info_list, [])
+    imported_rules = {}
+    for component_info in component_info_list:
+        irs = lookup.imported_rules(component_info)
+        if irs is not None:
+            imported_rules[component_info.id] = irs
+    graph.set_imported_rules(imported_rules)
 
-    try:
-        pairs.update(obtain_rule(component_info_list, setting.INJECTED_FLOW_RULE[None]))
-    except KeyError:
-        pass
 
-    try:
-        graph_id = graph.subgraph
-        pairs.update(obtain_rule(component_info_list, setting.INJECTED_FLOW_RULE[graph_id]))
-    except KeyError:
-        pass
+def apply_flow_rules(graph: GraphWrapper, components: Optional[Collection[URIRef]]=None) -> None:
+    '''
 
+    Modifies the graph in-place
+    If `components` is given, only the rules of these components are (re-)applied.
+    '''
+    component_info_list = _component_info_of(graph, components)
+    lookup = InjectionLookup(graph.subgraph, component_info_list, [])
+    pairs = {}
+    for component_info in component_info_list:
+        fr = lookup.flow_rule(component_info)
+        if fr is not None:
+            pairs[component_info.id] = fr
     graph.set_flow_rules(pairs)
 
 
-def apply_data_rules(graph: GraphWrapper) -> None:
-    def translate_rule_injection(injected_rule):
-        if isinstance(injected_rule, str):
-            irules = injected_rule
-        elif not injected_rule:
-            irules = rule.RandomRule(True)
-        else:
-            raise IllegalCaseError('Injected rule should be any of str, function, or None')
-        rules_obj = parser.parse_data_rule(irules)
-        return rules_obj
-    def obtain_rules(data_list, injected_rule_graph):
-        rules = {}
-        for data_id in data_list:
-            if data_id in injected_rule_graph:
-                injected_data_rules = injected_rule_graph[data_id]
-            else:
-                continue
-            rules_obj = translate_rule_injection(injected_data_rules)
-            assert rules_obj
-            logger.info("data: {} rules: {}ported_rules".format(data_id, rules_obj))
-            rules[data_id] = rules_obj
-        return rules
-
-    data_list = graph.data()
+def apply_data_rules(graph: GraphWrapper, data: Optional[Collection[URIRef]]=None) -> None:
+    '''
+
+    Modifies the graph in-place
+    If `data` is given, only the rules of these data are (re-)applied.
+    '''
+    data_list = _data_of(graph, data)
+    lookup = InjectionLookup(graph.subgraph, [], data_list)
     data_rules = {}
-    try:
-        data_rules.update(obtain_rules(data_list, setting.INJECTED_DATA_RULE[None]))
-    except KeyError:
-        pass
-    try:
-        graph_id = graph.subgraph
-        data_rules.update(obtain_rules(data_list, setting.INJECTED_DATA_RULE[graph_id]))
-    except KeyError:
-        pass
+    for data_id in data_list:
+        dr = lookup.data_rule(data_id)
+        if dr is not None:
+            data_rules[data_id] = dr
     graph.set_data_rules(data_rules)
-
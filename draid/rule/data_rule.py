@@ -241,17 +241,18 @@ class DataRuleContainer(AttributeResolver):
         else:
             return NotImplemented
 
-    def dump(self) -> str:
+    def dump(self, compact: bool = False) -> str:
+        '''
+        The rules in the rule language. If `compact`, everything is on one line, without the indentation (e.g. for storing in the rule DB).
+        '''
+        parts = [r.dump() for r in self._rules] + [pr.dump() for pr in self._amap.values()]
+        if compact:
+            return "begin {} end".format(" ".join(parts)) if parts else "begin end"
         skeleton = """begin
         {}
         end
         """
-        s_ob = "\n".join([r.dump() for r in self._rules])
-        s_pr = "\n".join([pr.dump() for pr in self._amap.values()])
-        s = s_ob
-        if s_pr:
-            s += '\n' + s_pr
-        return skeleton.format(s)
+        return skeleton.format("\n".join(parts))
 
     def clone(self) -> 'DataRuleContainer':
         rules = [r.clone() for r in self._rules]
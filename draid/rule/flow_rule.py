@@ -12,7 +12,7 @@
 '''
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from draid.defs.exception import IllegalCaseError
 
@@ -71,6 +71,26 @@ class FlowRule:
     def map_name(name_map, name):
         return name_map[name] if name in name_map else name
 
+    @classmethod
+    def from_raw(cls, raw_actions: List[Tuple[int, List]]):
+        '''
+        Build the flow rule from its raw form (see `parser.TreeToFlowRuleContent`): the kind of every action (1: propagate; 2: edit; 3: delete) and its items.
+        '''
+        actions = []  # type: List[Action]
+        for kind, items in raw_actions:
+            if kind == 1:
+                input_port, output_ports = items
+                actions.append(Propagate(input_port, output_ports))
+            elif kind == 2:
+                input_port, output_port, name, type_old, value_old, type_new, value_new = items
+                actions.append(Edit(type_new, value_new, input_port, output_port, name, type_old, value_old))
+            elif kind == 3:
+                input_port, output_port, name, type, value = items
+                actions.append(Delete(input_port, output_port, name, type, value))
+            else:
+                raise IllegalCaseError()
+        return cls(actions)
+
     def __init__(self, actions: List[Action]):
         self.actions = actions
         self.name_map = None  # type: Optional[Dict[str, str]]
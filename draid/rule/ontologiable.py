@@ -11,50 +11,85 @@
 
 '''
 
-from rdflib import Graph, URIRef
-from rdflib.namespace import NamespaceManager
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
 
 from draid.defs.exception import IllegalCaseError
 
-from .proto import WELL_KNOWN, Thing, Obligation, get_obligation
+from .proto import WELL_KNOWN, get_obligation
 
+if TYPE_CHECKING:
+    from owlready2 import Thing
+    from .proto import Obligation
 
-def get_url_for_ns(nm, ns):
-    return dict(nm.namespaces())[ns]
 
-def get_ns_for_url(nm, url):
-    return {v:k for k,v in nm.namespaces()}[url]
+def get_url_for_ns(namespaces: Dict[str, str], ns: str) -> str:
+    return namespaces[ns]
 
+def get_ns_for_url(namespaces: Dict[str, str], url: str) -> str:
+    return {v:k for k,v in namespaces.items()}[url]
 
-class OntologiableString:
-
-    graph = Graph()
-    nm = graph.namespace_manager
 
-    def __init__(self, s: str, namespaces: Optional[Dict[str, str]]=None):
-        for k, v in WELL_KNOWN.items():
-            self.nm.bind(k, v)
-        if namespaces:
-            for k, v in namespaces.items():
-                self.nm.bind(k, v)
-        self._s = s
+class OntologiableString:
+    '''
+    A (possibly prefixed) name of something in an ontology. The prefixes are resolved through `namespaces` (set up once, from `WELL_KNOWN`; see `bind`), and then the `namespaces` given to the constructor, which take precedence.
+    The instances are interned: the same string (resolved to the same ontology) gives the same instance, so it is resolved only once.
+    '''
+
+    namespaces = dict(WELL_KNOWN)  # type: Dict[str, str]  # prefix -> ontology URL
+
+    _interned = {}  # type: Dict[Tuple[type, str, Optional[str]], OntologiableString]
+
+    # Set in `__new__`
+    _s: str
+    prefix: Optional[str]
+    name: str
+    _url: Optional[str]
+    _onto: 'Thing'
+
+    @classmethod
+    def bind(cls, prefix: str, url: str) -> None:
+        '''
+        Make `prefix` refer to the ontology `url` in all instances created later.
+        '''
+        cls.namespaces[prefix] = url
+
+    @classmethod
+    def _resolve_prefix(cls, prefix: str, namespaces: Optional[Dict[str, str]]) -> str:
+        if namespaces and prefix in namespaces:
+            return namespaces[prefix]
+        return get_url_for_ns(cls.namespaces, prefix)
+
+    def __new__(cls, s: str, namespaces: Optional[Dict[str, str]]=None):
         parts = s.split(':')
         if len(parts) == 1:
-            self.prefix = None
-            self.name = parts[0]
-            self._onto = self._get_from_ontology(self.prefix, self.name)
+            prefix, name, url = None, parts[0], None
         elif len(parts) == 2:
-            self.prefix = parts[0]
-            self.name = parts[1]
-            self._onto = self._get_from_ontology(self.prefix, self.name)
+            prefix, name = parts
+            url = cls._resolve_prefix(prefix, namespaces)
         else:
             raise IllegalCaseError("String is neither a normal string nor an ontology reference")
+        key = (cls, s, url)
+        instance = OntologiableString._interned.get(key)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance._s = s
+            instance.prefix = prefix
+            instance.name = name
+            instance._url = url
+            instance._onto = instance._get_from_ontology(url, name)
+            OntologiableString._interned[key] = instance
+        return instance
+
+    def __init__(self, s: str, namespaces: Optional[Dict[str, str]]=None):
+        pass  # Everything is done in `__new__`, once for every interned instance
+
+    def __reduce__(self):
+        return (self.__class__, (self._s, {self.prefix: self._url} if self.prefix is not None else None))
 
-    def _get_from_ontology(self, prefix: Optional[str], name: str) -> Thing:
+    def _get_from_ontology(self, onto_url: Optional[str], name: str) -> 'Thing':
         return NotImplemented
 
-    def get(self) -> Thing:
+    def get(self) -> 'Thing':
         return self._onto
 
     def fully_quantified(self) -> str:
@@ -75,6 +110,9 @@ class OntologiableString:
         else:
             return NotImplemented
 
+    def __hash__(self):
+        return hash(self._onto)
+
     def __repr__(self):
         if self.prefix is not None:
             return f'{self.prefix}:{self.name}'
@@ -84,12 +122,5 @@ class OntologiableString:
 
 class ObligationOntoString(OntologiableString):
 
-    graph = Graph()
-    nm = graph.namespace_manager
-
-    def _get_from_ontology(self, prefix: Optional[str], name: str) -> Obligation:
-        if prefix is not None:
-            onto_url = get_url_for_ns(self.nm, prefix)
-        else:
-            onto_url = None
+    def _get_from_ontology(self, onto_url: Optional[str], name: str) -> 'Obligation':
         return get_obligation(onto_url, name)
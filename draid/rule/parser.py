@@ -13,14 +13,16 @@ The serialiser is defined in the classes.
 '''
 
 from dataclasses import dataclass
-from functools import partial
+from functools import lru_cache, partial
+import hashlib
 import json
 from lark import Lark, Transformer
+import marshal
 import re
-from typing import Dict, List, Optional, Union, Tuple, Type
+from typing import Any, Dict, Iterable, List, Optional, Union, Tuple, Type
 
 from .data_rule import ObligationDeclaration, DataRuleContainer, AttributeCapsule
-from .flow_rule import FlowRule, Propagate, Edit, Delete
+from .flow_rule import FlowRule
 
 
 class MalformedRuleException(Exception):
@@ -256,38 +258,86 @@ class TreeToFlowRuleContent(Transformer):
         return int(n)
 
 
-class TreeToFlowRuleObject(TreeToFlowRuleContent):
-    
-    def flow_rule(self, stmts):
-        return FlowRule(list(stmts))
-    
-    def propagate_stmt(self, items):
-        input_port, output_ports = items[0], items[1:]
-        return Propagate(input_port, output_ports)
-    
-    def edit_stmt(self, items):
-        input_port, output_port, name, type_old, value_old, type_new, value_new = [i for lst in items for i in lst]
-        return Edit(type_new, value_new, input_port, output_port, name, type_old, value_old)
-    
-    def delete_stmt(self, items):
-        input_port, output_port, name, type, value = [i for lst in items for i in lst]
-        return Delete(input_port, output_port, name, type, value)
+@lru_cache(maxsize=None)
+def _lark(grammar: str, start: str) -> Lark:
+    '''
+    Building a Lark parser is expensive (it analyses the grammar), so one is built for each grammar and start rule, and reused.
+    '''
+    return Lark(grammar, start=start)
 
 
 def make_parser_call_template(grammar: str, transformer: Type[Transformer]):
     def call_parser(rule: str, part: str):
-        data_rule_parser = Lark(grammar, start=part)
+        data_rule_parser = _lark(grammar, part)
         tree = data_rule_parser.parse(rule)
         return transformer().transform(tree)
     return call_parser
 
 
+# The version of the parsed (raw) form of the rules, i.e. the output of the `TreeTo*Content` transformers. Change it whenever they (or the grammars) change, to invalidate the stored parsed rules (see `rule_database_helper`).
+RAW_FORMAT_VERSION = '1-' + hashlib.sha1((DATA_RULE_GRAMMAR + FLOW_RULE_GRAMMAR).encode()).hexdigest()[:12]
+
+MARSHAL_VERSION = 4
+
+RAW_CACHE_SIZE = 10000  # The maximum number of parsed rules kept in `_raw_cache`
+
+_raw_cache = {}  # type: Dict[Tuple[str, str], bytes]  # (part, rule) -> the parsed (raw) rule, marshalled (so every use gets its own copy)
+
+
+def _call_parser_cached(grammar: str, transformer: Type[Transformer], rule: str, part: str):
+    '''
+    Parse `rule` (the `part` of the grammar) into the raw form, or take it from the cache of parsed rules (which can be filled from outside with `preload_raw`).
+    '''
+    key = (part, rule)
+    dumped = _raw_cache.get(key)
+    if dumped is not None:
+        return marshal.loads(dumped)
+    raw = make_parser_call_template(grammar, transformer)(rule, part)
+    try:
+        dumped = marshal.dumps(raw, MARSHAL_VERSION)
+    except ValueError:  # Something not plain in the raw form; never for the current transformers
+        return raw
+    _cache_raw(key, dumped)
+    return raw
+
+
+def _cache_raw(key: Tuple[str, str], dumped: bytes) -> None:
+    '''
+    Keep the parsed rule in the cache, dropping the oldest one if the cache is full (see `RAW_CACHE_SIZE`).
+    '''
+    if key not in _raw_cache and len(_raw_cache) >= RAW_CACHE_SIZE:
+        del _raw_cache[next(iter(_raw_cache))]
+    _raw_cache[key] = dumped
+
+
 def call_parser_data_rule(rule: str, part: str = 'data_rule'):
-    return make_parser_call_template(DATA_RULE_GRAMMAR, TreeToDataRuleContent)(rule, part)
+    return _call_parser_cached(DATA_RULE_GRAMMAR, TreeToDataRuleContent, rule, part)
 
 
 def call_parser_flow_rule(rule: str, part: str = 'flow_rule'):
-    return make_parser_call_template(FLOW_RULE_GRAMMAR, TreeToFlowRuleContent)(rule, part)
+    return _call_parser_cached(FLOW_RULE_GRAMMAR, TreeToFlowRuleContent, rule, part)
+
+
+def dump_raw(rules: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], bytes]:
+    '''
+    Parse the `rules` (pairs of the grammar part, 'data_rule' or 'flow_rule', and the rule) into their raw forms, marshalled, to be stored and given to `preload_raw` later. Malformed rules are left out.
+    '''
+    parsed = {}
+    for part, rule in rules:
+        call = call_parser_flow_rule if part == 'flow_rule' else call_parser_data_rule
+        try:
+            parsed[(part, rule)] = marshal.dumps(call(rule, part), MARSHAL_VERSION)
+        except Exception:
+            continue
+    return parsed
+
+
+def preload_raw(parsed: Dict[Tuple[str, str], bytes]) -> None:
+    '''
+    Fill the cache of parsed rules with those from `dump_raw`, so that they are not parsed again. The cache stays within `RAW_CACHE_SIZE`, as when rules are parsed.
+    '''
+    for key, dumped in parsed.items():
+        _cache_raw(key, dumped)
 
 
 def parse_data_rule(data_rule: str) -> Optional[DataRuleContainer]:
@@ -310,5 +360,4 @@ def parse_data_rule(data_rule: str) -> Optional[DataRuleContainer]:
 def parse_flow_rule(flow_rule: Optional[str]) -> Optional[FlowRule]:
     if flow_rule is None:
         return None
-    return make_parser_call_template(FLOW_RULE_GRAMMAR, TreeToFlowRuleObject)(flow_rule, 'flow_rule')
-
+    return FlowRule.from_raw(call_parser_flow_rule(flow_rule, 'flow_rule'))
@@ -13,10 +13,18 @@
 
 from .obligation import (
         WELL_KNOWN,
-        Obligation,
         get_obligation,
         )
 
-from owlready2 import (
-        Thing,
-        )
+
+def __getattr__(name):
+    '''
+    `Obligation` (and `Thing`) need the ontology (and owlready2) loaded, so they are only imported when used.
+    '''
+    if name == 'Obligation':
+        from .obligation import Obligation
+        return Obligation
+    if name == 'Thing':
+        from owlready2 import Thing
+        return Thing
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
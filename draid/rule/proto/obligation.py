@@ -11,8 +11,7 @@
 
 '''
 
-from owlready2 import Thing
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
 from draid.defs.exception import OntologyTypeException
 
@@ -26,15 +25,48 @@ WELL_KNOWN = {
         }
 
 
-base_onto = import_ontology("core.owl")
+_base = None
 
 
-with base_onto:
-    class Obligation(Thing):
-        pass
+def _load_base():
+    '''
+    Load the core ontology and define the `Obligation` class in it, on first use rather than when this module is imported.
+    '''
+    global _base
+    if _base is None:
+        from owlready2 import Thing
+        base_onto = import_ontology("core.owl")
+        with base_onto:
+            class Obligation(Thing):
+                pass
+        _base = (base_onto, Obligation)
+    return _base
 
 
-def get_obligation(onto_url: Optional[str], name: str) -> Obligation:
+def __getattr__(name):
+    if name == 'base_onto':
+        return _load_base()[0]
+    if name == 'Obligation':
+        return _load_base()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_obligations = {}  # type: Dict[Tuple[Optional[str], str], Any]  # The resolved obligations (the `Obligation` classes in the ontologies), by (ontology, name)
+
+
+def get_obligation(onto_url: Optional[str], name: str) -> Any:
+    '''
+    The obligation `name` in the ontology `onto_url` (the core ontology if `None`). Resolved through the ontology once, and then looked up from `_obligations`.
+    '''
+    key = (onto_url or None, name)
+    ob_class = _obligations.get(key)
+    if ob_class is None:
+        ob_class = _obligations[key] = _resolve_obligation(onto_url, name)
+    return ob_class
+
+
+def _resolve_obligation(onto_url: Optional[str], name: str) -> Any:
+    base_onto, Obligation = _load_base()
     if onto_url:
         onto = import_ontology(onto_url)
     else:
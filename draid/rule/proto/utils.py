@@ -12,12 +12,24 @@
 '''
 
 import os
-from owlready2 import onto_path, get_ontology
+
+from typing import Any, Dict
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
-onto_path.append(dir_path)
+
+_ontologies = {}  # type: Dict[str, Any]  # The ontologies loaded by `import_ontology`, by the name they are imported with
 
 def import_ontology(name):
+    '''
+    Load the ontology `name` (a file name in this directory, or a URL), only once per process.
+    '''
+    onto = _ontologies.get(name)
+    if onto is not None:
+        return onto
+    from owlready2 import onto_path, get_ontology  # owlready2 is only imported when an ontology is needed
+    if dir_path not in onto_path:
+        onto_path.append(dir_path)
     onto = get_ontology(name)
     onto.load()
+    _ontologies[name] = onto
     return onto
@@ -9,62 +9,93 @@
 
 '''
 This module contains the helper functions for reading and writing to the additional rule database.
+There are two backends: a JSON rule DB (`JSONRuleDB`) is read as a whole, and an SQLite rule DB (a name ending with one of `SQLITE_SUFFIXES`; `SQLiteRuleDB`) is indexed, so only the entries of the components and data in the current graph are fetched. The rule DBs of `setting.RULE_DB` are opened (in that order) by `init_default`, and looked up through `injected_rules` and `links_to`.
 '''
 
 import json
 import logging
+import marshal
+import os
+import sqlite3
 
 from rdflib import URIRef
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from . import setting
 
 from .defs.exception import ParseError
 from .graph_wrapper import GraphWrapper
+from . import injection
 from .injection import Link
+from .rule import parser
 
 
 logger = logging.getLogger(__name__)
 
 
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+_rule_dbs = []  # type: List[Union[JSONRuleDB, SQLiteRuleDB]]  # In the order of `setting.RULE_DB`
+
+
 def init_default():
     '''
-    Read the rule database, using the information from setting and write it back (merge it) to setting.
+    Open the rule databases in `setting.RULE_DB`. Their rules are looked up when needed (see `injected_rules`).
     '''
-    for rule_db_filename in setting.RULE_DB:
-        try:
-            with open(rule_db_filename, 'r') as f:
-                extra_rules = json.load(f)
-                try:
-                    extra_data_rules = _segmented_parse(extra_rules['data_rules'], _parse_data_rule_graph)
-                    _merge_injection(setting.INJECTED_DATA_RULE, extra_data_rules)
-                except KeyError:
-                    pass
-                try:
-                    extra_imported_rules = _segmented_parse(extra_rules['imported_rules'], _parse_imported_rule_graph)
-                    _merge_injection(setting.INJECTED_IMPORTED_RULE, extra_imported_rules)
-                except KeyError:
-                    pass
-                try:
-                    extra_flow_rules = _segmented_parse(extra_rules['flow_rules'], _parse_flow_rule_graph)
-                    _merge_injection(setting.INJECTED_FLOW_RULE, extra_flow_rules)
-                except KeyError:
-                    pass
-
-                try:
-                    links = _parse_link(extra_rules['link'])
-                    setting.LINK.extend(links)
-                except KeyError:
-                    pass
-        except FileNotFoundError:
-            pass
+    open_rule_dbs()
 
-def _merge_injection(merge_to, merge_from):
-    for k, v in merge_from.items():
-        if k in merge_to:
-            merge_to[k].update(v)
-        else:
-            merge_to[k] = v
+_rule_db_cache = {}  # type: Dict[str, Tuple[Tuple[int, int], Dict]]
+
+def _load_rule_db(filename: str) -> Dict:
+    '''
+    Read the (raw) content of the rule database `filename`. The content is cached until the file changes (by modification time and size), so that long-running processes don't re-read unchanged databases. The returned value should not be modified.
+    '''
+    stat = os.stat(filename)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _rule_db_cache.get(filename)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(filename, 'r') as f:
+        content = json.load(f)
+    if setting.RULE_DB_CACHE:
+        _load_parsed_rules(filename, key, content)
+    _rule_db_cache[filename] = (key, content)
+    return content
 
+def _rule_strings(content: Dict) -> Iterable[Tuple[str, str]]:
+    '''
+    All the rules in the (raw) content of a rule DB, as pairs of the grammar part (see `parser.dump_raw`) and the rule.
+    '''
+    for section_name, part in (('data_rules', 'data_rule'), ('imported_rules', 'data_rule'), ('flow_rules', 'flow_rule')):
+        for section_graph in content.get(section_name, {}).values():
+            for column in ('uri', 'function'):
+                for value in section_graph.get(column, {}).values():
+                    for rule_str in ([value] if isinstance(value, str) else value.values()):
+                        if isinstance(rule_str, str):
+                            yield (part, rule_str)
+
+def _load_parsed_rules(filename: str, key: Tuple[int, int], content: Dict) -> None:
+    '''
+    Load the parsed rules of the rule DB `filename` from its sidecar file (`<filename>.parsed`; marshalled), so that they are not parsed again. If the sidecar is missing or outdated (by the modification time and size of the rule DB, and `parser.RAW_FORMAT_VERSION`), all the rules are parsed and the sidecar is rewritten.
+    '''
+    sidecar = filename + '.parsed'
+    header = (parser.RAW_FORMAT_VERSION, key[0], key[1])
+    try:
+        with open(sidecar, 'rb') as f:
+            stored_header, parsed = marshal.load(f)
+        if stored_header == header:
+            parser.preload_raw(parsed)
+            return
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    parsed = parser.dump_raw(set(_rule_strings(content)))
+    try:
+        tmp_filename = sidecar + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            marshal.dump((header, parsed), f, parser.MARSHAL_VERSION)
+        os.replace(tmp_filename, sidecar)
+    except OSError as e:
+        logger.warning("Failed to write the parsed rules of %s: %s", filename, e)
 
 def _segmented_parse(section, f_parse_graph):
     rules = {}
@@ -157,6 +188,226 @@ def _parse_link(section):
     return links
 
 
+def open_rule_dbs() -> None:
+    '''
+    (Re-)open the rule DBs in `setting.RULE_DB`. The missing ones are skipped.
+    '''
+    close_rule_dbs()
+    injection.clear_cache()
+    for rule_db_filename in setting.RULE_DB:
+        if not os.path.exists(rule_db_filename):
+            continue
+        if rule_db_filename.endswith(SQLITE_SUFFIXES):
+            _rule_dbs.append(SQLiteRuleDB(rule_db_filename))
+        else:
+            _rule_dbs.append(JSONRuleDB(rule_db_filename))
+
+
+def close_rule_dbs() -> None:
+    for db in _rule_dbs:
+        db.close()
+    _rule_dbs.clear()
+
+
+_INJECTED = {
+        'data': 'INJECTED_DATA_RULE',
+        'imported': 'INJECTED_IMPORTED_RULE',
+        'flow': 'INJECTED_FLOW_RULE',
+        }
+
+
+def injected_rules(kind: str, graph_id: Optional[URIRef], keys: Iterable) -> Dict:
+    '''
+    The injected rules of `kind` ('data', 'imported' or 'flow') in the section of `graph_id` (`None` for the universal section), but only those of the `keys` (the URIs of components or data, or the function names).
+    The rules come from `setting.INJECTED_*` and then the rule DBs in the order of `setting.RULE_DB`, later ones overriding earlier ones.
+    '''
+    keys = list(keys)
+    section = getattr(setting, _INJECTED[kind]).get(graph_id, {})
+    rules = {key: section[key] for key in keys if key in section}
+    for db in _rule_dbs:
+        rules.update(db.rules(kind, graph_id, keys))
+    return rules
+
+
+def links_to(to_uri: URIRef) -> List[Link]:
+    '''
+    The links whose target is `to_uri`: those in `setting.LINK` and then those in the rule DBs, in the order of `setting.RULE_DB`.
+    '''
+    links = [link for link in setting.LINK if link.to_uri == to_uri]  # Only the links written in the settings, so few
+    for db in _rule_dbs:
+        links.extend(db.links_to(to_uri))
+    return links
+
+
+class JSONRuleDB:
+    '''
+    The rule DB backed by a JSON file, which is read (and its rules parsed) as a whole when opened. Its links are indexed by the target.
+    '''
+
+    def __init__(self, filename: str):
+        content = _load_rule_db(filename)
+        self._rules = {
+                'data': _segmented_parse(content.get('data_rules', {}), _parse_data_rule_graph),
+                'imported': _segmented_parse(content.get('imported_rules', {}), _parse_imported_rule_graph),
+                'flow': _segmented_parse(content.get('flow_rules', {}), _parse_flow_rule_graph),
+                }
+        self._links = {}  # type: Dict[URIRef, List[Link]]
+        for link in _parse_link(content.get('link', {})):
+            self._links.setdefault(link.to_uri, []).append(link)
+
+    def close(self):
+        pass
+
+    def rules(self, kind: str, graph_id: Optional[URIRef], keys: List) -> Dict:
+        '''
+        See `injected_rules`.
+        '''
+        section = self._rules[kind].get(graph_id, {})
+        return {key: section[key] for key in keys if key in section}
+
+    def links_to(self, to_uri: URIRef) -> List[Link]:
+        return self._links.get(to_uri, [])
+
+
+_SCHEMA_VERSION = 1  # Stored as `PRAGMA user_version`. Version 0 allowed NULL in `uri` and `function`, which defeated the UNIQUE constraint.
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rule (
+    kind TEXT NOT NULL,  -- 'data', 'imported' or 'flow'
+    graph TEXT NOT NULL,  -- '' for the universal section
+    uri TEXT NOT NULL DEFAULT '',  -- Either `uri` or `function` is set; the other is '' (rather than NULL, so that the UNIQUE constraint holds)
+    function TEXT NOT NULL DEFAULT '',
+    port TEXT NOT NULL DEFAULT '',  -- The (virtual) port of imported rules; '' for the default one
+    rule TEXT NOT NULL,
+    UNIQUE (kind, graph, uri, function, port)
+);
+CREATE INDEX IF NOT EXISTS rule_uri ON rule (kind, graph, uri);
+CREATE INDEX IF NOT EXISTS rule_function ON rule (kind, graph, function);
+CREATE TABLE IF NOT EXISTS link (
+    from_graph TEXT NOT NULL,
+    from_uri TEXT NOT NULL,
+    to_graph TEXT NOT NULL,
+    to_uri TEXT NOT NULL,
+    UNIQUE (from_graph, from_uri, to_graph, to_uri)
+);
+CREATE INDEX IF NOT EXISTS link_to_uri ON link (to_uri);
+'''
+
+# Keeps the last one of the duplicated rows (inserted later, by `INSERT OR REPLACE`)
+_MIGRATE_FROM_0 = '''
+ALTER TABLE rule RENAME TO rule_0;
+DROP INDEX IF EXISTS rule_uri;
+DROP INDEX IF EXISTS rule_function;
+''' + _SCHEMA + '''
+INSERT OR REPLACE INTO rule (kind, graph, uri, function, port, rule)
+    SELECT kind, graph, COALESCE(uri, ''), COALESCE(function, ''), port, rule FROM rule_0 ORDER BY rowid;
+DROP TABLE rule_0;
+'''
+
+_SQL_CHUNK_SIZE = 500  # The maximum number of keys in one query (SQLite limits the number of parameters)
+
+
+class SQLiteRuleDB:
+    '''
+    The rule DB backed by SQLite, indexed by (graph, uri) and (graph, function), so that only the rules of the current graph are read.
+    It has the same sections as the JSON rule DB; `import_json` converts one.
+    '''
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        try:
+            self._init_schema()
+        except Exception:
+            self._conn.close()
+            raise
+
+    def _init_schema(self) -> None:
+        '''
+        Create the tables, or migrate them from an older schema. Raises `ParseError` if the schema is newer than this version knows.
+        '''
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > _SCHEMA_VERSION:
+            raise ParseError("The rule DB {} has the schema version {}, newer than the supported {}".format(self._filename, version, _SCHEMA_VERSION))
+        if version == _SCHEMA_VERSION:
+            return
+        has_rules = self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rule'").fetchone()
+        if has_rules:
+            logger.info("Migrating the rule DB %s from the schema version %d", self._filename, version)
+        self._conn.executescript('BEGIN; {} PRAGMA user_version = {}; COMMIT;'.format(_MIGRATE_FROM_0 if has_rules else _SCHEMA, _SCHEMA_VERSION))
+
+    def close(self):
+        self._conn.close()
+
+    def _select(self, kind: str, graph: str, column: str, keys: List[str]):
+        for i in range(0, len(keys), _SQL_CHUNK_SIZE):
+            chunk = keys[i:i+_SQL_CHUNK_SIZE]
+            yield from self._conn.execute('SELECT {}, port, rule FROM rule WHERE kind = ? AND graph = ? AND {} IN ({})'.format(column, column, ', '.join('?' * len(chunk))),
+                    [kind, graph] + chunk)
+
+    def rules(self, kind: str, graph_id: Optional[URIRef], keys: List) -> Dict:
+        '''
+        See `injected_rules`. The URIs are `URIRef`s, and the function names are plain strings.
+        '''
+        graph = str(graph_id) if graph_id else ''
+        uris = [str(key) for key in keys if isinstance(key, URIRef)]
+        functions = [key for key in keys if not isinstance(key, URIRef)]
+        rules = {}  # type: Dict
+        for column, values, to_key in (('uri', uris, URIRef), ('function', functions, str)):
+            if not values:
+                continue
+            for key, port, rule_str in self._select(kind, graph, column, values):
+                if kind == 'imported':
+                    rules.setdefault(to_key(key), {})[port if port else None] = rule_str
+                else:
+                    rules[to_key(key)] = rule_str
+        return rules
+
+    def links_to(self, to_uri: URIRef) -> List[Link]:
+        rows = self._conn.execute('SELECT from_graph, from_uri, to_graph, to_uri FROM link WHERE to_uri = ?', (str(to_uri),))
+        return [Link(URIRef(from_graph) if from_graph else None, URIRef(from_uri), URIRef(to_graph) if to_graph else None, URIRef(to_uri_s)) for from_graph, from_uri, to_graph, to_uri_s in rows]
+
+    def update_data_rules(self, data_rules: Dict[str, str], graph: str = '') -> None:
+        '''
+        Add (or replace) the data rules, in one transaction. Unchanged rules are not rewritten.
+        '''
+        with self._conn:
+            self._conn.executemany("INSERT INTO rule (kind, graph, uri, function, port, rule) VALUES ('data', ?, ?, '', '', ?) "
+                    "ON CONFLICT (kind, graph, uri, function, port) DO UPDATE SET rule = excluded.rule WHERE rule != excluded.rule",
+                    [(graph, uri, rule_str) for uri, rule_str in data_rules.items()])
+
+    def import_json(self, content: Dict) -> None:
+        '''
+        Add the content of a JSON rule DB (as read by `json.load`).
+        '''
+        rows = []
+        for kind in _INJECTED:
+            for graph, section in content.get(kind + '_rules', {}).items():
+                for column in ('uri', 'function'):
+                    for key, value in section.get(column, {}).items():
+                        ports = {'': value} if isinstance(value, str) else value
+                        for port, rule_str in ports.items():
+                            uri, function = (key, '') if column == 'uri' else ('', key)
+                            rows.append((kind, graph, uri, function, port or '', rule_str))
+        self._conn.executemany('INSERT OR REPLACE INTO rule (kind, graph, uri, function, port, rule) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        links = [(link.from_graph or '', link.from_uri, link.to_graph or '', link.to_uri) for link in _parse_link(content.get('link', {}))]
+        self._conn.executemany('INSERT OR IGNORE INTO link (from_graph, from_uri, to_graph, to_uri) VALUES (?, ?, ?, ?)', links)
+        self._conn.commit()
+
+
+def json_to_sqlite(json_filename: str, sqlite_filename: str) -> None:
+    '''
+    Convert (add) the JSON rule DB `json_filename` into the SQLite rule DB `sqlite_filename`.
+    '''
+    with open(json_filename) as fd:
+        content = json.load(fd)
+    db = SQLiteRuleDB(sqlite_filename)
+    try:
+        db.import_json(content)
+    finally:
+        db.close()
+
+
 def update_db_default(graph: GraphWrapper) -> None:
     '''
     Update the database with the new data rules obtained from the reasoner. Note this should be called after performing the reasoning.
@@ -165,24 +416,76 @@ def update_db_default(graph: GraphWrapper) -> None:
     if setting.DB_WRITE_TO is None:
         return
 
+    update_db_with_data_rules(data_rules_of(graph))
+
+
+def data_rules_of(graph: GraphWrapper) -> Dict[str, str]:
+    '''
+    The (dumped, compact) data rules of all data in the `graph`, in the form stored in the database.
+    '''
     data_rules = {}
     for data in graph.data():
         data_rule = graph.get_data_rule(data)
         if data_rule:
-            data_rules[str(data)] = data_rule.dump()
+            data_rules[str(data)] = data_rule.dump(compact=True)
+    return data_rules
+
+
+def update_db_with_data_rules(data_rules: Dict[str, str]) -> None:
+    '''
+    Same as `update_db_default`, but takes the dumped data rules (see `data_rules_of`) rather than the graph.
+    Only the changed rules are written. Nothing is written (and the rule DB is not created) if there are no data rules. A JSON rule DB is rewritten atomically (into a temporary file, which then replaces it), and only if anything changed; use `RuleDBWriter` to write the rules of many graphs at once.
+    '''
+    if setting.DB_WRITE_TO is None or not data_rules:
+        return
 
     out_db_filename = setting.RULE_DB[-1] if setting.DB_WRITE_TO == True else setting.DB_WRITE_TO
+    if out_db_filename.endswith(SQLITE_SUFFIXES):
+        db = SQLiteRuleDB(out_db_filename)
+        try:
+            db.update_data_rules(data_rules)
+        finally:
+            db.close()
+        injection.clear_cache()
+        return
     db_rules = {}
     try:
         with open(out_db_filename, 'r') as f:
             db_rules = json.load(f)
     except FileNotFoundError:
         pass
-    if 'data_rules' not in db_rules:
-        db_rules['data_rules'] = {}
-    if '' not in db_rules['data_rules']:
-        db_rules['data_rules'][''] = {}
-    db_rules['data_rules'][''].update(data_rules)
-    with open(out_db_filename, 'w') as f:
+    section = db_rules.setdefault('data_rules', {}).setdefault('', {})
+    changed = {uri: rule_str for uri, rule_str in data_rules.items() if section.get(uri) != rule_str}
+    if not changed:
+        return
+    section.update(changed)
+    tmp_filename = '{}.{}.tmp'.format(out_db_filename, os.getpid())  # Per process, so that concurrent runs don't write into the same temporary file
+    with open(tmp_filename, 'w') as f:
         f.write(json.dumps(db_rules, indent=4))
+    os.replace(tmp_filename, out_db_filename)
+    injection.clear_cache()
+
+
+class RuleDBWriter:
+    '''
+    Collects the data rules of (many) graphs, and writes them into the rule DB (see `update_db_with_data_rules`) once, when flushed.
+    '''
+
+    def __init__(self):
+        self._data_rules = {}  # type: Dict[str, str]
+
+    def add(self, data_rules: Dict[str, str]) -> None:
+        self._data_rules.update(data_rules)
+
+    def flush(self) -> None:
+        update_db_with_data_rules(self._data_rules)
+        self._data_rules = {}
+
 
+if __name__ == '__main__':
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Convert a JSON rule DB into an (indexed) SQLite rule DB')
+    arg_parser.add_argument('json_db', help='The JSON rule DB to read')
+    arg_parser.add_argument('sqlite_db', help='The SQLite rule DB to write to (added to, if it exists)')
+    args = arg_parser.parse_args()
+    json_to_sqlite(args.json_db, args.sqlite_db)
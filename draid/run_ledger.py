@@ -0,0 +1,75 @@
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/13 11:02:48
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The run ledger records which provenance graphs have been processed, so that later runs only process new or changed graphs.
+A graph is identified by its IRI, and its content by a fingerprint of its `startTime`, its size and the digest of its triples (see `SProvHelper.get_graphs_summary`). Changes of blank node labels alone are not seen as changes.
+'''
+
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+import os
+
+from rdflib import URIRef
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(summary: Dict[str, str]) -> str:
+    content = "{}|{}|{}".format(summary.get('startTime', ''), summary.get('size', ''), summary.get('digest', ''))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class RunLedger:
+    '''
+    The ledger is stored as a JSON file, mapping every processed graph to its `startTime`, fingerprint and the time it was processed.
+    Recorded entries are only persisted by `write()`, which should be called after the results are stored.
+    '''
+
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._entries = {}  # type: Dict[str, Dict[str, Optional[str]]]
+        self.reload()
+
+    def reload(self):
+        try:
+            with open(self._filename) as fd:
+                self._entries = json.load(fd)
+        except FileNotFoundError:
+            self._entries = {}
+
+    def write(self):
+        tmp = self._filename + '.tmp'
+        with open(tmp, 'w') as fd:
+            json.dump(self._entries, fd, indent=1)
+        os.replace(tmp, self._filename)
+
+    def is_processed(self, graph: URIRef, summary: Dict[str, str]) -> bool:
+        entry = self._entries.get(str(graph))
+        return entry is not None and entry['fingerprint'] == fingerprint(summary)
+
+    def pending(self, graphs: List[URIRef], summaries: Dict[URIRef, Dict[str, str]]) -> List[URIRef]:
+        '''
+        The `graphs` which are new, or have changed since they were recorded.
+        '''
+        ret = [graph for graph in graphs if not self.is_processed(graph, summaries.get(graph, {}))]
+        logger.info("%d of %d graphs are new or changed", len(ret), len(graphs))
+        return ret
+
+    def record(self, graph: URIRef, summary: Dict[str, str]) -> None:
+        self._entries[str(graph)] = {
+                'startTime': summary.get('startTime'),
+                'fingerprint': fingerprint(summary),
+                'processed': datetime.now(timezone.utc).isoformat(),
+                }
+
+    def get(self, graph: URIRef) -> Optional[Dict[str, Optional[str]]]:
+        return self._entries.get(str(graph))
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/14 10:32:05
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The long-running reasoning service. It accepts reasoning jobs (see `draid.jobs.JobSpec`) through a local HTTP/JSON API, and runs them in a fixed number of worker processes which stay warm across jobs.
+
+API:
+    POST /jobs          Submit a job (JSON object of `JobSpec`). Returns 202 with the job ID, or 503 if the queue is full.
+    GET  /jobs          List the jobs and their status.
+    GET  /jobs/<id>     The status of the job, and its result (or error) once finished.
+    GET  /status        The number of workers, queued and running jobs.
+'''
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+
+from typing import Any, Dict, Optional
+
+from . import setting
+from .jobs import JobSpec, init_job_process, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    '''
+    Runs the jobs in `workers` processes (the concurrency limit), with at most `max_queue` jobs waiting or running at the same time.
+    The processes are spawned (so each has its own Prolog engine) and initialised once, by `jobs.init_job_process`.
+    '''
+
+    def __init__(self, workers: int, max_queue: int, keep_finished: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.keep_finished = keep_finished
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_job_process)
+        self._jobs = {}  # type: Dict[str, Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def _status(self, future: Future) -> str:
+        if not future.done():
+            return 'running' if future.running() else 'queued'
+        if future.cancelled():  # By `shutdown`
+            return 'cancelled'
+        return 'failed' if future.exception() else 'done'
+
+    def _pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job['future'].done())
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job['future'].done()]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def submit(self, spec: JobSpec) -> str:
+        with self._lock:
+            if self._pending() >= self.max_queue:
+                raise QueueFullError()
+            self._prune()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                    'spec': spec,
+                    'submitted': time.time(),
+                    'future': self._executor.submit(run_job, spec),
+                    }
+        logger.info("Job %s submitted: %s", job_id, spec.source)
+        return job_id
+
+    def describe(self, job_id: str, with_result=True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job['future']
+        ret = {
+                'id': job_id,
+                'status': self._status(future),
+                'submitted': job['submitted'],
+                'spec': job['spec'].to_dict(),
+                }
+        if with_result and future.done() and not future.cancelled():
+            if future.exception():
+                ret['error'] = repr(future.exception())
+            else:
+                ret['result'] = future.result()
+        return ret
+
+    def list(self):
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.describe(job_id, with_result=False) for job_id in job_ids]
+
+    def status(self) -> Dict[str, int]:
+        statuses = [job['status'] for job in self.list()]
+        return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': statuses.count('queued'),
+                'running': statuses.count('running'),
+                }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_handler(queue: JobQueue):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+        def _reply(self, status: int, obj) -> None:
+            body = json.dumps(obj).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = [p for p in self.path.split('?')[0].split('/') if p]
+            if parts == ['status']:
+                self._reply(200, queue.status())
+            elif parts == ['jobs']:
+                self._reply(200, queue.list())
+            elif len(parts) == 2 and parts[0] == 'jobs':
+                job = queue.describe(parts[1])
+                if job is None:
+                    self._reply(404, {'error': 'No such job'})
+                else:
+                    self._reply(200, job)
+            else:
+                self._reply(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            if self.path.split('?')[0].rstrip('/') != '/jobs':
+                self._reply(404, {'error': 'Not found'})
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                spec = JobSpec.from_dict(json.loads(self.rfile.read(length) or b'null'))
+            except ValueError as e:  # Including JSONDecodeError
+                self._reply(400, {'error': str(e)})
+                return
+            try:
+                job_id = queue.submit(spec)
+            except QueueFullError:
+                self._reply(503, {'error': 'The job queue is full'})
+                return
+            self._reply(202, {'id': job_id, 'status': 'queued'})
+
+    return Handler
+
+
+class Service:
+    '''
+    The HTTP server of the API, serving on `host`:`port` (`port` 0 means a random free port). Use as a context manager, or call `serve_forever()`.
+    '''
+
+    def __init__(self, host: str = setting.SERVICE_HOST, port: int = setting.SERVICE_PORT, workers: int = setting.SERVICE_WORKERS, max_queue: int = setting.SERVICE_MAX_QUEUE, keep_finished: int = setting.SERVICE_KEEP_FINISHED):
+        self.queue = JobQueue(workers, max_queue, keep_finished)
+        self._server = ThreadingHTTPServer((host, port), make_handler(self.queue))
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        logger.log(99, "Serving on %s", self.url)
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._server.server_close()
+        self.queue.shutdown()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self.close()
+
+
+def console_entry():
+    import argparse
+    import coloredlogs
+
+    logging.basicConfig()
+    coloredlogs.install(level='INFO')
+
+    parser = argparse.ArgumentParser(description='Run DR.Aid as a long-running service, accepting reasoning jobs through a HTTP/JSON API.')
+    parser.add_argument('--host', default=setting.SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=setting.SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=setting.SERVICE_WORKERS,
+            help='The number of worker processes, i.e. the maximum number of jobs running at the same time.')
+    parser.add_argument('--max-queue', type=int, default=setting.SERVICE_MAX_QUEUE,
+            help='The maximum number of jobs waiting or running. New jobs are rejected when it is reached.')
+    args = parser.parse_args()
+
+    Service(args.host, args.port, args.workers, args.max_queue).serve_forever()
+
+
+if __name__ == '__main__':
+    console_entry()
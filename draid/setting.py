@@ -11,17 +11,79 @@ SCHEME = 'CWLPROV'
 
 AIO = False
 
-RULE_DB = ['rule-db.json']  # Multiple DB entries can be accepted, and they will be queried in the specified order.
+RULE_DB = ['rule-db.json']  # Multiple DB entries can be accepted, and they will be queried in the specified order (the rules of later ones override those of earlier ones). Names ending with '.db', '.sqlite' or '.sqlite3' are (indexed) SQLite databases, whose rules are only read when needed; the others are JSON files.
 
 DB_WRITE_TO = None  # `None` means don't write; `True` means write to the last `RULE_DB` file; a string means the file to write to.
 
-OBLIGATION_DB = None  # A string (or `None`) representing the filepath of the obligation DB. Probably you want to use 'obligation-db.json'
+RULE_DB_CACHE = True  # Keep the parsed rules of every JSON rule DB in a sidecar file ('<rule DB>.parsed'), so that the rules of unchanged rule DBs are not parsed again in later runs.
+
+OBLIGATION_DB = None  # A string (or `None`) representing the filepath of the obligation DB. Probably you want to use 'obligation-db.json'. Names ending with '.db', '.sqlite' or '.sqlite3' are SQLite databases (indexed; better for large stores). Names ending with '.jsonl' are append-only JSON-Lines files (cheap to write; can be shared by concurrent runs).
+
+OBLIGATION_LOG_COMPACT_RATIO = 2  # (JSON-Lines obligation DB only) Compact (rewrite) the file, when the store is closed (not on every write), if it has more than this times as many lines as (distinct) obligations
+
+COMPONENT_CHUNK_SIZE = 500  # The maximum number of components put into one query when retrieving the component information (parameters). Large lists are split into multiple queries.
+
+QUERY_CONCURRENCY = 4  # The maximum number of (independent) queries sent to the SPARQL endpoint at the same time
+
+STREAM_INGESTION = False  # Retrieve the provenance graphs as N-Triples and parse them while receiving, rather than parsing the whole response (RDF/XML or Turtle) at once. Reduces the peak memory for large graphs, but requires the endpoint to support N-Triples.
+
+BULK_FETCH = False  # (S-Prov only) Retrieve the information of all the graphs with a few queries in one go (one per kind of information), rather than several queries for each graph. Useful when there are many small graphs.
+
+WRITE_BACK = False  # Write the augmented graph (the provenance graph + rules + activated obligations) back to the RDF store, into a dedicated named graph for each provenance graph (see `AUGMENTED_GRAPH_NAMESPACE`). Any existing content of that named graph is replaced.
+
+WRITE_BACK_BATCH_SIZE = 5000  # The maximum number of triples sent in one request when writing back
+
+UPDATE_ENDPOINT = None  # The SPARQL Update endpoint, if different from the query endpoint (e.g. Fuseki's `/update`)
+
+GRAPH_STORE_ENDPOINT = None  # The SPARQL Graph Store Protocol endpoint (e.g. Fuseki's `/data`). If set, write-back uploads the graph through it (PUT + POST) rather than SPARQL Update.
+
+LEDGER = None  # (S-Prov only) A string (or `None`) representing the filepath of the run ledger. If present, only the graphs which are new or changed since the last run (recorded in the ledger) are processed.
+
+CHECKPOINT = None  # A string (or `None`) representing the filepath of the checkpoint. If present, the progress is recorded there after every batch (topological level), and the checkpoint is removed when the run finishes. Not supported when running in parallel (`JOBS` > 1).
+
+RESUME = False  # Resume from the `CHECKPOINT` (if it exists) rather than starting over.
+
+JOBS = 1  # (S-Prov only) The number of worker processes reasoning over different graphs in parallel. `1` means everything is done in the current process.
+
+PIPELINE = False  # (S-Prov only) Overlap fetching the next graphs, reasoning the current graph and writing (the results of) the previous graphs, rather than doing them one after another. Not used when running in parallel (`JOBS` > 1).
+
+PIPELINE_PREFETCH = 2  # The maximum number of graphs being fetched ahead in the pipeline
+
+PIPELINE_WRITE_DEPTH = 2  # The maximum number of reasoned graphs waiting to be written in the pipeline
+
+DRAW = False  # Draw every reasoned graph (with rules and activated obligations) into `graph_{i}.{DRAW_FORMAT}` (in `DRAW_DIR`). Requires pygraphviz.
+
+DRAW_DIR = None  # A string (or `None`, meaning the current directory) representing the directory the graphs are drawn into
+
+DRAW_FORMAT = 'png'  # Any output format of Graphviz, e.g. 'png', 'svg', 'pdf'
+
+DRAW_JOBS = 1  # The number of background processes laying out and drawing the graphs. `0` means drawing in the current process (blocking the reasoning).
+
+DRAW_CACHE = None  # A string (or `None`) representing a directory caching the drawn graphs by the fingerprint of the graph and the rules. Unchanged graphs are copied from there rather than laid out again.
+
+# The long-running service (`draid-service`, see `draid.service`)
+
+SERVICE_HOST = '127.0.0.1'
+
+SERVICE_PORT = 8093
+
+SERVICE_WORKERS = 1  # The number of worker processes, i.e. the maximum number of jobs running at the same time. Every worker has its own Prolog engine.
+
+SERVICE_MAX_QUEUE = 64  # The maximum number of jobs waiting or running. New jobs are rejected when it is reached.
+
+SERVICE_KEEP_FINISHED = 1000  # The number of finished jobs (and their results) kept for querying. Older ones are forgotten.
+
+# The batch runner (`draid-batch`, see `draid.batch`)
+
+BATCH_WORKERS = 2  # The number of worker processes, i.e. the maximum number of jobs of the manifest running at the same time
 
 
 # Internal configurations. Normally they do not need to change, unless the you know what they are
 
 IMPORT_PORT_NAME = 'imported_rule'
 
+AUGMENTED_GRAPH_NAMESPACE = 'http://draid/augmented/'  # The prefix of the IDs of the named graphs storing the augmented graphs. These graphs are not seen as provenance graphs.
+
 
 # Rule injection
 
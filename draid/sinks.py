@@ -0,0 +1,120 @@
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/16 14:20:52
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The sinks of the per-graph results. `main.main` hands the results of every graph to the sinks as soon as the graph is reasoned, and then releases the graph, so the memory is bounded by the largest graph rather than growing with the number of graphs.
+'''
+
+import logging
+
+from typing import List, Optional
+
+from . import setting
+from . import rule_database_helper as rdbh
+from .graph_wrapper import GraphWrapper
+from .obligation_store import open_store
+from .worker import GraphResult
+
+logger = logging.getLogger(__name__)
+
+
+class ResultSink:
+    '''
+    Receives the result of every graph through `put()`. `graph` (the reasoned graph itself) is only given when reasoning in the current process, and should not be kept.
+    `close()` is called after all graphs, to finish any pending work.
+    '''
+
+    def put(self, index: int, result: GraphResult, graph: Optional[GraphWrapper]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class RuleDBSink(ResultSink):
+    '''
+    Writes the data rules into the rule DB (see `rdbh.RuleDBWriter`). The rules of all graphs are written together when closed. If there are no data rules, the rule DB is neither written nor created.
+    '''
+
+    def __init__(self):
+        self._writer = rdbh.RuleDBWriter()
+
+    def put(self, index, result, graph):
+        self._writer.add(result.data_rules)
+
+    def close(self):
+        self._writer.flush()
+
+
+class ObligationSink(ResultSink):
+    '''
+    Collects the activated obligations into the obligation store (JSON or SQLite; see `obligation_store.open_store`), which is written when closed.
+    '''
+
+    def __init__(self, filename: str):
+        self._store = open_store(filename)
+
+    def put(self, index, result, graph):
+        self._store.insert(result.obligations)
+
+    def close(self):
+        self._store.write()
+        self._store.close()
+
+
+class WriteBackSink(ResultSink):
+    '''
+    Writes the augmented graph back to the RDF store (see `sparql_helper.AugmentedGraphHelper`).
+    '''
+
+    def __init__(self, service):
+        from . import sparql_helper as sh
+        self._helper = sh.AugmentedGraphHelper(service)
+
+    def put(self, index, result, graph):
+        if graph is not None:
+            self._helper.write_transformed_graph(graph, result.obligations)
+
+
+class RenderSink(ResultSink):
+    '''
+    Draws the graph into `graph_{index}.{setting.DRAW_FORMAT}` in `setting.DRAW_DIR` (see `visualise.Renderer`). Only the DOT source is built here; the layout is done in the background, and `close()` waits for it.
+    '''
+
+    def __init__(self):
+        from . import visualise as vis
+        self._renderer = vis.Renderer()
+
+    def put(self, index, result, graph):
+        if graph is not None:
+            self._renderer.draw(self._renderer.filename(index), graph, result.obligations)
+
+    def close(self):
+        self._renderer.close()
+
+
+def put_all(sinks: List[ResultSink], index: int, result: GraphResult, graph: Optional[GraphWrapper]) -> None:
+    for sink in sinks:
+        sink.put(index, result, graph)
+
+
+def default_sinks(service, parallel: bool = False) -> List[ResultSink]:
+    '''
+    The sinks enabled by the settings. When reasoning in `parallel`, the workers write back and draw the graphs themselves, so only the sinks of the shared stores are used.
+    '''
+    sinks = []  # type: List[ResultSink]
+    if setting.DB_WRITE_TO:
+        sinks.append(RuleDBSink())
+    if setting.OBLIGATION_DB:
+        sinks.append(ObligationSink(setting.OBLIGATION_DB))
+    if not parallel:
+        if setting.WRITE_BACK:
+            sinks.append(WriteBackSink(service))
+        if setting.DRAW:
+            sinks.append(RenderSink())
+    return sinks
@@ -1,6 +1,7 @@
 from .sparql_helper import (
     SProvHelper,
     CWLHelper,
+    PrefetchedSProvHelper,
     )
 
 from .augmented_graph_helper import AugmentedGraphHelper
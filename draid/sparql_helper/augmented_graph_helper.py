@@ -8,30 +8,127 @@
 #
 
 '''
-
+This module writes the reasoning results (the augmented graph) back to the RDF store, into a dedicated named graph for each provenance graph.
 '''
 
+import json
 import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.term import Node
+from SPARQLWrapper import SPARQLWrapper, POST
 
+from draid import setting
 from draid.graph_wrapper import GraphWrapper
 from draid.defs.namespaces import NS
+from draid.defs.typing import T_REF
+from draid.obligation_store import _dump_activated_obligation
+from draid.rule import ActivatedObligation
 
-from .sparql_helper import Helper
+from .sparql_helper import Helper, _chunked, NTRIPLES_MIME
 
 logger = logging.getLogger(__name__)
 
 
+T_TRIPLE = Tuple[Node, Node, Node]
+
+T_DROP_GRAPH = "DROP SILENT GRAPH {graph} ;\n"
+
+T_INSERT_DATA = """INSERT DATA {{
+  GRAPH {graph} {{
+{triples}
+  }}
+}}"""
+
+
+def augmented_graph_id(graph_id: Optional[T_REF]) -> URIRef:
+    '''
+    The ID of the named graph where the augmented graph of the provenance graph `graph_id` is written to. `None` (e.g. CWLProv) stands for the default graph.
+    '''
+    name = str(graph_id) if graph_id else 'default'
+    return URIRef(setting.AUGMENTED_GRAPH_NAMESPACE + quote(name, safe=''))
+
+
+def _skolemize(term):
+    '''
+    Blank nodes are replaced by (well-known) IRIs, so that the triples can be split among multiple requests without breaking the references.
+    '''
+    return term.skolemize() if isinstance(term, BNode) else term
+
+
+def obligation_triples(activated_obligations: Dict[URIRef, List[ActivatedObligation]]) -> Iterable[T_TRIPLE]:
+    '''
+    The triples representing the activated obligations. Every obligation is attached to the component as a literal, in the same format as in the obligation store.
+    '''
+    for component, ob_list in activated_obligations.items():
+        for ob in ob_list:
+            yield (component, NS['mine']['activatedObligation'], Literal(json.dumps(_dump_activated_obligation(ob))))
+
+
 class AugmentedGraphHelper(Helper):
 
-    def __init__(self, destination):
+    def __init__(self, destination, update_destination=None, graph_store=None):
+        '''
+        @param update_destination: The SPARQL Update endpoint, if it is not the same as `destination`. Default: `setting.UPDATE_ENDPOINT`.
+        @param graph_store: The SPARQL Graph Store Protocol endpoint. If given, the graph is uploaded through it rather than through SPARQL Update. Default: `setting.GRAPH_STORE_ENDPOINT`.
+        '''
         super().__init__(destination)
+        self.update_destination = update_destination or setting.UPDATE_ENDPOINT or destination
+        self.graph_store = graph_store or setting.GRAPH_STORE_ENDPOINT
+
+    def _u(self, update: str) -> None:
+        if self.dataset is not None:
+            logger.warning("The destination is a local file. The augmented graph is only written to the in-memory dataset")
+            self.dataset.update(update)
+            return
+        sparql = SPARQLWrapper(self.destination, updateEndpoint=self.update_destination)
+        sparql.setMethod(POST)
+        sparql.setQuery(update)
+        sparql.query()
+
+    def _gsp(self, method: str, graph_id: URIRef, triples: List[T_TRIPLE]) -> None:
+        g = Graph()
+        for triple in triples:
+            g.add(triple)
+        url = "{}?graph={}".format(self.graph_store, quote(str(graph_id), safe=''))
+        request = Request(url, data=g.serialize(format='nt', encoding='utf-8'), method=method, headers={'Content-Type': NTRIPLES_MIME})
+        with urlopen(request) as response:
+            response.read()
+
+    def _updates(self, graph_id: URIRef, triples: List[T_TRIPLE]) -> List[str]:
+        '''
+        The SPARQL Update requests replacing the content of `graph_id` by `triples`, at most `setting.WRITE_BACK_BATCH_SIZE` triples each. The first request also drops the old graph, so writing the same graph again gives the same result.
+        '''
+        g = graph_id.n3()
+        updates = []
+        for chunk in _chunked(triples, setting.WRITE_BACK_BATCH_SIZE):
+            body = "\n".join("    {} {} {} .".format(s.n3(), p.n3(), o.n3()) for s, p, o in chunk)
+            updates.append(T_INSERT_DATA.format(graph=g, triples=body))
+        if not updates:
+            updates.append('')
+        updates[0] = T_DROP_GRAPH.format(graph=g) + updates[0]
+        return updates
 
-    def write_transformed_graph(self, graph: 'GraphWrapper'):
+    def write_transformed_graph(self, graph: 'GraphWrapper', activated_obligations: Optional[Dict[URIRef, List[ActivatedObligation]]]=None) -> URIRef:
         '''
-        Create / Prune a new graph dedicated to store the old graph + initial rules
+        Create (or replace) a graph dedicated to store the old graph + the rules (and the activated obligations, if given). Returns the ID of that graph.
         '''
-        # TODO
-        logger.warning("<write_transformed_graph> Not implemented yet")
-        for s, p, o in graph.rdf_graph:
-            if p == NS['mine']['rule']:
-                logger.info("{} {} {}".format(s, p, o))
+        graph_id = augmented_graph_id(graph.subgraph)
+        triples = list(graph.rdf_graph)
+        if activated_obligations:
+            triples.extend(obligation_triples(activated_obligations))
+        triples = [tuple(_skolemize(t) for t in triple) for triple in triples]
+        if self.graph_store:
+            chunks = list(_chunked(triples, setting.WRITE_BACK_BATCH_SIZE)) or [[]]
+            logger.info("Writing %d triples into %s in %d requests (Graph Store Protocol)", len(triples), graph_id, len(chunks))
+            for i, chunk in enumerate(chunks):
+                self._gsp('PUT' if i == 0 else 'POST', graph_id, chunk)
+        else:
+            updates = self._updates(graph_id, triples)
+            logger.info("Writing %d triples into %s in %d requests (SPARQL Update)", len(triples), graph_id, len(updates))
+            for update in updates:
+                self._u(update)
+        return graph_id
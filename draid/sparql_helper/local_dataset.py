@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/13 17:26:51
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+This module allows using a local RDF file in place of a SPARQL endpoint. The file is loaded into an rdflib `Dataset`, and the queries are evaluated by rdflib.
+'''
+
+import os
+
+from rdflib import Dataset, Variable
+from rdflib.plugins.sparql import CUSTOM_EVALS
+from rdflib.plugins.sparql.sparql import AlreadyBound
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+
+
+def is_local(destination: str) -> bool:
+    '''
+    Whether `destination` is a local RDF file rather than a SPARQL endpoint: a `file://` URL, or the path of an existing file.
+    '''
+    return urlparse(destination).scheme == 'file' or os.path.isfile(destination)
+
+
+def _bgp_cost(ctx, triple):
+    '''
+    Prefer the pattern with the fewest unbound variables, and among them the ones connected to an already bound variable.
+    '''
+    unbound = 0
+    connected = False
+    for term in triple:
+        if isinstance(term, Variable):
+            if ctx[term] is None:
+                unbound += 1
+            else:
+                connected = True
+    return (unbound, not connected)
+
+
+def _eval_bgp(ctx, bgp):
+    if not bgp:
+        yield ctx.solution()
+        return
+    i = min(range(len(bgp)), key=lambda k: _bgp_cost(ctx, bgp[k]))
+    (s, p, o), rest = bgp[i], bgp[:i] + bgp[i+1:]
+    _s, _p, _o = ctx[s], ctx[p], ctx[o]
+    for ss, sp, so in ctx.graph.triples((_s, _p, _o)):
+        c = ctx.push() if None in (_s, _p, _o) else ctx
+        try:
+            if _s is None:
+                c[s] = ss
+            if _p is None:
+                c[p] = sp
+            if _o is None:
+                c[o] = so
+        except AlreadyBound:
+            continue
+        yield from _eval_bgp(c, rest)
+
+
+class LocalDataset(Dataset):
+    '''
+    A `Dataset` whose queries use the dynamic BGP evaluation below (once `register_bgp_eval` is called). The queries of other graphs and datasets are evaluated by rdflib as usual.
+    '''
+
+
+def _custom_eval(ctx, part):
+    '''
+    rdflib orders the patterns of a BGP statically, which easily ends in cross products (e.g. all the `?x a SomeType` patterns first) for the queries used here. The order is chosen dynamically here, similar to what real triple stores do.
+    '''
+    if part.name == 'BGP' and isinstance(getattr(ctx, '_dataset', None), LocalDataset):
+        return _eval_bgp(ctx, list(part.triples))
+    raise NotImplementedError()
+
+
+def register_bgp_eval() -> None:
+    '''
+    Make rdflib use the dynamic BGP evaluation above for the queries of `LocalDataset`s.
+    '''
+    CUSTOM_EVALS['draid_bgp'] = _custom_eval
+
+
+_datasets = {}  # type: Dict[str, Tuple[Tuple[int, int], LocalDataset]]
+
+def load_dataset(filename: str) -> LocalDataset:
+    '''
+    Load the RDF file `filename` (in any format rdflib can guess from the extension, e.g. TriG or N-Quads for named graphs) into a `LocalDataset`, whose default graph is the union of all graphs.
+    The dataset is cached until the file changes, so a long-running process only parses it once.
+    '''
+    register_bgp_eval()
+    if filename.startswith('file://'):
+        filename = urlparse(filename).path
+    filename = os.path.abspath(filename)
+    stat = os.stat(filename)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _datasets.get(filename)
+    if cached and cached[0] == key:
+        return cached[1]
+    ds = LocalDataset(default_union=True)
+    ds.parse(filename)
+    _datasets[filename] = (key, ds)
+    return ds
@@ -15,7 +15,7 @@ from typing import Iterable
 
 from draid.defs.typing import T_REF
 
-from .query_sprov import P
+from .query_sprov import P, F_P_VALUES_COMPONENT
 
 
 
@@ -165,6 +165,12 @@ def F_COMPONENT_PARS_IN(graph, component_list: Iterable) -> str:
     return F_QUERY('DISTINCT ?component ?par ?pred ?obj', graph, q_body)
 
 
+def F_COMPONENT_PARS_VALUES(graph, component_list: Iterable) -> str:
+    ivalues = F_P_VALUES_COMPONENT(component_list)
+    q_body = "{values} {body}".format(values=ivalues, body=P_COMPONENT_PARS)
+    return F_QUERY('DISTINCT ?component ?par ?pred ?obj', graph, q_body)
+
+
 Q_COMPONENT_FUNCTION = r'''
 SELECT ?component ?function_name WHERE {
   ?component prov:qualifiedAssociation [prov:hadPlan ?function_name_ori].
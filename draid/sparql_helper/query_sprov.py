@@ -12,8 +12,11 @@ This module contains the queries used by the SProv SPARQL helper, handling the S
 '''
 
 from functools import partial
-from typing import Iterable
+from rdflib import Variable
+from rdflib.term import Node
+from typing import Iterable, Sequence, Tuple
 
+from draid.defs.namespaces import MINE, RDF, S_PROV
 from draid.defs.typing import T_REF
 
 
@@ -90,6 +93,48 @@ def F_QUERY(target: str, graph: T_REF, body: str) -> str:
     #return T_QUERY(target=target, graph="<{}>".format(graph), body=body)
     return T_QUERY(target=target, graph=graph, body=body)
 
+T_CONSTRUCT = """
+CONSTRUCT {{
+{template}
+}}
+WHERE {{
+  graph {} {{
+{body}
+  }}
+}}
+"""
+
+def F_P_TEMPLATE(template: Sequence[Tuple[Node, Node, Node]]) -> str:
+    '''
+    The CONSTRUCT template (in SPARQL syntax) of the `template` triples, whose elements are either RDF terms or `Variable`s.
+    '''
+    return "\n".join("  {} {} {} .".format(*(t.n3() for t in triple)) for triple in template)
+
+T_SELECT_ALL_GRAPHS = P("""
+SELECT DISTINCT ?g {target} WHERE {{
+  GRAPH ?g {{
+{body}
+  }}
+}}
+""")
+
+def F_QUERY_ALL_GRAPHS(target: str, body: str) -> str:
+    '''
+    Similar to `F_QUERY`, but queries all (named) graphs at once, with the graph bound to `?g`.
+    '''
+    return T_SELECT_ALL_GRAPHS(target=target, body=body)
+
+def F_QUERY_ALL_GRAPHS_OF_TEMPLATE(template: Sequence[Tuple[Node, Node, Node]], body: str) -> str:
+    '''
+    The SELECT counterpart of a CONSTRUCT query (`template` + `body`) for all graphs. The result bindings can be turned into triples by instantiating `template` with them, which is what the CONSTRUCT query does on the endpoint.
+    '''
+    variables = []
+    for triple in template:
+        for t in triple:
+            if isinstance(t, Variable) and t not in variables:
+                variables.append(t)
+    return F_QUERY_ALL_GRAPHS(" ".join(v.n3() for v in variables), body)
+
 P_INVOCATION_DATA_IN = '''
     { # invocation <- data
       SELECT ?invocation ?data_in ?port_in WHERE {
@@ -228,6 +273,16 @@ FILTER (str(?component) in ({}))
     return T_FILTER.format(s)
 
 
+def F_P_VALUES_COMPONENT(component_list: Iterable) -> str:
+    T_VALUES = """
+VALUES ?component {{ {} }}
+"""
+    assert component_list
+    c_list = ['<{}>'.format(c) for c in component_list]
+    s = " ".join(c_list)
+    return T_VALUES.format(s)
+
+
 P_COMPONENT_WITHOUT_INPUT_DATA = """
     {
       SELECT ?component {
@@ -295,6 +350,14 @@ def F_COMPONENT_PARS_IN(graph, component_list: Iterable) -> str:
     q_body = "{body} {filter}".format(body=P_COMPONENT_PARS, filter=ifilter)
     return F_QUERY('DISTINCT ?component ?par ?pred ?obj', graph, q_body)
 
+def F_COMPONENT_PARS_VALUES(graph, component_list: Iterable) -> str:
+    '''
+    The same as `F_COMPONENT_PARS_IN`, but binds the components through a `VALUES` block rather than a `FILTER`. This is much cheaper for the endpoint to evaluate when there are many components, and the list is expected to be split into chunks by the caller.
+    '''
+    ivalues = F_P_VALUES_COMPONENT(component_list)
+    q_body = "{values} {body}".format(values=ivalues, body=P_COMPONENT_PARS)
+    return F_QUERY('DISTINCT ?component ?par ?pred ?obj', graph, q_body)
+
 P_COMPONENT_FUNCTION = '''
     ?component a s-prov:Component .
     ?component s-prov:functionName ?function_name.
@@ -323,15 +386,7 @@ def F_GRAPH_USER(graph: T_REF) -> str:
     return F_QUERY('?user', graph, P_GRAPH_USER)
 
 
-T_COMPONENT_GRAPH = P('''
-PREFIX : <http://draid/ns/#>
-
-
-CONSTRUCT {{
-  ?component0 :hasNextStage ?component1 .
-}}
-WHERE {{
-  graph {} {{
+P_COMPONENT_GRAPH = '''
 
     ?component0 a s-prov:Component .
     ?invocation0 a prov:Activity ;
@@ -343,7 +398,7 @@ WHERE {{
     ?generation prov:activity ?invocation0 .
 
 
-    OPTIONAL {{
+    OPTIONAL {
       ?component1 a s-prov:Component .
       ?invocation1 a prov:Activity ;
                    prov:wasAssociatedWith ?component_instance1 .
@@ -354,11 +409,15 @@ WHERE {{
       ?usage prov:entity ?data_out0 .
 
       FILTER (?component0 != ?component1)
-    }}
+    }
 
-  }}
-}}
-''')
+'''
+
+TEMPLATE_COMPONENT_GRAPH = [
+        (Variable('component0'), MINE['hasNextStage'], Variable('component1')),
+        ]
+
+T_COMPONENT_GRAPH = P(T_CONSTRUCT, template=F_P_TEMPLATE(TEMPLATE_COMPONENT_GRAPH), body=P_COMPONENT_GRAPH)
 
 # C_COMPONENT_GRAPH = T_COMPONENT_GRAPH('?g')
 
@@ -406,31 +465,7 @@ def F_C_COMPONENT_GRAPH(graph: T_REF) -> str:
 # }
 # '''
 
-T_DATA_DEPENDENCY_WITH_PORT = P('''
-PREFIX : <http://draid/ns/#>
-
-
-CONSTRUCT {{
-  ?component0 a s-prov:Component ;
-    :hasOutPort ?port_out .
-
-  ?port_out a :OutputPort ;
-    :name ?out_port ;
-    :hasConnection ?connection .
-
-  ?connection a :Connection ;
-    :data ?data_out0 .
-
-  ?data_out0 a s-prov:Data .
-
-  ?connection :target ?port_in .
-
-  ?port_in a :InputPort ;
-    :name ?in_port ;
-    :inputTo ?component1 .
-}}
-WHERE {{
-  graph {} {{
+P_DATA_DEPENDENCY_WITH_PORT = '''
 
     ?component0 a s-prov:Component .
     ?invocation0 a prov:Activity ;
@@ -444,7 +479,7 @@ WHERE {{
                 provone:hadOutPort ?out_port .
 
 
-    OPTIONAL {{
+    OPTIONAL {
       ?component1 a s-prov:Component .
       ?invocation1 a prov:Activity ;
                    prov:wasAssociatedWith ?component_instance1 .
@@ -457,7 +492,7 @@ WHERE {{
              provone:hadInPort ?in_port .
 
       FILTER (?component0 != ?component1)
-    }}
+    }
 
     BIND (IF(REGEX(STR(?component0), "http://[^#]+#"), STRAFTER(STR(?component0), "#"), STR(?component0)) AS ?component0_name)
     BIND (IF(REGEX(STR(?component1), "http://[^#]+#"), STRAFTER(STR(?component1), "#"), STR(?component1)) AS ?component1_name)
@@ -477,9 +512,29 @@ WHERE {{
             )
           )
       	) AS ?connection)
-  }}
-}}
-''')
+'''
+
+TEMPLATE_DATA_DEPENDENCY_WITH_PORT = [
+        (Variable('component0'), RDF['type'], S_PROV['Component']),
+        (Variable('component0'), MINE['hasOutPort'], Variable('port_out')),
+
+        (Variable('port_out'), RDF['type'], MINE['OutputPort']),
+        (Variable('port_out'), MINE['name'], Variable('out_port')),
+        (Variable('port_out'), MINE['hasConnection'], Variable('connection')),
+
+        (Variable('connection'), RDF['type'], MINE['Connection']),
+        (Variable('connection'), MINE['data'], Variable('data_out0')),
+
+        (Variable('data_out0'), RDF['type'], S_PROV['Data']),
+
+        (Variable('connection'), MINE['target'], Variable('port_in')),
+
+        (Variable('port_in'), RDF['type'], MINE['InputPort']),
+        (Variable('port_in'), MINE['name'], Variable('in_port')),
+        (Variable('port_in'), MINE['inputTo'], Variable('component1')),
+        ]
+
+T_DATA_DEPENDENCY_WITH_PORT = P(T_CONSTRUCT, template=F_P_TEMPLATE(TEMPLATE_DATA_DEPENDENCY_WITH_PORT), body=P_DATA_DEPENDENCY_WITH_PORT)
 
 
 # C_DATA_DEPENDENCY_WITH_PORT = T_DATA_DEPENDENCY_WITH_PORT('?g')
@@ -487,6 +542,47 @@ WHERE {{
 def F_C_DATA_DEPENDENCY_WITH_PORT(graph: T_REF) -> str:
     return T_DATA_DEPENDENCY_WITH_PORT("<{}>".format(graph))
 
+
+# The queries below retrieve the information of all graphs in one go. They are the counterparts of the single-graph queries above, and the graph is bound to `?g`.
+
+ALL_GRAPHS_DATA_DEPENDENCY_WITH_PORT = F_QUERY_ALL_GRAPHS_OF_TEMPLATE(TEMPLATE_DATA_DEPENDENCY_WITH_PORT, P_DATA_DEPENDENCY_WITH_PORT)
+
+ALL_GRAPHS_COMPONENT_GRAPH = F_QUERY_ALL_GRAPHS_OF_TEMPLATE(TEMPLATE_COMPONENT_GRAPH, P_COMPONENT_GRAPH)
+
+ALL_GRAPHS_COMPONENT_FUNCTION = F_QUERY_ALL_GRAPHS('?component ?function_name', P_COMPONENT_FUNCTION)
+
+ALL_GRAPHS_COMPONENT_PARS = F_QUERY_ALL_GRAPHS('?component ?par ?pred ?obj', P_COMPONENT_PARS)
+
+ALL_GRAPHS_START_TIME = F_QUERY_ALL_GRAPHS('?startTime', P_GRAPH_START_TIME)
+
+ALL_GRAPHS_USER = F_QUERY_ALL_GRAPHS('?user', P_GRAPH_USER)
+
+def _hex_value(var: str, start: int, length: int) -> str:
+    '''
+    The SPARQL expression of the number in the hexadecimal string `var`, from the (1-based) `start` for `length` digits. SPARQL has no function for it, so every digit is looked up by its position in "0123456789abcdef".
+    '''
+    value = '0'
+    for i in range(start, start + length):
+        value = '({} * 16 + STRLEN(STRBEFORE("0123456789abcdef", SUBSTR({}, {}, 1))))'.format(value, var, i)
+    return value
+
+
+# The number of triples and the digest of the content of every graph (except those whose ID starts with `excluded`), aggregated by the endpoint. The digest is two sums of (32 bits of) the SHA-1 digests of the triples, so it does not depend on their order. Blank nodes are replaced by a placeholder, because their labels are not stable.
+F_ALL_GRAPHS_SUMMARY = P('''
+SELECT ?g (COUNT(*) AS ?size) (SUM(?d1) AS ?digest1) (SUM(?d2) AS ?digest2) WHERE {{
+  GRAPH ?g {{
+    ?s ?p ?o
+  }}
+  FILTER (!STRSTARTS(STR(?g), "{excluded}"))
+  BIND (IF(isBlank(?s), "_:", STR(?s)) AS ?s_str)
+  BIND (IF(isBlank(?o), "_:", IF(isLiteral(?o), CONCAT(STR(?o), "^^", STR(DATATYPE(?o)), "@", LANG(?o)), STR(?o))) AS ?o_str)
+  BIND (SHA1(CONCAT(?s_str, " ", STR(?p), " ", ?o_str)) AS ?h)
+  BIND ({d1} AS ?d1)
+  BIND ({d2} AS ?d2)
+}}
+GROUP BY ?g
+''', d1=_hex_value('?h', 1, 8), d2=_hex_value('?h', 9, 8))
+
 #C_INITIAL_DATA = '''
 #PREFIX : <http://draid/ns/#>
 #
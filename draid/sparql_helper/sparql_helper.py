@@ -11,18 +11,24 @@
 This module contains the helper classes for dealing with the RDF endpoint (for provenance) through SPARQL queries.
 '''
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from decimal import Decimal
+import json
 import logging
 import typing
-from typing import Dict, List, Optional
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional
 
-from rdflib import Graph, URIRef
+from rdflib import BNode, Graph, Literal, URIRef, Variable
+from rdflib.plugins.parsers.ntriples import NTGraphSink, W3CNTriplesParser
 from SPARQLWrapper import SPARQLWrapper, JSON, XML, TURTLE
 
 from draid import setting
 from draid.defs import InitialInfo, ComponentInfo
 from draid.defs.typing import T_REF
 
+from .local_dataset import is_local, load_dataset
 from . import query_sprov
 from . import query_cwl
 
@@ -57,23 +63,132 @@ def _rdu(binding, target, safe=False):
             return obj, real
 
 
+def _rdt(binding, target):
+    '''
+    Read (to) RDF term, according to the type in the binding. `None` if `target` is unbound.
+    '''
+    if target not in binding:
+        return None
+    value = binding[target]
+    if value['type'] == 'uri':
+        return URIRef(value['value'])
+    elif value['type'] == 'bnode':
+        return BNode(value['value'])
+    else:
+        datatype = value.get('datatype')
+        return Literal(value['value'], lang=value.get('xml:lang'), datatype=URIRef(datatype) if datatype else None)
+
+
+def _instantiate(graph: Graph, template, binding) -> None:
+    '''
+    Put the triples of the CONSTRUCT `template` instantiated with `binding` into `graph`. Same as CONSTRUCT, triples with unbound variables are skipped.
+    '''
+    for triple in template:
+        terms = tuple(_rdt(binding, str(t)) if isinstance(t, Variable) else t for t in triple)
+        if None not in terms:
+            graph.add(terms)
+
+
+def _chunked(lst: List, size: int) -> Iterable[List]:
+    for i in range(0, len(lst), size):
+        yield lst[i:i+size]
+
+
+NTRIPLES_MIME = 'application/n-triples'
+
+
+def parse_ntriples_stream(stream, graph: Optional[Graph]=None) -> Graph:
+    '''
+    Parse the N-Triples from the file-like `stream` (bytes or text) incrementally, putting every triple into `graph` (or a new Graph if not given) as soon as it is parsed.
+    The content of `stream` is never held in memory as a whole. The graph of the data dependency is used as is by `GraphWrapper` (as its `rdf_graph`), so its triples are only indexed once.
+    '''
+    if graph is None:
+        graph = Graph()
+    W3CNTriplesParser(NTGraphSink(graph)).parse(stream)
+    return graph
+
+
 class Helper:
 
+    q: ModuleType  # The queries (e.g. `query_sprov`), set by the subclasses
+
     def __init__(self, destination):
+        self.destination = destination
+        self.dataset = load_dataset(destination) if is_local(destination) else None
         self.sparql = SPARQLWrapper(destination)
         self.graph = None
 
     def _q(self, query: str) -> Dict:
+        if self.dataset is not None:
+            return json.loads(self.dataset.query(query).serialize(format='json'))
         self.sparql.setQuery(query)
         self.sparql.setReturnFormat(JSON)
         return self.sparql.query().convert()
 
+    def _q_many(self, queries: List[str]) -> List[Dict]:
+        '''
+        Perform multiple (SELECT) queries concurrently, at most `setting.QUERY_CONCURRENCY` at a time. The results are in the same order as `queries`.
+        Every concurrent query uses its own `SPARQLWrapper`, because it is stateful and can't be shared among threads.
+        '''
+        def query_once(query):
+            sparql = SPARQLWrapper(self.destination)
+            sparql.setQuery(query)
+            sparql.setReturnFormat(JSON)
+            return sparql.query().convert()
+        if len(queries) <= 1 or setting.QUERY_CONCURRENCY <= 1 or self.dataset is not None:
+            return [self._q(query) for query in queries]
+        with ThreadPoolExecutor(max_workers=min(setting.QUERY_CONCURRENCY, len(queries))) as executor:
+            return list(executor.map(query_once, queries))
+
+    def _get_components_pars(self, components: List[URIRef]) -> Dict[URIRef, Dict[str, str]]:
+        '''
+        Retrieve the parameters of the `components`. The components are split into chunks of `setting.COMPONENT_CHUNK_SIZE`, each of which is queried separately (and concurrently), and the results are merged.
+        '''
+        info: Dict[URIRef, Dict[str, str]] = {com: {} for com in components}
+        queries = [self.q.Q(self.q.F_COMPONENT_PARS_VALUES(self.graph, chunk)) for chunk in _chunked(list(components), setting.COMPONENT_CHUNK_SIZE)]
+        logger.debug("Retrieving parameters of %d components in %d queries", len(info), len(queries))
+        for results in self._q_many(queries):
+            for binding in results['results']['bindings']:
+                component = _rdu(binding, 'component')
+                if component not in info:
+                    info[component] = {}
+                pred = _rd(binding, 'pred')
+                obj = _rd(binding, 'obj')
+                info[component][pred] = obj
+        return info
+
     def _c(self, query: str, return_format=XML) -> Graph:
         self.sparql.setQuery(query)
         self.sparql.setReturnFormat(return_format)
         self.sparql.setOnlyConneg(True)
         return self.sparql.query().convert()
 
+    def _c_stream(self, query: str, graph: Optional[Graph]=None) -> Graph:
+        '''
+        Similar to `_c`, but asks for N-Triples and parses the HTTP response while it is being received (see `parse_ntriples_stream`).
+        '''
+        self.sparql.setQuery(query)
+        self.sparql.setOnlyConneg(True)
+        self.sparql.addCustomHttpHeader('Accept', NTRIPLES_MIME)
+        try:
+            response = self.sparql.query().response
+            try:
+                return parse_ntriples_stream(response, graph)
+            finally:
+                response.close()
+        finally:
+            self.sparql.clearCustomHttpHeader('Accept')
+
+    def _construct(self, query: str) -> Graph:
+        '''
+        Perform the CONSTRUCT `query`, streaming the results if `setting.STREAM_INGESTION` is set.
+        '''
+        if self.dataset is not None:
+            return self.dataset.query(query).graph
+        if setting.STREAM_INGESTION:
+            return self._c_stream(query)
+        return self._c(query)
+
 
 class SProvHelper(Helper):
     q = query_sprov
@@ -89,6 +204,8 @@ class SProvHelper(Helper):
         results = self._q(self.q.Q(self.q.ALL_WFE_GRAPHS))
         for binding in results['results']['bindings']:
             g = _rdu(binding, 'g')
+            if str(g).startswith(setting.AUGMENTED_GRAPH_NAMESPACE):
+                continue
             ret.append(g)
         return ret
 
@@ -126,16 +243,7 @@ class SProvHelper(Helper):
 
     def get_components_info(self, components: List[URIRef]) -> List[ComponentInfo]:
         component_function = self.get_components_function()
-        info: Dict[URIRef, Dict[str, str]] = {com: {} for com in components}
-        results = self._q(self.q.Q(self.q.F_COMPONENT_PARS_IN(self.graph, components)))
-        for binding in results['results']['bindings']:
-            component = _rdu(binding, 'component')
-            if component not in info:
-                info[component] = {}
-            par = _rd(binding, 'par')
-            pred = _rd(binding, 'pred')
-            obj = _rd(binding, 'obj')
-            info[component][pred] = obj
+        info = self._get_components_pars(components)
         ret = []
         for component, par in info.items():
             function_name = component_function[component]
@@ -144,10 +252,113 @@ class SProvHelper(Helper):
         return ret
 
     def get_graph_dependency_with_port(self) -> Graph:
-        return self._c(self.q.Q(self.q.F_C_DATA_DEPENDENCY_WITH_PORT(self.graph)))
+        return self._construct(self.q.Q(self.q.F_C_DATA_DEPENDENCY_WITH_PORT(self.graph)))
 
     def get_graph_component(self) -> Graph:
-        return self._c(self.q.Q(self.q.F_C_COMPONENT_GRAPH(self.graph)))
+        return self._construct(self.q.Q(self.q.F_C_COMPONENT_GRAPH(self.graph)))
+
+    def get_graphs_summary(self) -> Dict[URIRef, Dict[str, str]]:
+        '''
+        The `startTime`, the `size` (number of triples) and the `digest` of the content of every graph (except the augmented graphs), retrieved in two queries. Used to tell whether a graph has changed since it was processed (see `draid.run_ledger`).
+        The size and the digest are aggregated by the endpoint (see `query_sprov.F_ALL_GRAPHS_SUMMARY`), so only one row per graph is transferred. The labels of blank nodes are not part of the digest.
+        '''
+        ret: Dict[URIRef, Dict[str, str]] = {}
+        start_time, summary = self._q_many([self.q.Q(self.q.ALL_GRAPHS_START_TIME), self.q.Q(self.q.F_ALL_GRAPHS_SUMMARY(excluded=setting.AUGMENTED_GRAPH_NAMESPACE))])
+        for binding in start_time['results']['bindings']:
+            graph = _rdu(binding, 'g')
+            if not str(graph).startswith(setting.AUGMENTED_GRAPH_NAMESPACE):
+                ret.setdefault(graph, {})['startTime'] = _rd(binding, 'startTime')
+        for binding in summary['results']['bindings']:
+            graph_summary = ret.setdefault(_rdu(binding, 'g'), {})
+            graph_summary['size'] = _rd(binding, 'size')
+            digests = [int(Decimal(_rd(binding, name))) % (1 << 32) for name in ('digest1', 'digest2')]  # Some endpoints return the sums as decimals
+            graph_summary['digest'] = '{:08x}{:08x}'.format(*digests)
+        return ret
+
+    def prefetch_graphs(self, graphs: Optional[List[URIRef]]=None) -> Dict[URIRef, 'PrefetchedSProvHelper']:
+        '''
+        Retrieve the information of all `graphs` (default: all WFE graphs), with one query per kind of information rather than several queries per graph. The results are split by graph, and returned as one `PrefetchedSProvHelper` for each graph, which can be used in place of this helper for that graph.
+        '''
+        if graphs is None:
+            graphs = self.get_wfe_graphs()
+        helpers = {graph: PrefetchedSProvHelper(graph) for graph in graphs}
+        queries = [
+                self.q.ALL_GRAPHS_DATA_DEPENDENCY_WITH_PORT,
+                self.q.ALL_GRAPHS_COMPONENT_GRAPH,
+                self.q.ALL_GRAPHS_COMPONENT_FUNCTION,
+                self.q.ALL_GRAPHS_COMPONENT_PARS,
+                self.q.ALL_GRAPHS_START_TIME,
+                self.q.ALL_GRAPHS_USER,
+                ]
+        logger.debug("Prefetching %d graphs in %d queries", len(helpers), len(queries))
+        results = self._q_many([self.q.Q(query) for query in queries])
+        dependency, component_graph, function, pars, start_time, user = [r['results']['bindings'] for r in results]
+
+        def of_graph(binding):
+            return helpers.get(_rdu(binding, 'g'))
+
+        for binding in dependency:
+            helper = of_graph(binding)
+            if helper:
+                _instantiate(helper.dependency_with_port, self.q.TEMPLATE_DATA_DEPENDENCY_WITH_PORT, binding)
+        for binding in component_graph:
+            helper = of_graph(binding)
+            if helper:
+                _instantiate(helper.component_graph, self.q.TEMPLATE_COMPONENT_GRAPH, binding)
+        for binding in function:
+            helper = of_graph(binding)
+            if helper:
+                helper.components_function[_rdu(binding, 'component')] = _rd(binding, 'function_name')
+        for binding in pars:
+            helper = of_graph(binding)
+            if helper:
+                helper.components_pars.setdefault(_rdu(binding, 'component'), {})[_rd(binding, 'pred')] = _rd(binding, 'obj')
+        for binding in start_time:
+            helper = of_graph(binding)
+            if helper:
+                helper.graph_info['startTime'] = _rd(binding, 'startTime')
+        for binding in user:
+            helper = of_graph(binding)
+            if helper:
+                helper.graph_info['user'] = _rd(binding, 'user')
+        return helpers
+
+
+class PrefetchedSProvHelper:
+    '''
+    The information of one S-Prov graph, retrieved in advance by `SProvHelper.prefetch_graphs`. It provides the same interface as `SProvHelper` (as used by `GraphWrapper`), without querying the endpoint.
+    '''
+
+    def __init__(self, graph: URIRef):
+        self.graph = graph
+        self.dependency_with_port = Graph()
+        self.component_graph = Graph()
+        self.components_function: Dict[URIRef, str] = {}
+        self.components_pars: Dict[URIRef, Dict[str, str]] = {}
+        self.graph_info: Dict[str, str] = {}
+
+    def set_graph(self, graph: T_REF) -> None:
+        assert graph == self.graph, "PrefetchedSProvHelper only has the information of graph {}".format(self.graph)
+
+    def get_graph_info(self):
+        return dict(self.graph_info)
+
+    def get_components_function(self) -> Dict[URIRef, str]:
+        return self.components_function
+
+    def get_components_info(self, components: List[URIRef]) -> List[ComponentInfo]:
+        ret = []
+        for component in components:
+            function_name = self.components_function[component]
+            par = dict(self.components_pars.get(component, {}))
+            ret.append(ComponentInfo(component, function_name, par))
+        return ret
+
+    def get_graph_dependency_with_port(self) -> Graph:
+        return self.dependency_with_port
+
+    def get_graph_component(self) -> Graph:
+        return self.component_graph
 
 
 class CWLHelper(Helper):
@@ -156,8 +367,11 @@ class CWLHelper(Helper):
     def __init__(self, destination):
         super().__init__(destination)
 
-    def _c(self, query: str, return_format=TURTLE):
-        return super()._c(query, return_format=TURTLE)
+    def _c(self, query: str, return_format=TURTLE) -> Graph:
+        results = typing.cast(bytes, super()._c(query, return_format=TURTLE))  # Not parsed by SPARQLWrapper
+        g = Graph()
+        g.parse(data=results, format="turtle")
+        return g
 
     def get_graph_info(self):
         ret = {}
@@ -182,16 +396,7 @@ class CWLHelper(Helper):
             return ret
 
         component_function = get_components_function(self)
-        info: Dict[URIRef, Dict[str, str]] = {com: {} for com in components}
-        results = self._q(self.q.Q(self.q.F_COMPONENT_PARS_IN(self.graph, components)))
-        for binding in results['results']['bindings']:
-            component = _rdu(binding, 'component')
-            if component not in info:
-                info[component] = {}
-            par = _rd(binding, 'par')
-            pred = _rd(binding, 'pred')
-            obj = _rd(binding, 'obj')
-            info[component][pred] = obj
+        info = self._get_components_pars(components)
         ret = []
         for component, par in info.items():
             function_name = component_function[component]
@@ -200,13 +405,7 @@ class CWLHelper(Helper):
         return ret
 
     def get_graph_dependency_with_port(self) -> Graph:
-        results = self._c(self.q.Q(self.q.C_DATA_DEPENDENCY_WITH_PORT(self.graph)))
-        g = Graph()
-        g.parse(data=results, format="turtle")
-        return g
+        return self._construct(self.q.Q(self.q.C_DATA_DEPENDENCY_WITH_PORT(self.graph)))
 
     def get_graph_component(self) -> Graph:
-        results = self._c(self.q.Q(self.q.C_COMPONENT_GRAPH(self.graph)))
-        g = Graph()
-        g.parse(data=results, format="turtle")
-        return g
+        return self._construct(self.q.Q(self.q.C_COMPONENT_GRAPH(self.graph)))
@@ -11,12 +11,19 @@
 This module contains useful utils to visualise the graph.
 '''
 
+from concurrent.futures import Future, ProcessPoolExecutor
+import hashlib
+import json
 import logging
-import pygraphviz as pgv
+import multiprocessing
+import os
+import shutil
 import textwrap as tw
 
 from pprint import pformat
+from typing import List, Optional
 
+from . import setting
 from .defs.exception import ForceFailedException
 from .graph_wrapper import GraphWrapper, trim_port_name
 
@@ -67,6 +74,7 @@ class GraphBuilder:
         self._graph = graph
         self._acob = activated_obligations
 
+        import pygraphviz as pgv
         self.G = pgv.AGraph(directed=True, rankdir='LR')
 
         self._ni = _NameId()  # convert from keys to a unique identifier
@@ -200,7 +208,113 @@ class GraphBuilder:
         return self.G
 
 
-def draw_to_file(G, filename):
+def draw_to_file(G, filename, fmt=None):
     G.layout('dot')
-    G.draw(filename)
+    G.draw(filename, format=fmt)
+
+
+def graph_fingerprint(graph: GraphWrapper, activated_obligations={}, fmt: str = '') -> str:
+    '''
+    The fingerprint of what is drawn: the graph (which contains the rules) and the activated obligations, plus the output format.
+    A graph with blank nodes is canonicalised first, because their labels change every time the graph is parsed or constructed.
+    '''
+    from rdflib import BNode
+    from rdflib.compare import to_canonical_graph
+    from .obligation_store import _dump_activated_obligation
+    h = hashlib.sha1(fmt.encode('utf-8'))
+    rdf_graph = graph.rdf_graph
+    if any(isinstance(term, BNode) for triple in rdf_graph for term in triple):
+        rdf_graph = to_canonical_graph(rdf_graph)
+    for line in sorted(' '.join(term.n3() for term in triple) for triple in rdf_graph):
+        h.update(line.encode('utf-8'))
+        h.update(b'\n')
+    obligations = {str(component): [_dump_activated_obligation(ob) for ob in ob_list] for component, ob_list in activated_obligations.items()}
+    h.update(json.dumps(obligations, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def render_dot(dot: str, filename: str, fmt: str, cache_file: Optional[str] = None) -> str:
+    '''
+    Lay out and draw the graph given as DOT source. This is what the render processes run, so only strings are passed in.
+    '''
+    import pygraphviz as pgv
+    draw_to_file(pgv.AGraph(string=dot), filename, fmt)
+    if cache_file:
+        tmp = cache_file + '.tmp'
+        shutil.copyfile(filename, tmp)
+        os.replace(tmp, cache_file)
+    return filename
+
+
+def drawing_filename(index: int, fmt: Optional[str] = None) -> str:
+    '''
+    The file the `index`-th graph is drawn into: `graph_{index}.{fmt}` in `setting.DRAW_DIR` (created if missing).
+    '''
+    filename = "graph_{}.{}".format(index, fmt or setting.DRAW_FORMAT)
+    if not setting.DRAW_DIR:
+        return filename
+    os.makedirs(setting.DRAW_DIR, exist_ok=True)
+    return os.path.join(setting.DRAW_DIR, filename)
+
+
+class Renderer:
+    '''
+    Draws graphs into files, with the layout (the expensive part) run in `jobs` background processes, or in this process if `jobs` is 0.
+    If `cache_dir` is set, the drawn files are also kept there by their fingerprint (see `graph_fingerprint`), and an unchanged graph is copied from there rather than laid out again.
+    Use as a context manager, or call `close()` to wait for the pending drawings.
+    '''
+
+    def __init__(self, fmt: Optional[str] = None, jobs: Optional[int] = None, cache_dir: Optional[str] = None):
+        self.fmt = fmt or setting.DRAW_FORMAT
+        self.jobs = setting.DRAW_JOBS if jobs is None else jobs
+        self.cache_dir = cache_dir or setting.DRAW_CACHE
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._executor = None  # type: Optional[ProcessPoolExecutor]
+        self._futures = []  # type: List[Future]
+
+    def filename(self, index: int) -> str:
+        return drawing_filename(index, self.fmt)
+
+    def _cache_file(self, fingerprint: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, "{}.{}".format(fingerprint, self.fmt))
+
+    def _submit(self, dot: str, filename: str, cache_file: Optional[str]) -> None:
+        if self.jobs < 1:
+            render_dot(dot, filename, self.fmt, cache_file)
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context('spawn'))
+        self._futures.append(self._executor.submit(render_dot, dot, filename, self.fmt, cache_file))
+
+    def draw(self, filename: str, graph: GraphWrapper, activated_obligations={}) -> None:
+        cache_file = self._cache_file(graph_fingerprint(graph, activated_obligations, self.fmt))
+        if cache_file and os.path.exists(cache_file):
+            logger.debug("Graph drawing %s is cached as %s", filename, cache_file)
+            shutil.copyfile(cache_file, filename)
+            return
+        gb = GraphBuilder(graph, activated_obligations) \
+                .data_flow() \
+                .rules() \
+                .obligation() \
+                .flow_rules()
+        self._submit(gb.build().string(), filename, cache_file)
+
+    def close(self) -> None:
+        try:
+            for future in self._futures:
+                logger.debug("Drawn %s", future.result())
+        finally:
+            self._futures = []
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
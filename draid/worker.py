@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/13 14:05:37
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+This module reasons multiple (S-Prov) graphs in parallel, in worker processes.
+Every worker process has its own Prolog engine and parsers, and sends back only the compact results of each graph (`GraphResult`) rather than the whole graph.
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import logging
+import multiprocessing
+
+from rdflib import URIRef
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from . import setting
+from . import sparql_helper as sh
+from . import graph_wrapper as gw
+from . import rule_database_helper as rdbh
+from .defs.exception import IllegalStateError
+from .rule import ActivatedObligation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GraphResult:
+    graph: URIRef
+    data_rules: Dict[str, str]  # The dumped data rules (see `rdbh.data_rules_of`). Only filled if `setting.DB_WRITE_TO` is set.
+    obligations: Dict[URIRef, List[ActivatedObligation]]
+
+    @classmethod
+    def of(cls, graph_wrapper: 'gw.GraphWrapper', obligations: Dict[URIRef, List[ActivatedObligation]]) -> 'GraphResult':
+        data_rules = rdbh.data_rules_of(graph_wrapper) if setting.DB_WRITE_TO else {}  # type: Dict[str, str]
+        return cls(graph_wrapper.subgraph, data_rules, obligations)
+
+
+def settings_snapshot() -> Dict[str, Any]:
+    '''
+    The current settings, to be restored in the worker processes. See `injected_functions` for the settings which can't be.
+    '''
+    return {k: v for k, v in vars(setting).items() if k.isupper()}
+
+
+def _holds_function(value: Any) -> bool:
+    if isinstance(value, dict):
+        return any(_holds_function(v) for v in value.values())
+    return callable(value)
+
+
+def injected_functions() -> List[str]:
+    '''
+    The (names of the) `INJECTED_*` settings holding rules given as functions (see `recognizer.InjectionLookup`). Functions can't be reliably sent to the (spawned) worker processes, so these settings only work when reasoning in the current process.
+    '''
+    return [k for k, v in vars(setting).items() if k.startswith('INJECTED_') and _holds_function(v)]
+
+
+def _init_worker(snapshot: Dict[str, Any]) -> None:
+    for k, v in snapshot.items():
+        setattr(setting, k, v)
+    rdbh.open_rule_dbs()  # The rule DBs are not in the snapshot
+
+
+def process_graph(service, graph: URIRef, index: int, helper: Optional[Union['sh.SProvHelper', 'sh.PrefetchedSProvHelper']]=None) -> GraphResult:
+    '''
+    Reason over one graph, the same as one iteration of `main.propagate_all_sprov`. The graph is also written back and drawn (if `setting.DRAW`) here, so the graph itself never leaves the worker.
+    '''
+    from .main import draw_single, propagate_single
+    from .visualise import drawing_filename
+
+    if helper is None:
+        helper = sh.SProvHelper(service)
+    graph_wrapper = gw.GraphWrapper.from_sprov(helper, subgraph=graph)
+
+    graph_wrapper, obligations = propagate_single(graph_wrapper)
+
+    if setting.WRITE_BACK:
+        a_helper = sh.AugmentedGraphHelper(service)
+        a_helper.write_transformed_graph(graph_wrapper, obligations)
+
+    if setting.DRAW:
+        draw_single(drawing_filename(index), graph_wrapper, obligations)
+
+    return GraphResult.of(graph_wrapper, obligations)
+
+
+def iter_sprov_parallel(service, jobs: int, ledger=None) -> Iterator[GraphResult]:
+    '''
+    The parallel counterpart of `main.iter_sprov`, using `jobs` worker processes. The results are yielded in the same order as the graphs, regardless of which finishes first.
+    The workers are spawned rather than forked, because the Prolog engine of this process can't be shared.
+    '''
+    from .main import pending_sprov_graphs
+
+    functions = injected_functions()
+    if functions:
+        raise IllegalStateError("Injected rules given as functions (in {}) can't be used by worker processes; reason in this process instead".format(', '.join(functions)))
+
+    s_helper = sh.SProvHelper(service)
+    graphs, summaries = pending_sprov_graphs(s_helper, ledger)
+
+    helpers = s_helper.prefetch_graphs(graphs) if setting.BULK_FETCH else {}
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_init_worker, initargs=(settings_snapshot(),)) as executor:
+        futures = [executor.submit(process_graph, service, graph, i, helpers.pop(graph, None)) for i, graph in enumerate(graphs)]
+        for graph, future in zip(graphs, futures):
+            result = future.result()
+            logger.debug("Finished graph %s", graph)
+            yield result
+            if ledger:
+                ledger.record(graph, summaries.get(graph, {}))
+
+
+def propagate_all_sprov_parallel(service, jobs: int, ledger=None) -> List[GraphResult]:
+    return list(iter_sprov_parallel(service, jobs, ledger))
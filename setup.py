@@ -16,7 +16,7 @@ setup(
         "lark-parser",
         "pygraphviz",
         "pyyaml",
-        "pandas",
+        "pandas>=2.0",
         "notebook",
         ],
 
@@ -24,6 +24,8 @@ setup(
     entry_points = {
         'console_scripts': [
             'draid=draid.__main__:console_entry',
+            'draid-service=draid.service:console_entry',
+            'draid-batch=draid.batch:console_entry',
         ]
     }
 )
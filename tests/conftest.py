@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/20 10:12:47
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+The fixtures shared by the tests: the rule DB (always in the temporary directory), small S-Prov runs (as an rdflib `Dataset`, or written into a TriG file which `SProvHelper` reads in place of an endpoint), and the restoring of the settings.
+The namespaces and the graph ID are also used by the test modules, which import them (`from conftest import EX`).
+'''
+
+import copy
+
+import pytest
+
+from rdflib import Dataset, Literal, Namespace, URIRef
+from rdflib.namespace import RDF
+
+from draid import injection
+from draid import setting
+from draid import rule_database_helper as rdbh
+from draid.defs.namespaces import PROV, S_PROV
+from draid.worker import _init_worker, settings_snapshot
+
+
+PROVONE = Namespace('http://purl.dataone.org/provone/2015/01/15/ontology#')
+EX = Namespace('http://example.org/')
+
+GRAPH_ID = URIRef('http://example.org/graph')
+
+
+def add_sprov(g, ns, components, flows=()):
+    '''
+    Add an S-Prov run into the graph `g`, with the terms in the namespace `ns`: the `components` (by name, with the function `f<name>`), and the `flows` of data as `(producer, data, consumer)` (`consumer` can be `None`). The ports of `data` are `out_<data>` and `in_<data>`.
+    '''
+    for name in components:
+        g.add((ns[name], RDF.type, S_PROV.Component))
+        g.add((ns[name], S_PROV.functionName, Literal(f'f{name}')))
+        g.add((ns[f'inst{name}'], RDF.type, S_PROV.ComponentInstance))
+        g.add((ns[f'inst{name}'], PROV.actedOnBehalfOf, ns[name]))
+        g.add((ns[f'inv{name}'], RDF.type, PROV.Activity))
+        g.add((ns[f'inv{name}'], PROV.wasAssociatedWith, ns[f'inst{name}']))
+    for producer, data, consumer in flows:
+        g.add((ns[data], PROV.qualifiedGeneration, ns[f'gen_{data}']))
+        g.add((ns[f'gen_{data}'], PROV.activity, ns[f'inv{producer}']))
+        g.add((ns[f'gen_{data}'], PROVONE.hadOutPort, Literal(f'out_{data}')))
+        if consumer:
+            g.add((ns[f'inv{consumer}'], PROV.qualifiedUsage, ns[f'use_{data}']))
+            g.add((ns[f'use_{data}'], PROV.entity, ns[data]))
+            g.add((ns[f'use_{data}'], PROVONE.hadInPort, Literal(f'in_{data}')))
+
+
+def add_run(ds, run_id):
+    '''
+    Add the run `run_id` as the graph `http://example.org/graph/<run_id>`: a workflow execution (with its start time and user) where A sends `d` to B, and A has a parameter `size`. Returns the graph ID and the components.
+    '''
+    ex = Namespace(f'http://example.org/{run_id}/')
+    g = ds.graph(URIRef(f'http://example.org/graph/{run_id}'))
+    g.add((ex.run, RDF.type, S_PROV.WFExecution))
+    g.add((ex.run, PROV.startedAtTime, Literal(f'2021-07-12T10:00:0{run_id[-1]}')))
+    g.add((ex.run, S_PROV.username, Literal('user')))
+    add_sprov(g, ex, 'AB', [('A', 'd', 'B')])
+    g.add((ex.invA, PROV.qualifiedUsage, ex.parUse))
+    g.add((ex.parUse, RDF.type, PROV.Usage))
+    g.add((ex.parUse, PROV.entity, ex.par))
+    g.add((ex.par, RDF.type, S_PROV.ComponentParameters))
+    g.add((ex.par, ex.size, Literal(run_id)))
+    return g.identifier, [ex.A, ex.B]
+
+
+@pytest.fixture(autouse=True)
+def rule_db_in_tmp_path(tmp_path, monkeypatch):
+    '''
+    Points the default rule DB into the temporary directory, so that the tests never read (or write a sidecar next to) the rule DB of the checkout.
+    '''
+    monkeypatch.setattr(setting, 'RULE_DB', [str(tmp_path / 'rule-db.json')])
+
+
+@pytest.fixture
+def write_trig(tmp_path):
+    '''
+    Writes a `Dataset` into a TriG file (in the temporary directory), and returns the file name.
+    '''
+    def write(ds, name='prov.trig'):
+        filename = tmp_path / name
+        ds.serialize(str(filename), format='trig')
+        return str(filename)
+    return write
+
+
+@pytest.fixture
+def sprov_file(write_trig):
+    '''
+    Writes one S-Prov run (the graph `GRAPH_ID`; see `add_sprov`) into a TriG file, and returns the file name.
+    '''
+    def build(components, flows=()):
+        ds = Dataset()
+        add_sprov(ds.graph(GRAPH_ID), EX, components, flows)
+        return write_trig(ds)
+    return build
+
+
+@pytest.fixture
+def restore_settings():
+    '''
+    Restores the settings (which `main` and the rule DBs change) after the test, and closes the rule DBs it opened.
+    '''
+    snapshot = copy.deepcopy(settings_snapshot())
+    yield
+    _init_worker(snapshot)
+    rdbh.close_rule_dbs()
+    injection.clear_cache()
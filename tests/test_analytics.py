@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/19 15:20:46
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pytest
+
+from rdflib import URIRef
+
+from draid.analytics import ObligationAnalytics, load_frames
+from draid.obligation_store import open_store
+from draid.rule import ActivatedObligation, Attribute
+
+
+C1 = URIRef('http://example.org/c1')
+C2 = URIRef('http://example.org/c2')
+ACK = 'http://www.semanticweb.org/draid/ontologies/2019/9/core#Acknowledge'
+CITE = 'http://www.semanticweb.org/draid/ontologies/2019/9/core#Cite'
+
+OBLIGATIONS = {
+        C1: [
+            ActivatedObligation(ACK, [Attribute('source_name', 'str', 'UoE'), Attribute('date', 'str', '2021-07-01')]),
+            ActivatedObligation(CITE, []),
+            ],
+        C2: [
+            ActivatedObligation(ACK, [Attribute('source_name', 'str', 'UoE'), Attribute('date', 'str', '2021-07-02T10:00:00')]),
+            ActivatedObligation(ACK, [Attribute('source_name', 'str', 'UK'), Attribute('date', 'str', '2021-07-20')]),
+            ActivatedObligation(CITE, [Attribute('count', 'int', 3)]),
+            ],
+        }
+
+
+@pytest.fixture(params=['obligation-db.json', 'obligation-db.jsonl', 'obligation-db.sqlite'])
+def analytics(request, tmp_path):
+    filename = str(tmp_path / request.param)
+    store = open_store(filename)
+    store.insert(OBLIGATIONS)
+    store.write()
+    return ObligationAnalytics(filename)
+
+
+def test_per_action(analytics):
+    assert analytics.per_action().to_dict() == {ACK: 3, CITE: 2}
+
+
+def test_per_component(analytics):
+    assert analytics.per_component().to_dict() == {str(C2): 3, str(C1): 2}
+    assert analytics.per_component(CITE).to_dict() == {str(C1): 1, str(C2): 1}
+    assert analytics.per_action_and_component().loc[str(C2), ACK] == 2
+
+
+def test_per_attribute_value(analytics):
+    assert analytics.per_attribute_value('source_name').to_dict() == {'UoE': 2, 'UK': 1}
+    counts = analytics.per_attribute_value()
+    assert counts[('source_name', 'UoE')] == 2
+    assert counts[('count', 3)] == 1
+
+
+def test_per_time_window(analytics):
+    assert analytics.per_time_window('date', 'D').sum() == 3
+    weekly = analytics.per_time_window('date', 'W')
+    assert weekly.tolist() == [2, 0, 0, 1]
+
+
+def test_table_and_export(analytics, tmp_path):
+    table = analytics.table()
+    assert len(table) == 8  # 7 attributes, and one obligation without
+    analytics.export(str(tmp_path / 'obligations.csv'))
+    assert (tmp_path / 'obligations.csv').read_text().count('\n') == 9
+
+
+def test_frames_cached(tmp_path):
+    filename = str(tmp_path / 'obligation-db.json')
+    store = open_store(filename)
+    store.insert({C1: OBLIGATIONS[C1]})
+    store.write()
+    frames = load_frames(filename)
+    assert load_frames(filename)[0] is frames[0]
+    store.insert({C2: OBLIGATIONS[C2]})
+    store.write()
+    assert len(load_frames(filename)[0]) == 5
+
+
+def test_frames_cached_wal(tmp_path):
+    filename = str(tmp_path / 'obligation-db.sqlite')
+    store = open_store(filename)
+    store._conn.execute('PRAGMA journal_mode = WAL')
+    store.insert({C1: OBLIGATIONS[C1]})
+    store.write()
+    assert len(load_frames(filename)[0]) == 2
+    store.insert({C2: OBLIGATIONS[C2]})
+    store.write()  # Only in the write-ahead log
+    assert len(load_frames(filename)[0]) == 5
+    store.close()
+
+
+def test_non_scalar_values(tmp_path):
+    obligations = {C1: [ActivatedObligation(CITE, [Attribute('authors', 'list', ['A', 'B'])])]}
+    values = []
+    for name in ('obligation-db.json', 'obligation-db.sqlite'):
+        filename = str(tmp_path / name)
+        store = open_store(filename)
+        store.insert(obligations)
+        store.write()
+        values.append(ObligationAnalytics(filename).attributes['value'].tolist())
+    assert values[0] == values[1] == [['A', 'B']]
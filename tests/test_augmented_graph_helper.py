@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/13 10:21:37
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+from types import SimpleNamespace
+
+import pytest
+
+from rdflib import BNode, Dataset, Graph, Literal, URIRef
+
+from draid import setting
+from draid.defs.namespaces import NS
+from draid.rule import ActivatedObligation, Attribute
+from draid.sparql_helper import AugmentedGraphHelper
+from draid.sparql_helper.augmented_graph_helper import augmented_graph_id
+
+from conftest import GRAPH_ID
+
+
+class DatasetAugmentedGraphHelper(AugmentedGraphHelper):
+    '''
+    Applies the updates to a local rdflib Dataset, and records them.
+    '''
+
+    def __init__(self, dataset):
+        super().__init__('http://127.0.0.1:1/sparql')
+        self.dataset = dataset
+        self.updates = []
+
+    def _u(self, update):
+        self.updates.append(update)
+        self.dataset.update(update)
+
+
+def _graph_wrapper(n):
+    g = Graph()
+    for i in range(n):
+        g.add((URIRef(f'http://example.org/component{i}'), NS['mine']['rule'], Literal(f'rule "{i}"\nline')))
+    g.add((BNode(), NS['mine']['name'], Literal('blank')))
+    return SimpleNamespace(rdf_graph=g, subgraph=GRAPH_ID)
+
+
+@pytest.mark.parametrize('batch_size, n_requests', [
+    (3, 4),
+    (5000, 1),
+    ])
+def test_write_transformed_graph(monkeypatch, batch_size, n_requests):
+    monkeypatch.setattr(setting, 'WRITE_BACK_BATCH_SIZE', batch_size)
+    ds = Dataset()
+    helper = DatasetAugmentedGraphHelper(ds)
+    obligations = {URIRef('http://example.org/component0'): [ActivatedObligation('http://example.org/obligation#Ack', [Attribute('attr', 'str', 'value')])]}
+    graph_id = helper.write_transformed_graph(_graph_wrapper(10), obligations)
+    assert graph_id == augmented_graph_id(GRAPH_ID)
+    assert len(helper.updates) == n_requests
+    written = ds.graph(graph_id)
+    assert len(written) == 12
+    assert len(list(written.objects(None, NS['mine']['activatedObligation']))) == 1
+
+    # Writing again replaces the graph
+    helper.write_transformed_graph(_graph_wrapper(5))
+    assert len(ds.graph(graph_id)) == 6
+
+
+def test_augmented_graph_id():
+    assert str(augmented_graph_id(None)).startswith(setting.AUGMENTED_GRAPH_NAMESPACE)
+    assert augmented_graph_id(GRAPH_ID) != augmented_graph_id(URIRef('http://example.org/graph2'))
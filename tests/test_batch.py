@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/15 17:02:51
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import json
+
+import pytest
+
+from draid.batch import load_manifest, run_batch
+from draid.jobs import JobSpec
+
+
+MANIFEST = '''
+defaults:
+  rule_db: [rule-db.json]
+  scheme: SPROV
+jobs:
+  - name: seismic
+    source: http://127.0.0.1:3030/prov
+  - source: runs/run1.ttl
+    scheme: CWLPROV
+    rule_db: other.json
+'''
+
+
+def test_load_manifest(tmp_path):
+    filename = tmp_path / 'jobs.yml'
+    filename.write_text(MANIFEST)
+    jobs = load_manifest(str(filename))
+    assert [name for name, _spec in jobs] == ['seismic', 'job1']
+    assert jobs[0][1] == JobSpec('http://127.0.0.1:3030/prov', 'SPROV', rule_db=['rule-db.json'])
+    assert jobs[1][1] == JobSpec('runs/run1.ttl', 'CWLPROV', rule_db=['other.json'])
+
+
+def test_load_manifest_json(tmp_path):
+    filename = tmp_path / 'jobs.json'
+    filename.write_text(json.dumps([{'source': 'a.ttl', 'name': 'a/b'}]))
+    assert load_manifest(str(filename)) == [('a_b', JobSpec('a.ttl'))]
+
+
+def test_load_manifest_shared_jsonl(tmp_path):
+    filename = tmp_path / 'jobs.json'
+    filename.write_text(json.dumps({'defaults': {'obligation_db': 'ob.jsonl'}, 'jobs': [{'source': 'a'}, {'source': 'b'}]}))
+    assert len(load_manifest(str(filename))) == 2
+
+
+@pytest.mark.parametrize('manifest, error', [
+    ({'jobs': [{'name': 'x'}]}, r'Job 0 \(x\): `source` is required'),
+    ({'jobs': [{'source': 'a', 'name': 'x'}, {'source': 'b', 'name': 'x'}]}, 'duplicated name'),
+    ({'job': []}, 'mapping with the `jobs` list'),
+    ({'jobs': [], 'workers': 2}, 'Unknown manifest fields: workers'),
+    ({'jobs': [{'source': 'a', 'name': 'summary'}]}, 'the name `summary` is reserved'),
+    ({'defaults': {'obligation_db': 'ob.json'}, 'jobs': [{'source': 'a'}, {'source': 'b'}]}, r'Job 1 \(job1\): `obligation_db` .*ob.json is also written by job job0'),
+    ({'jobs': [{'source': 'a', 'rule_db': ['r.json'], 'db_write_to': True}, {'source': 'b', 'db_write_to': 'r.json'}]}, '`db_write_to`'),
+    ({'defaults': {'draw': True, 'draw_dir': 'graphs'}, 'jobs': [{'source': 'a'}, {'source': 'b'}]}, '`draw_dir`'),
+    ])
+def test_load_manifest_invalid(tmp_path, manifest, error):
+    filename = tmp_path / 'jobs.json'
+    filename.write_text(json.dumps(manifest))
+    with pytest.raises(ValueError, match=error):
+        load_manifest(str(filename))
+
+
+def fake_runner(spec):
+    if spec.source == 'broken':
+        raise RuntimeError('broken source')
+    return {'graphs': [{'graph': None, 'obligations': [('c', ('acknowledge', []))]}]}, 0.5
+
+
+def test_run_batch(tmp_path):
+    jobs = [('a', JobSpec('a.ttl')), ('b', JobSpec('broken'))]
+    summary = run_batch(jobs, str(tmp_path), workers=0, runner=fake_runner)
+
+    assert summary['failed'] == 1
+    assert [entry['status'] for entry in summary['jobs']] == ['done', 'failed']
+    assert summary['jobs'][0]['obligations'] == 1
+    assert 'broken source' in summary['jobs'][1]['error']
+
+    with open(tmp_path / 'a.json') as fd:
+        result = json.load(fd)
+    assert result['spec']['source'] == 'a.ttl'
+    assert len(result['graphs']) == 1
+    assert not (tmp_path / 'b.json').exists()
+    with open(tmp_path / 'summary.json') as fd:
+        assert json.load(fd)['failed'] == 1
+
+
+def test_run_batch_draw_dir(tmp_path):
+    jobs = [('a', JobSpec('a.ttl', draw=True)), ('b', JobSpec('b.ttl', draw=True, draw_dir='graphs')), ('c', JobSpec('c.ttl'))]
+    run_batch(jobs, str(tmp_path), workers=0, runner=fake_runner)
+    specs = {name: json.loads((tmp_path / (name + '.json')).read_text())['spec'] for name, _spec in jobs}
+    assert specs['a']['draw_dir'] == str(tmp_path / 'a')
+    assert specs['b']['draw_dir'] == 'graphs'
+    assert specs['c']['draw_dir'] is None
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/16 11:05:42
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pytest
+
+from draid import main as draid_main
+from draid import setting
+from draid.checkpoint import Checkpoint, CheckpointMismatchError
+from draid.graph_wrapper import ComponentAugmentation, GraphWrapper
+from draid.rule import ActivatedObligation
+from draid.rule import parser
+from draid.sparql_helper import SProvHelper
+
+from conftest import EX, GRAPH_ID
+
+
+# A -d1-> B -d2-> C
+FLOWS = [('A', 'd1', 'B'), ('B', 'd2', 'C'), ('C', 'd3', None)]
+
+RULE = 'begin attribute(name, str "v1"). end'
+
+
+@pytest.fixture
+def prov_file(sprov_file):
+    return sprov_file('ABC', FLOWS)
+
+
+def _graph(prov_file):
+    return GraphWrapper.from_sprov(SProvHelper(prov_file), subgraph=GRAPH_ID)
+
+
+@pytest.fixture
+def fake_propagate(monkeypatch):
+    '''
+    Replaces the reasoning (which needs Prolog): every component outputs `RULE` on all its output ports, and activates an obligation.
+    '''
+    calls = []
+
+    def propagate(graph, batch):
+        calls.append(list(batch))
+        rule = parser.parse_data_rule(RULE)
+        augmentations = [ComponentAugmentation(component, {graph.name_of_port(port): rule for port in graph.output_ports(component)}) for component in batch]
+        return augmentations, {component: [ActivatedObligation('acknowledge', [])] for component in batch}
+
+    monkeypatch.setattr(draid_main.reason, 'propagate', propagate)
+    monkeypatch.setattr(setting, 'AIO', False)
+    return calls
+
+
+def _output_rules(graph):
+    return {component: [graph.get_data_rule(port) is not None for port in graph.output_ports(component)] for component in graph.components()}
+
+
+def test_record_and_resume(prov_file, tmp_path, fake_propagate):
+    filename = str(tmp_path / 'checkpoint.jsonl')
+
+    checkpoint = Checkpoint(filename)
+    graph, obligations = draid_main.propagate_single(_graph(prov_file), checkpoint)
+    checkpoint.close()
+    assert fake_propagate == [[EX.A], [EX.B], [EX.C]]
+    expected_rules = _output_rules(graph)
+
+    # Simulate dying while writing the record of the last level
+    with open(filename) as fd:
+        lines = fd.readlines()
+    with open(filename, 'w') as fd:
+        fd.writelines(lines[:-1])
+        fd.write(lines[-1][:20])
+
+    fake_propagate.clear()
+    checkpoint = Checkpoint(filename, resume=True)
+    assert checkpoint.completed(GRAPH_ID) == 2
+    resumed, resumed_obligations = draid_main.propagate_single(_graph(prov_file), checkpoint)
+    checkpoint.close()
+    assert fake_propagate == [[EX.C]]
+    assert _output_rules(resumed) == expected_rules
+    assert set(resumed_obligations) == set(obligations)
+    assert [ob.name for ob in resumed_obligations[EX.A]] == ['acknowledge']
+
+    # Everything is recorded now
+    fake_propagate.clear()
+    checkpoint = Checkpoint(filename, resume=True)
+    draid_main.propagate_single(_graph(prov_file), checkpoint)
+    checkpoint.close(remove=True)
+    assert fake_propagate == []
+    assert not (tmp_path / 'checkpoint.jsonl').exists()
+
+
+def test_no_resume_starts_over(prov_file, tmp_path, fake_propagate):
+    filename = str(tmp_path / 'checkpoint.jsonl')
+    checkpoint = Checkpoint(filename)
+    draid_main.propagate_single(_graph(prov_file), checkpoint)
+    checkpoint.close()
+
+    checkpoint = Checkpoint(filename)
+    assert checkpoint.completed(GRAPH_ID) == 0
+    checkpoint.close()
+
+
+def test_mismatch(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'checkpoint.jsonl')
+    monkeypatch.setattr(setting, 'AIO', False)
+    Checkpoint(filename).close()
+    monkeypatch.setattr(setting, 'AIO', True)
+    with pytest.raises(CheckpointMismatchError):
+        Checkpoint(filename, resume=True)
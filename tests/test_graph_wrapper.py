@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/14 15:03:26
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pytest
+
+from draid import recognizer as rcg
+from draid import setting
+from draid.graph_wrapper import GraphWrapper
+from draid.graph_wrapper.rdf_helper import NS
+from draid.rule import parser
+from draid.sparql_helper import SProvHelper
+
+from conftest import EX, GRAPH_ID
+
+
+# (producer, data, consumer)
+FLOWS = [
+        ('A', 'd1', 'B'),
+        ('B', 'd2', 'C'),
+        ('A', 'd3', 'D'),
+        ('E', 'd4', None),
+        ]
+
+
+@pytest.fixture
+def graph_wrapper(sprov_file):
+    return GraphWrapper.from_sprov(SProvHelper(sprov_file('ABCDE', FLOWS)), subgraph=GRAPH_ID)
+
+
+def test_component_to_batches(graph_wrapper):
+    batches = graph_wrapper.component_to_batches()
+    assert [set(batch) for batch in batches] == [{EX.A, EX.E}, {EX.B, EX.D}, {EX.C}]
+    assert graph_wrapper.component_to_batches({EX.C, EX.A}) == [[EX.A], [EX.C]]
+
+
+@pytest.mark.parametrize('changed, dirty', [
+    ([EX.A], {EX.A, EX.B, EX.C, EX.D}),
+    ([EX.B], {EX.B, EX.C}),
+    ([EX.d1], {EX.B, EX.C}),
+    ([EX.d3, EX.E], {EX.D, EX.E}),
+    ([], set()),
+    ])
+def test_dirty_components(graph_wrapper, changed, dirty):
+    assert graph_wrapper.dirty_components(changed) == dirty
+
+
+def test_reapply_data_rules(graph_wrapper, monkeypatch):
+    rule = 'begin attribute(name, str "v1"). end'
+    monkeypatch.setattr(setting, 'INJECTED_DATA_RULE', {None: {EX.d1: rule, EX.d3: rule}})
+    rcg.apply_data_rules(graph_wrapper)
+    assert graph_wrapper.get_data_rule(EX.d1) is not None
+
+    monkeypatch.setattr(setting, 'INJECTED_DATA_RULE', {None: {EX.d1: rule.replace('v1', 'v2')}})
+    graph_wrapper.remove_rules([EX.d1, EX.d3])
+    rcg.apply_data_rules(graph_wrapper, data=[EX.d1, EX.d3])
+    assert 'v2' in graph_wrapper.get_data_rule(EX.d1).dump()
+    assert graph_wrapper.get_data_rule(EX.d3) is None
+
+
+
+def test_clear_output_rules(graph_wrapper):
+    rule = parser.parse_data_rule('begin attribute(name, str "v1"). end')
+    out_ports = graph_wrapper.output_ports(EX.A)
+    graph_wrapper.set_data_rules({port: rule for port in out_ports})
+    graph_wrapper.set_data_rules({port: rule for port in out_ports})  # Replaces rather than adds
+    assert all(graph_wrapper.get_data_rule(port) for port in out_ports)
+    graph_wrapper.clear_output_rules(EX.A)
+    assert not any(graph_wrapper.get_data_rule(port) for port in out_ports)
+
+
+def test_recognise(graph_wrapper, monkeypatch):
+    rule = 'begin attribute(name, str "{}"). end'
+    monkeypatch.setattr(setting, 'INJECTED_FLOW_RULE', {None: {'fB': '"in_d1" -> "out_d2"', EX.A: '"in_d2" -> "x"'}, GRAPH_ID: {EX.B: '"in_d1" -> "y"'}})
+    monkeypatch.setattr(setting, 'INJECTED_IMPORTED_RULE', {None: {'fA': {None: rule.format('a')}, EX.E: {None: rule.format('e'), 'extra': rule.format('e2')}}, GRAPH_ID: {'fE': {None: rule.format('g')}}})
+    monkeypatch.setattr(setting, 'INJECTED_DATA_RULE', {None: {EX.d1: rule.format('d1'), EX.d4: rule.format('d4')}, GRAPH_ID: {EX.d4: rule.format('g4')}})
+    nodes = graph_wrapper.components() + graph_wrapper.data()
+
+    def rules():
+        return {triple for predicate in ('rule', 'flowRule', 'importedRule') for triple in graph_wrapper.rdf_graph.triples((None, NS['mine'][predicate], None))}
+
+    rcg.recognise(graph_wrapper)
+    recognised = rules()
+    assert len(recognised) == 6
+    assert [rule.dump(compact=True) for rule in graph_wrapper.get_imported_rules(EX.E).values()] == ['begin attribute(name, [str "g"]). end']  # The rules of the graph take precedence
+    assert 'g4' in graph_wrapper.get_data_rule(EX.d4).dump()
+
+    graph_wrapper.remove_rules(nodes)
+    rcg.apply_flow_rules(graph_wrapper)
+    rcg.apply_imported_rules(graph_wrapper)
+    rcg.apply_data_rules(graph_wrapper)
+    assert rules() == recognised
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/19 09:41:27
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pytest
+
+from rdflib import URIRef
+
+from draid import injection
+from draid import rule_database_helper as rdbh
+from draid import setting
+from draid.injection import Link
+
+
+G1, G2, G3 = (URIRef(f'http://example.org/graph{i}') for i in (1, 2, 3))
+D1, D2, D3, D4 = (URIRef(f'http://example.org/d{i}') for i in (1, 2, 3, 4))
+
+
+@pytest.fixture
+def links(restore_settings):
+    setting.INJECTED_DATA_RULE = {G1: {D1: 'rule d1'}, None: {D4: 'rule d4'}}
+    setting.LINK = []
+    injection.clear_cache()
+    return setting.LINK
+
+
+def test_priority(links):
+    links.extend([
+        Link(None, D4, None, D2),
+        Link(G1, D1, G2, D2),
+        Link(G1, D1, G3, D3),
+        ])
+    assert injection.find_upstream_in_link(G2, D2).from_uri == D1
+    assert injection.find_upstream_in_link(G1, D2).from_uri == D4
+    assert injection.find_upstream_in_link(None, D3) is None
+    assert injection.get_rule_from_link(G2, D2) == 'rule d1'
+    assert injection.get_rule_from_link(G1, D2) == 'rule d4'
+
+
+def test_transitive(links):
+    links.extend([
+        Link(G1, D1, G2, D2),  # graph1 -> graph2 -> graph3
+        Link(G2, D2, G3, D3),
+        ])
+    assert injection.get_rule_from_link(G3, D3) == 'rule d1'
+    assert injection.get_rule_from_link(G2, D2) == 'rule d1'
+
+
+def test_cycle(links):
+    links.extend([
+        Link(G3, D3, G2, D2),
+        Link(G2, D2, G3, D3),
+        ])
+    assert injection.get_rule_from_link(G3, D3) is None
+    assert injection.get_rule_from_link(G2, D2) is None
+
+
+def test_memoised(links, monkeypatch):
+    links.append(Link(G1, D1, G2, D2))
+    assert injection.get_rule_from_link(G2, D2) == 'rule d1'
+    monkeypatch.setattr(injection, 'find_upstream_in_link', lambda *args: pytest.fail('Not memoised'))
+    assert injection.get_rule_from_link(G2, D2) == 'rule d1'
+    monkeypatch.undo()
+    links[0] = Link(None, D4, G2, D2)  # Not noticed until the cache is cleared
+    assert injection.get_rule_from_link(G2, D2) == 'rule d1'
+    injection.clear_cache()
+    assert injection.get_rule_from_link(G2, D2) == 'rule d4'
+
+
+def test_cleared_when_reopened_or_written(links, tmp_path):
+    setting.RULE_DB = [str(tmp_path / 'rule-db.db')]
+    setting.DB_WRITE_TO = True
+    links.append(Link(None, D1, None, D2))
+    assert injection.get_rule_from_link(None, D2) is None
+    rdbh.update_db_with_data_rules({str(D1): 'rule d1 in db'})
+    rdbh.init_default()
+    assert injection.get_rule_from_link(None, D2) == 'rule d1 in db'
+    rdbh.update_db_with_data_rules({str(D1): 'rule d1 new'})
+    assert injection.get_rule_from_link(None, D2) == 'rule d1 new'
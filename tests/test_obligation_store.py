@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/18 10:14:36
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pytest
+
+from rdflib import URIRef
+
+from draid import setting
+from draid.obligation_store import JSONLObligationStore, ObligationStore, SQLiteObligationStore, open_store
+from draid.rule import ActivatedObligation, Attribute
+
+
+C1 = URIRef('http://example.org/c1')
+C2 = URIRef('http://example.org/c2')
+ACK = 'http://www.semanticweb.org/draid/ontologies/2019/9/core#Acknowledge'
+CITE = 'http://www.semanticweb.org/draid/ontologies/2019/9/core#Cite'
+
+OBLIGATIONS = {
+        C1: [ActivatedObligation(ACK, [Attribute('source_name', 'str', 'UoE')]), ActivatedObligation(CITE, [])],
+        C2: [ActivatedObligation(ACK, [Attribute('source_name', 'str', 'UK')]), ActivatedObligation(ACK, [Attribute('count', 'int', 3)])],
+        }
+
+
+def _dumped(pairs):
+    return [(str(component), ob.name, [(attr.name, attr.type, attr.value) for attr in ob.attributes]) for component, ob in pairs]
+
+
+@pytest.fixture(params=['obligation-db.json', 'obligation-db.jsonl', 'obligation-db.sqlite'])
+def store_file(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_open_store(tmp_path):
+    assert isinstance(open_store(str(tmp_path / 'a.json')), ObligationStore)
+    assert isinstance(open_store(str(tmp_path / 'a.db')), SQLiteObligationStore)
+    assert isinstance(open_store(str(tmp_path / 'a.jsonl')), JSONLObligationStore)
+
+
+def test_persist(store_file):
+    store = open_store(store_file)
+    store.insert(OBLIGATIONS)
+    store.write()
+    expected = _dumped((component, ob) for component, ob_list in OBLIGATIONS.items() for ob in ob_list)
+    assert _dumped(open_store(store_file).list()) == expected
+
+
+@pytest.mark.parametrize('conditions, expected', [
+    ({'component': C1}, [(C1, 0), (C1, 1)]),
+    ({'action': ACK}, [(C1, 0), (C2, 0), (C2, 1)]),
+    ({'action': ACK, 'component': C2}, [(C2, 0), (C2, 1)]),
+    ({'attribute': 'source_name'}, [(C1, 0), (C2, 0)]),
+    ({'value': 'UK'}, [(C2, 0)]),
+    ({'attribute': 'count', 'value': 3}, [(C2, 1)]),
+    ({'attribute': 'source_name', 'value': 3}, []),
+    ({}, [(C1, 0), (C1, 1), (C2, 0), (C2, 1)]),
+    ])
+def test_query(store_file, conditions, expected):
+    store = open_store(store_file)
+    store.insert(OBLIGATIONS)
+    assert _dumped(store.query(**conditions)) == _dumped((component, OBLIGATIONS[component][i]) for component, i in expected)
+
+
+def test_find(store_file):
+    store = open_store(store_file)
+    store.insert(OBLIGATIONS)
+    assert [ob.name for ob in store.find(C2)] == [ACK, ACK]
+    assert store.find(URIRef('http://example.org/none')) == []
+
+
+def test_sqlite_deduplicates_and_deletes(tmp_path):
+    filename = str(tmp_path / 'obligation-db.sqlite')
+    store = SQLiteObligationStore(filename)
+    store.insert(OBLIGATIONS)
+    store.write()
+    store.close()
+
+    store = SQLiteObligationStore(filename)
+    store.insert(OBLIGATIONS)  # Equal obligations from another run
+    store.insert({C1: [ActivatedObligation(ACK, [Attribute('source_name', 'str', 'UoE'), Attribute('year', 'int', 2021)])]})
+    assert len(store) == 5
+    store.delete(0, 4)
+    store.write()
+    assert _dumped(SQLiteObligationStore(filename).list()) == _dumped([(C1, OBLIGATIONS[C1][1]), (C2, OBLIGATIONS[C2][0]), (C2, OBLIGATIONS[C2][1])])
+    assert SQLiteObligationStore(filename).query(value='UoE') == []
+
+
+def _lines(filename):
+    with open(filename) as fd:
+        return fd.read().splitlines()
+
+
+def test_jsonl_appends_new_only(tmp_path):
+    filename = str(tmp_path / 'obligation-db.jsonl')
+    store = JSONLObligationStore(filename)
+    store.insert({C1: OBLIGATIONS[C1]})
+    store.write()
+    first = _lines(filename)
+    assert len(first) == 2
+
+    store = JSONLObligationStore(filename)
+    store.insert(OBLIGATIONS)
+    store.write()
+    store.write()
+    lines = _lines(filename)
+    assert lines[:2] == first
+    assert len(lines) == 4
+
+
+def test_jsonl_concurrent_writers(tmp_path):
+    filename = str(tmp_path / 'obligation-db.jsonl')
+    store1 = JSONLObligationStore(filename)
+    store2 = JSONLObligationStore(filename)
+    store1.insert({C1: OBLIGATIONS[C1]})
+    store2.insert(OBLIGATIONS)
+    store1.write()
+    store2.write()  # Sees what store1 appended, and only appends the rest
+    assert len(_lines(filename)) == 4
+    store1.write()
+    assert len(store1.list()) == 4
+    assert _dumped(JSONLObligationStore(filename).list()) == _dumped(store1.list())
+
+
+def test_jsonl_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(setting, 'OBLIGATION_LOG_COMPACT_RATIO', 1.5)
+    filename = str(tmp_path / 'obligation-db.jsonl')
+    store = JSONLObligationStore(filename)
+    store.insert(OBLIGATIONS)
+    store.write()
+    other = JSONLObligationStore(filename)
+
+    with open(filename, 'a') as fd:  # Duplicates, and a line broken by a crashed writer
+        fd.write('\n'.join(_lines(filename)) + '\n["http://example.org/c1", ["ack')
+    assert len(JSONLObligationStore(filename).list()) == 4
+
+    store.insert({C1: [ActivatedObligation(CITE, [Attribute('year', 'int', 2021)])]})
+    store.write()  # 10 lines for 5 obligations: only appended
+    assert len(_lines(filename)) == 10
+    store.close()  # Compacted
+    assert len(_lines(filename)) == 5
+
+    store.delete(0)
+    store.write()
+    assert len(_lines(filename)) == 4
+    other.insert({C2: [ActivatedObligation(CITE, [])]})
+    other.write()  # The file has been replaced meanwhile
+    assert _dumped(JSONLObligationStore(filename).list()) == _dumped(store.list() + [(C2, ActivatedObligation(CITE, []))])
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/19 17:02:51
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pickle
+
+import pytest
+
+from draid.defs.exception import OntologyTypeException
+from draid.rule.proto import obligation, utils
+from draid.rule.proto import get_obligation
+from draid.rule.ontologiable import ObligationOntoString
+
+
+def test_ontology_loaded_once():
+    onto = utils.import_ontology('core.owl')
+    assert utils.import_ontology('core.owl') is onto
+
+
+def test_obligation_memoised(monkeypatch):
+    acknowledge = get_obligation(None, 'Acknowledge')
+    assert get_obligation('core.owl', 'Acknowledge') is acknowledge
+    monkeypatch.setattr(obligation, '_resolve_obligation', lambda *args: pytest.fail('Resolved again'))
+    assert get_obligation(None, 'Acknowledge') is acknowledge
+    assert get_obligation('core.owl', 'Acknowledge') is acknowledge
+
+
+def test_unknown_obligation_not_memoised():
+    with pytest.raises(OntologyTypeException):
+        get_obligation(None, 'NoSuchObligation')
+    assert (None, 'NoSuchObligation') not in obligation._obligations
+
+
+def test_onto_string_interned():
+    s = ObligationOntoString('core:Acknowledge')
+    assert ObligationOntoString('core:Acknowledge') is s
+    assert ObligationOntoString('Acknowledge') == s
+    assert ObligationOntoString(':Acknowledge').dump() == ':Acknowledge'
+    assert pickle.loads(pickle.dumps(s)) is s
+
+
+def test_onto_string_namespaces():
+    assert ObligationOntoString('my:Acknowledge', namespaces={'my': 'core.owl'}) == ObligationOntoString('Acknowledge')
+    with pytest.raises(KeyError):
+        ObligationOntoString('unbound:Acknowledge')
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/17 11:30:25
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import threading
+import time
+
+import pytest
+
+from draid.pipeline import run_pipeline
+
+
+DELAY = 0.05
+
+
+def test_run_pipeline_overlaps():
+    items = list(range(6))
+    processed_in = set()
+
+    def fetch(item):
+        time.sleep(DELAY)
+        return item * 10
+
+    def process(index, item, fetched):
+        processed_in.add(threading.current_thread().name)
+        time.sleep(DELAY)
+        return fetched + 1
+
+    def write(index, item, processed):
+        time.sleep(DELAY)
+        return (index, item, processed)
+
+    start = time.perf_counter()
+    results = run_pipeline(items, fetch, process, write, prefetch=2, write_depth=2)
+    elapsed = time.perf_counter() - start
+
+    assert results == [(i, i, i * 10 + 1) for i in items]
+    assert processed_in == {threading.main_thread().name}
+    assert elapsed < 3 * DELAY * len(items) * 0.7  # Sequential would take 3 * DELAY per item
+
+
+def test_run_pipeline_error():
+    def process(index, item, fetched):
+        if item == 2:
+            raise ValueError('bad graph')
+        return fetched
+
+    with pytest.raises(ValueError, match='bad graph'):
+        run_pipeline(range(5), lambda item: item, process, lambda index, item, processed: processed)
+
+
+def test_run_pipeline_empty():
+    assert run_pipeline([], lambda item: item, lambda *args: None, lambda *args: None) == []
+
+
+def test_run_pipeline_prefetch_limit():
+    lock = threading.Lock()
+    in_flight = [0, 0]  # Now, at most
+
+    def fetch(item):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(DELAY / 5)
+        return item
+
+    def process(index, item, fetched):
+        with lock:
+            in_flight[0] -= 1
+        time.sleep(DELAY)
+        return fetched
+
+    run_pipeline(range(6), fetch, process, lambda index, item, processed: processed, prefetch=2)
+    assert in_flight[1] == 2
+
+
+def test_run_pipeline_write_error():
+    written = []
+
+    def write(index, item, processed):
+        if item == 1:
+            raise ValueError('bad write')
+        written.append(item)
+        return processed
+
+    with pytest.raises(ValueError, match='bad write'):
+        run_pipeline(range(20), lambda item: item, lambda index, item, fetched: fetched, write, write_depth=2)
+    assert len(written) < 19  # Stopped processing after the error
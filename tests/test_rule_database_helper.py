@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/18 16:32:05
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import json
+
+import pytest
+
+from rdflib import URIRef
+
+from draid import injection
+from draid import rule_database_helper as rdbh
+from draid import setting
+from draid.defs.exception import ParseError
+from draid.rule import AttributeCapsule, DataRuleContainer, ObligationDeclaration
+from draid.rule import parser
+from draid.rule.flow_rule import FlowRule, Propagate
+
+
+G1 = 'http://example.org/graph1'
+
+RULE_DB = {
+        'data_rules': {
+            '': {'uri': {'http://example.org/d1': 'rule d1', 'http://example.org/d2': 'rule d2'}},
+            G1: {'uri': {'http://example.org/d1': 'rule d1 in g1'}},
+            },
+        'imported_rules': {
+            '': {
+                'uri': {'http://example.org/c1': 'rule c1'},
+                'function': {'Source': {'': 'rule source', 'extra': 'rule source extra'}},
+                },
+            },
+        'flow_rules': {
+            G1: {'function': {'Split': "{'output0': ['input0']}"}},
+            },
+        'link': {
+            G1: {'http://example.org/d1': {'': 'http://example.org/d3'}},
+            },
+        }
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def rule_db(request, tmp_path, restore_settings):
+    json_db = tmp_path / 'rule-db.json'
+    json_db.write_text(json.dumps(RULE_DB))
+    if request.param == 'json':
+        filename = str(json_db)
+    else:
+        filename = str(tmp_path / 'rule-db.sqlite')
+        rdbh.json_to_sqlite(str(json_db), filename)
+    setting.RULE_DB = [filename]
+    rdbh.init_default()
+    return filename
+
+
+def test_injected_rules(rule_db):
+    d1, d2, c1, c9 = (URIRef(f'http://example.org/{name}') for name in ('d1', 'd2', 'c1', 'c9'))
+    assert rdbh.injected_rules('data', None, [d1, d2, c9]) == {d1: 'rule d1', d2: 'rule d2'}
+    assert rdbh.injected_rules('data', URIRef(G1), [d1, d2]) == {d1: 'rule d1 in g1'}
+    assert rdbh.injected_rules('imported', None, [c1, c9, 'Source', 'Sink']) == {c1: {None: 'rule c1'}, 'Source': {None: 'rule source', 'extra': 'rule source extra'}}
+    assert rdbh.injected_rules('flow', URIRef(G1), [c1, 'Split']) == {'Split': "{'output0': ['input0']}"}
+    assert rdbh.injected_rules('flow', None, [c1, 'Split']) == {}
+
+
+def test_rule_from_link(rule_db):
+    assert injection.get_rule_from_link(None, URIRef('http://example.org/d3')) == 'rule d1 in g1'
+    assert injection.get_rule_from_link(None, URIRef('http://example.org/d4')) is None
+
+
+def test_settings_untouched(rule_db):
+    assert setting.INJECTED_DATA_RULE == {}
+    assert setting.LINK == []
+
+
+@pytest.mark.parametrize('order', [('db', 'json'), ('json', 'db')])
+def test_later_rule_db_overrides(tmp_path, restore_settings, order):
+    d1 = URIRef('http://example.org/d1')
+    json_db = tmp_path / 'rule-db.json'
+    json_db.write_text(json.dumps({'data_rules': {'': {'uri': {str(d1): 'from json'}}}}))
+    sqlite_db = str(tmp_path / 'rule-db.db')
+    sqlite = rdbh.SQLiteRuleDB(sqlite_db)
+    sqlite.update_data_rules({str(d1): 'from db'})
+    sqlite.close()
+    filenames = {'json': str(json_db), 'db': sqlite_db}
+    setting.RULE_DB = [filenames[suffix] for suffix in order]
+    rdbh.init_default()
+    assert rdbh.injected_rules('data', None, [d1]) == {d1: 'from ' + order[-1]}
+
+
+def test_migrate_sqlite_schema(tmp_path, restore_settings):
+    import sqlite3
+    filename = str(tmp_path / 'rule-db.db')
+    conn = sqlite3.connect(filename)
+    conn.executescript('''
+    CREATE TABLE rule (kind TEXT NOT NULL, graph TEXT NOT NULL, uri TEXT, function TEXT, port TEXT NOT NULL DEFAULT '', rule TEXT NOT NULL, UNIQUE (kind, graph, uri, function, port));
+    CREATE TABLE link (from_graph TEXT NOT NULL, from_uri TEXT NOT NULL, to_graph TEXT NOT NULL, to_uri TEXT NOT NULL, UNIQUE (from_graph, from_uri, to_graph, to_uri));
+    INSERT INTO rule (kind, graph, uri, function, port, rule) VALUES ('data', '', 'http://example.org/d1', NULL, '', 'rule1');
+    INSERT INTO rule (kind, graph, uri, function, port, rule) VALUES ('data', '', 'http://example.org/d1', NULL, '', 'rule1 new');
+    ''')  # The first schema, where NULLs made duplicates
+    conn.commit()
+    conn.close()
+
+    setting.RULE_DB = [filename]
+    setting.DB_WRITE_TO = True
+    rdbh.update_db_with_data_rules({'http://example.org/d2': 'rule2'})
+    conn = sqlite3.connect(filename)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == rdbh._SCHEMA_VERSION
+    assert conn.execute("SELECT uri, function, rule FROM rule ORDER BY uri").fetchall() == [('http://example.org/d1', '', 'rule1 new'), ('http://example.org/d2', '', 'rule2')]
+
+    conn.execute('PRAGMA user_version = {}'.format(rdbh._SCHEMA_VERSION + 1))
+    conn.close()
+    with pytest.raises(ParseError, match='schema version'):
+        rdbh.SQLiteRuleDB(filename)
+
+
+def test_update_sqlite_db(tmp_path, restore_settings):
+    db = str(tmp_path / 'rule-db.db')
+    setting.RULE_DB = [db]
+    setting.DB_WRITE_TO = True
+    rdbh.update_db_with_data_rules({'http://example.org/d1': 'rule1'})
+    rdbh.update_db_with_data_rules({'http://example.org/d1': 'rule1 new', 'http://example.org/d2': 'rule2'})
+    rdbh.init_default()
+    d1, d2 = URIRef('http://example.org/d1'), URIRef('http://example.org/d2')
+    assert rdbh.injected_rules('data', None, [d1, d2]) == {d1: 'rule1 new', d2: 'rule2'}
+
+
+def test_update_json_db(tmp_path, restore_settings):
+    db = tmp_path / 'rule-db.json'
+    setting.RULE_DB = [str(db)]
+    setting.DB_WRITE_TO = True
+    writer = rdbh.RuleDBWriter()
+    writer.add({'http://example.org/d1': 'rule1'})
+    writer.add({'http://example.org/d1': 'rule1 new', 'http://example.org/d2': 'rule2'})
+    writer.flush()
+    assert json.loads(db.read_text())['data_rules'][''] == {'http://example.org/d1': 'rule1 new', 'http://example.org/d2': 'rule2'}
+    assert [path.name for path in tmp_path.iterdir()] == ['rule-db.json']
+
+    inode = db.stat().st_ino
+    rdbh.update_db_with_data_rules({'http://example.org/d2': 'rule2'})
+    assert db.stat().st_ino == inode  # Nothing changed, so not rewritten
+    rdbh.update_db_with_data_rules({'http://example.org/d2': 'rule2 new'})
+    assert db.stat().st_ino != inode
+
+
+def test_parsed_rule_cache(tmp_path, restore_settings, monkeypatch):
+    data_rule = 'begin obligation(ob1, [pr1], null). attribute(pr1, str "a"). end'
+    flow_rule = '"input1" -> "output1"'
+    db = tmp_path / 'rule-db.json'
+    def write_db(data_rule):
+        db.write_text(json.dumps({'data_rules': {'': {'uri': {'http://example.org/d1': data_rule, 'http://example.org/d2': 'malformed'}}},
+            'flow_rules': {'': {'function': {'Split': flow_rule}}}}))
+    write_db(data_rule)
+    setting.RULE_DB = [str(db)]
+    rdbh.init_default()
+    sidecar = tmp_path / 'rule-db.json.parsed'
+    assert sidecar.exists()
+
+    def reload_without_lark():
+        monkeypatch.setattr(rdbh, '_rule_db_cache', {})
+        monkeypatch.setattr(parser, '_raw_cache', {})
+        monkeypatch.setattr(parser, 'make_parser_call_template', lambda *args: pytest.fail('Parsed again'))
+        rdbh.init_default()
+
+    reload_without_lark()
+    assert parser.parse_data_rule(data_rule) == DataRuleContainer([ObligationDeclaration('ob1', [('pr1', 0)])], [AttributeCapsule.from_raw('pr1', [('str', 'a')])])
+    assert parser.parse_flow_rule(flow_rule) == FlowRule([Propagate('input1', ['output1'])])
+    monkeypatch.undo()
+
+    write_db(data_rule.replace('"a"', '"bb"'))  # Changed: parsed again
+    setting.RULE_DB = [str(db)]
+    rdbh.init_default()
+    reload_without_lark()
+    assert parser.parse_data_rule(data_rule.replace('"a"', '"bb"'))
+
+
+def test_preload_raw_bounded(monkeypatch):
+    monkeypatch.setattr(parser, '_raw_cache', {})
+    monkeypatch.setattr(parser, 'RAW_CACHE_SIZE', 2)
+    parsed = parser.dump_raw([('flow_rule', '"input{}" -> "output"'.format(i)) for i in range(3)])
+    parser._raw_cache.clear()
+    parser.preload_raw(parsed)
+    assert list(parser._raw_cache) == list(parsed)[1:]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/13 11:40:12
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+from rdflib import URIRef
+
+from draid.run_ledger import RunLedger, fingerprint
+
+
+G1 = URIRef('http://example.org/graph1')
+G2 = URIRef('http://example.org/graph2')
+G3 = URIRef('http://example.org/graph3')
+
+SUMMARIES = {
+        G1: {'startTime': '2021-07-12T10:00:00', 'size': '100'},
+        G2: {'startTime': '2021-07-12T11:00:00', 'size': '200'},
+        G3: {'startTime': '2021-07-12T12:00:00', 'size': '300'},
+        }
+
+
+def test_fingerprint():
+    assert fingerprint(SUMMARIES[G1]) == fingerprint(dict(SUMMARIES[G1]))
+    assert fingerprint(SUMMARIES[G1]) != fingerprint({'startTime': '2021-07-12T10:00:00', 'size': '101'})
+    assert fingerprint(dict(SUMMARIES[G1], digest='01')) != fingerprint(dict(SUMMARIES[G1], digest='02'))
+
+
+def test_pending(tmp_path):
+    filename = str(tmp_path / 'ledger.json')
+    ledger = RunLedger(filename)
+    assert ledger.pending([G1, G2, G3], SUMMARIES) == [G1, G2, G3]
+    ledger.record(G1, SUMMARIES[G1])
+    ledger.record(G2, SUMMARIES[G2])
+    ledger.write()
+
+    ledger = RunLedger(filename)
+    assert ledger.get(G1)['startTime'] == SUMMARIES[G1]['startTime']
+    changed = dict(SUMMARIES)
+    changed[G2] = {'startTime': '2021-07-12T11:00:00', 'size': '201'}
+    assert ledger.pending([G1, G2, G3], changed) == [G2, G3]
+
+
+def test_not_written_without_write(tmp_path):
+    filename = str(tmp_path / 'ledger.json')
+    ledger = RunLedger(filename)
+    ledger.record(G1, SUMMARIES[G1])
+    assert RunLedger(filename).pending([G1], SUMMARIES) == [G1]
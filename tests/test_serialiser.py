@@ -54,10 +54,13 @@ def test_data_rule_serialise(name, validity_binding, activation_condition):
     ([ObligationDeclaration('ob1', [('pr1', 0)]), ObligationDeclaration('ob2', [('pr1', 1)])],
         [AttributeCapsule.from_raw('pr1', [('str', '1'), ('str', '2')])]),
     ])
-def test_whole_data_rule_serialise(obligations, amap):
+@pytest.mark.parametrize('compact', [False, True])
+def test_whole_data_rule_serialise(obligations, amap, compact):
     rule = DataRuleContainer(obligations, amap)
-    s = rule.dump()
+    s = rule.dump(compact=compact)
     print(f"serialised: {s}")
+    if compact:
+        assert '\n' not in s
     rule2 = parser.parse_data_rule(s)
     assert rule2 == rule
 
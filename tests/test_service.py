@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/14 11:20:44
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from draid.jobs import JobSpec
+from draid.service import JobQueue, QueueFullError, make_handler
+
+
+@pytest.mark.parametrize('d, error', [
+    ({'source': 'http://127.0.0.1:3030/prov'}, None),
+    ({'source': 'prov.trig', 'scheme': 'CWLPROV', 'rule_db': 'a.json,b.json'}, None),
+    ({}, '`source` is required'),
+    ({'source': 'x', 'scheme': 'OTHER'}, '`scheme`'),
+    ({'source': 'x', 'jobs': 2}, 'Unknown fields: jobs'),
+    ([], 'JSON object'),
+    ])
+def test_job_spec(d, error):
+    if error:
+        with pytest.raises(ValueError, match=error):
+            JobSpec.from_dict(d)
+    else:
+        spec = JobSpec.from_dict(d)
+        assert spec.source == d['source']
+        assert spec.rule_db in (None, ['a.json', 'b.json'])
+
+
+class RecordingQueue:
+
+    def __init__(self, max_queue):
+        self.max_queue = max_queue
+        self.specs = []
+
+    def submit(self, spec):
+        if len(self.specs) >= self.max_queue:
+            raise QueueFullError()
+        self.specs.append(spec)
+        return str(len(self.specs))
+
+    def describe(self, job_id, with_result=True):
+        if not job_id.isdigit() or int(job_id) > len(self.specs):
+            return None
+        return {'id': job_id, 'status': 'queued', 'spec': self.specs[int(job_id)-1].to_dict()}
+
+    def list(self):
+        return [self.describe(str(i+1)) for i in range(len(self.specs))]
+
+    def status(self):
+        return {'workers': 1, 'max_queue': self.max_queue, 'queued': len(self.specs), 'running': 0}
+
+
+@pytest.fixture
+def server():
+    queue = RecordingQueue(max_queue=1)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(queue))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _request(url, data=None):
+    request = Request(url, data=json.dumps(data).encode('utf-8') if data is not None else None)
+    try:
+        with urlopen(request) as response:
+            return response.status, json.load(response)
+    except HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_api(server):
+    assert _request(server + '/jobs', {'source': 'x', 'scheme': 'OTHER'})[0] == 400
+    status, ret = _request(server + '/jobs', {'source': 'http://127.0.0.1:3030/prov'})
+    assert status == 202
+    assert ret['status'] == 'queued'
+    assert _request(server + '/jobs', {'source': 'http://127.0.0.1:3030/prov'})[0] == 503
+
+    status, job = _request(server + '/jobs/' + ret['id'])
+    assert status == 200
+    assert job['spec']['source'] == 'http://127.0.0.1:3030/prov'
+    assert _request(server + '/jobs/404')[0] == 404
+    assert len(_request(server + '/jobs')[1]) == 1
+    assert _request(server + '/status')[1]['queued'] == 1
+
+
+def test_cancelled_job():
+    queue = JobQueue(workers=1, max_queue=1, keep_finished=1)
+    future = Future()
+    future.cancel()
+    queue._jobs['1'] = {'spec': JobSpec.from_dict({'source': 'x'}), 'submitted': 0, 'future': future}
+    assert queue.describe('1')['status'] == 'cancelled'
+    assert 'error' not in queue.describe('1')
+    queue.shutdown()
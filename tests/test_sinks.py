@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/16 15:48:03
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import gc
+import threading
+import weakref
+
+import pytest
+
+from rdflib import Dataset
+
+from draid import main as draid_main
+from draid import setting
+from draid.graph_wrapper import ComponentAugmentation
+from draid.obligation_store import read_from_store
+from draid.rule import ActivatedObligation
+from draid.rule import parser
+from draid.sinks import ResultSink, default_sinks
+from draid.sparql_helper import SProvHelper
+from draid.worker import GraphResult
+
+from conftest import add_run
+
+
+RUNS = ['run1', 'run2', 'run3']
+
+
+@pytest.fixture
+def prov_file(write_trig):
+    ds = Dataset()
+    for run_id in RUNS:
+        add_run(ds, run_id)
+    return write_trig(ds)
+
+
+@pytest.fixture
+def fake_propagate(monkeypatch, restore_settings):  # `main` changes the settings
+    '''
+    Replaces the reasoning (which needs Prolog): every component outputs a rule on all its output ports, and activates an obligation.
+    '''
+    def propagate(graph, batch):
+        rule = parser.parse_data_rule('begin attribute(name, str "v1"). end')
+        augmentations = [ComponentAugmentation(component, {graph.name_of_port(port): rule for port in graph.output_ports(component)}) for component in batch]
+        return augmentations, {component: [ActivatedObligation('acknowledge', [])] for component in batch}
+
+    monkeypatch.setattr(draid_main.reason, 'propagate', propagate)
+
+
+class ReleaseCheckingSink(ResultSink):
+    '''
+    Checks that the graphs handed to the sinks earlier have been released.
+    '''
+
+    def __init__(self):
+        self.refs = []
+        self.closed = False
+
+    def put(self, index, result, graph):
+        gc.collect()
+        assert all(ref() is None for ref in self.refs)
+        assert result.graph == graph.subgraph
+        self.refs.append(weakref.ref(graph))
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+@pytest.mark.parametrize('obligation_db_name', ['obligation-db.json', 'obligation-db.sqlite'])
+def test_main_streams(prov_file, tmp_path, fake_propagate, monkeypatch, pipeline, obligation_db_name):
+    checker = ReleaseCheckingSink()
+    monkeypatch.setattr(draid_main, 'default_sinks', lambda service, parallel: default_sinks(service, parallel) + [checker])
+    rule_db = tmp_path / 'rule-db.json'
+    obligation_db = tmp_path / obligation_db_name
+
+    results, activated_obligations = draid_main.main(prov_file, 'SPROV', rule_db=[str(rule_db)], db_write_to=True, obligation_db=str(obligation_db), pipeline=pipeline)
+
+    assert checker.closed
+    assert len(checker.refs) == len(RUNS)
+    assert all(isinstance(result, GraphResult) for result in results)
+    assert {str(result.graph) for result in results} == {f'http://example.org/graph/{run_id}' for run_id in RUNS}
+    assert [result.obligations for result in results] == activated_obligations
+
+    assert not rule_db.exists()  # S-Prov rules are on the ports, so there are no data rules to write
+    assert len(read_from_store(str(obligation_db))) == 2 * len(RUNS)
+
+
+def test_pipeline_fetches_ahead(prov_file, fake_propagate, monkeypatch):
+    queried_in = set()
+    get_graph_component = SProvHelper.get_graph_component
+    def recording(self):
+        queried_in.add(threading.current_thread().name)
+        return get_graph_component(self)
+    monkeypatch.setattr(SProvHelper, 'get_graph_component', recording)
+    draid_main.main(prov_file, 'SPROV', pipeline=True)
+    assert queried_in and all(name.startswith('draid-fetch') for name in queried_in)
+
+
+def test_default_sinks(monkeypatch):
+    monkeypatch.setattr(setting, 'DB_WRITE_TO', None)
+    monkeypatch.setattr(setting, 'OBLIGATION_DB', None)
+    monkeypatch.setattr(setting, 'WRITE_BACK', True)
+    monkeypatch.setattr(setting, 'DRAW', False)
+    assert [type(sink).__name__ for sink in default_sinks('http://127.0.0.1:1/sparql')] == ['WriteBackSink']
+    assert default_sinks('http://127.0.0.1:1/sparql', parallel=True) == []
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/12 16:10:05
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import io
+import json
+import pytest
+
+from rdflib import BNode, Dataset, Graph, Literal, URIRef
+from rdflib.compare import isomorphic
+from rdflib.namespace import RDF
+
+from draid import setting
+from draid.defs.namespaces import S_PROV
+from draid.sparql_helper import SProvHelper
+from draid.sparql_helper import query_sprov
+from draid.sparql_helper.local_dataset import is_local, load_dataset
+from draid.sparql_helper.sparql_helper import _chunked, parse_ntriples_stream
+
+from conftest import add_run
+
+
+COMPONENTS = [URIRef(f'http://example.org/component{i}') for i in range(7)]
+
+
+class CannedSProvHelper(SProvHelper):
+    '''
+    Answers every parameter query with one parameter for each component in the query, and records the queries.
+    '''
+
+    def __init__(self):
+        super().__init__('http://127.0.0.1:1/sparql')
+        self.queries = []
+
+    def _q_many(self, queries):
+        self.queries.extend(queries)
+        results = []
+        for query in queries:
+            bindings = []
+            for component in COMPONENTS:
+                if '<{}>'.format(component) in query:
+                    bindings.append({
+                        'component': {'value': str(component)},
+                        'par': {'value': 'par'},
+                        'pred': {'value': 'size'},
+                        'obj': {'value': str(component)[-1]},
+                        })
+            results.append({'results': {'bindings': bindings}})
+        return results
+
+
+@pytest.mark.parametrize('size, expected', [
+    (3, [[0, 1, 2], [3, 4, 5], [6]]),
+    (7, [[0, 1, 2, 3, 4, 5, 6]]),
+    (10, [[0, 1, 2, 3, 4, 5, 6]]),
+    ])
+def test_chunked(size, expected):
+    assert list(_chunked(list(range(7)), size)) == expected
+
+
+def test_values_query():
+    q = query_sprov.F_COMPONENT_PARS_VALUES('http://example.org/graph', COMPONENTS[:2])
+    assert 'VALUES ?component { <http://example.org/component0> <http://example.org/component1> }' in q
+    assert 'FILTER (str(?component) in' not in q
+
+
+@pytest.mark.parametrize('chunk_size, n_queries', [
+    (2, 4),
+    (500, 1),
+    ])
+def test_components_pars_chunked(monkeypatch, chunk_size, n_queries):
+    monkeypatch.setattr(setting, 'COMPONENT_CHUNK_SIZE', chunk_size)
+    helper = CannedSProvHelper()
+    helper.set_graph('http://example.org/graph')
+    info = helper._get_components_pars(COMPONENTS)
+    assert len(helper.queries) == n_queries
+    assert info == {component: {'size': str(component)[-1]} for component in COMPONENTS}
+
+
+NTRIPLES = b'''<http://example.org/a> <http://example.org/p> <http://example.org/b> .
+<http://example.org/a> <http://example.org/name> "n\\u00e4me" .
+_:x <http://example.org/p> <http://example.org/a> .
+'''
+
+
+def test_parse_ntriples_stream():
+    g = parse_ntriples_stream(io.BytesIO(NTRIPLES))
+    assert len(g) == 3
+    assert (URIRef('http://example.org/a'), URIRef('http://example.org/name'), Literal('n\u00e4me')) in g
+    assert any(isinstance(s, BNode) for s in g.subjects())
+
+
+def test_parse_ntriples_stream_into_graph():
+    g = Graph()
+    g.add((URIRef('http://example.org/c'), URIRef('http://example.org/p'), URIRef('http://example.org/d')))
+    ret = parse_ntriples_stream(io.BytesIO(NTRIPLES), g)
+    assert ret is g
+    assert len(g) == 4
+
+
+class DatasetSProvHelper(SProvHelper):
+    '''
+    Answers the queries from a local rdflib Dataset rather than an endpoint, and counts the queries.
+    '''
+
+    def __init__(self, dataset):
+        super().__init__('http://127.0.0.1:1/sparql')
+        self.dataset = dataset
+        self.n_queries = 0
+
+    def _q(self, query):
+        self.n_queries += 1
+        return json.loads(self.dataset.query(query).serialize(format='json'))
+
+    def _q_many(self, queries):
+        return [self._q(query) for query in queries]
+
+    def _construct(self, query):
+        self.n_queries += 1
+        g = Graph()
+        for triple in self.dataset.query(query):
+            g.add(triple)
+        return g
+
+
+@pytest.fixture
+def two_runs():
+    ds = Dataset()
+    runs = dict(add_run(ds, run_id) for run_id in ('run1', 'run2'))
+    return ds, runs
+
+
+def test_prefetch_graphs(two_runs):
+    ds, runs = two_runs
+    helper = DatasetSProvHelper(ds)
+    prefetched = helper.prefetch_graphs(list(runs))
+    n_bulk = helper.n_queries
+    assert set(prefetched) == set(runs)
+    for graph, components in runs.items():
+        helper.set_graph(graph)
+        bulk = prefetched[graph]
+        bulk.set_graph(graph)
+        assert bulk.get_graph_info() == helper.get_graph_info()
+        assert isomorphic(bulk.get_graph_dependency_with_port(), helper.get_graph_dependency_with_port())
+        assert isomorphic(bulk.get_graph_component(), helper.get_graph_component())
+        assert len(bulk.get_graph_component()) == 1
+        assert bulk.get_components_function() == helper.get_components_function()
+        assert sorted(bulk.get_components_info(components), key=str) == sorted(helper.get_components_info(components), key=str)
+    assert n_bulk == 6
+
+
+def test_graphs_summary(two_runs):
+    ds, runs = two_runs
+    augmented = ds.graph(URIRef(setting.AUGMENTED_GRAPH_NAMESPACE + 'run1'))
+    for triple in ds.graph(next(iter(runs))):
+        augmented.add(triple)
+    helper = DatasetSProvHelper(ds)
+    summary = helper.get_graphs_summary()
+    assert helper.n_queries == 2
+    assert set(summary) == set(runs)  # Not the augmented graph
+    for graph in runs:
+        assert summary[graph]['size'] == str(len(ds.graph(graph)))
+        helper.set_graph(graph)
+        assert summary[graph]['startTime'] == helper.get_graph_info()['startTime']
+
+
+def test_graphs_summary_digest(two_runs):
+    ds, runs = two_runs
+    helper = DatasetSProvHelper(ds)
+    before = helper.get_graphs_summary()
+    run1, run2 = runs
+    g = ds.graph(run1)
+    par = URIRef('http://example.org/run1/par')
+    size = URIRef('http://example.org/run1/size')
+    g.set((par, size, Literal('edited')))  # Same number of triples
+    after = helper.get_graphs_summary()
+    assert after[run1]['size'] == before[run1]['size']
+    assert after[run1]['digest'] != before[run1]['digest']
+    assert after[run2] == before[run2]
+
+    reloaded = Dataset()
+    reloaded.parse(data=ds.serialize(format='trig'), format='trig')
+    g.add((BNode(), RDF.type, S_PROV.Data))
+    reloaded.graph(run1).add((BNode(), RDF.type, S_PROV.Data))  # The same triple, with another blank node label
+    assert DatasetSProvHelper(reloaded).get_graphs_summary() == helper.get_graphs_summary()
+
+
+def test_local_file(two_runs, write_trig):
+    ds, runs = two_runs
+    helper = SProvHelper(write_trig(ds))
+    assert set(helper.get_wfe_graphs()) == set(runs)
+    for graph in runs:
+        helper.set_graph(graph)
+        assert len(helper.get_graph_component()) == 1
+        assert helper.get_graph_info()['user'] == 'user'
+
+
+def test_is_local(tmp_path):
+    filename = tmp_path / 'prov.trig'
+    filename.write_text('')
+    assert is_local(str(filename))
+    assert is_local(filename.as_uri())
+    assert not is_local(str(tmp_path / 'missing.trig'))
+    assert not is_local('http://127.0.0.1:3030/prov')
+    assert not is_local('localhost:3030/prov')
+
+
+def test_dynamic_bgp_only_for_local(two_runs, write_trig, monkeypatch):
+    from draid.sparql_helper import local_dataset
+    ds, runs = two_runs
+    filename = write_trig(ds)
+    calls = []
+    eval_bgp = local_dataset._eval_bgp
+    monkeypatch.setattr(local_dataset, '_eval_bgp', lambda ctx, bgp: calls.append(bgp) or eval_bgp(ctx, bgp))
+    query = 'SELECT ?s WHERE { GRAPH ?g { ?s a <http://s-prov/ns/#WFExecution> } }'
+    assert len(load_dataset(filename).query(query)) == 2
+    assert calls
+    calls.clear()
+    assert len(ds.query(query)) == 2
+    assert not calls
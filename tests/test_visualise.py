@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/15 14:37:09
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import pytest
+
+from rdflib import BNode, Literal
+
+from draid import setting
+from draid import visualise as vis
+from draid.graph_wrapper import GraphWrapper
+from draid.rule import ActivatedObligation
+from draid.sparql_helper import SProvHelper
+
+from conftest import EX, GRAPH_ID
+
+
+@pytest.fixture
+def prov_file(sprov_file):
+    return sprov_file('A')
+
+
+def _graph(prov_file):
+    return GraphWrapper.from_sprov(SProvHelper(prov_file), subgraph=GRAPH_ID)
+
+
+def test_graph_fingerprint(prov_file):
+    fp = vis.graph_fingerprint(_graph(prov_file), {}, 'png')
+    assert fp == vis.graph_fingerprint(_graph(prov_file), {}, 'png')
+    assert fp != vis.graph_fingerprint(_graph(prov_file), {}, 'svg')
+    assert fp != vis.graph_fingerprint(_graph(prov_file), {EX.A: [ActivatedObligation('acknowledge', [])]}, 'png')
+
+    graph = _graph(prov_file)
+    graph.set_flow_rules({EX.A: "begin end"})
+    assert fp != vis.graph_fingerprint(graph, {}, 'png')
+
+
+def test_graph_fingerprint_blank_nodes(prov_file):
+    graphs = [_graph(prov_file), _graph(prov_file)]
+    for graph in graphs:
+        node = BNode()  # Another label every time
+        graph.rdf_graph.add((EX.A, EX.note, node))
+        graph.rdf_graph.add((node, EX.text, Literal('note')))
+    assert vis.graph_fingerprint(graphs[0], {}, 'png') == vis.graph_fingerprint(graphs[1], {}, 'png')
+    graphs[1].rdf_graph.set((EX.A, EX.other, Literal('x')))
+    assert vis.graph_fingerprint(graphs[0], {}, 'png') != vis.graph_fingerprint(graphs[1], {}, 'png')
+
+
+def test_renderer_cache_hit(prov_file, tmp_path, monkeypatch):
+    graph = _graph(prov_file)
+    cache_dir = tmp_path / 'cache'
+    renderer = vis.Renderer('svg', jobs=0, cache_dir=str(cache_dir))
+    cached = cache_dir / '{}.svg'.format(vis.graph_fingerprint(graph, {}, 'svg'))
+    cached.write_text('<svg/>')
+
+    def fail(*args):
+        raise AssertionError("The graph should not be laid out again")
+    monkeypatch.setattr(vis, 'render_dot', fail)
+
+    target = tmp_path / 'graph_0.svg'
+    with renderer:
+        renderer.draw(str(target), graph, {})
+    assert target.read_text() == '<svg/>'
+    assert renderer.filename(3) == 'graph_3.svg'
+
+
+def test_renderer_cache_miss(prov_file, tmp_path, monkeypatch):
+    pytest.importorskip('pygraphviz')
+    graph = _graph(prov_file)
+    rendered = []
+    monkeypatch.setattr(vis, 'render_dot', lambda dot, filename, fmt, cache_file: rendered.append((filename, fmt, cache_file)))
+
+    with vis.Renderer('svg', jobs=0, cache_dir=str(tmp_path / 'cache')) as renderer:
+        renderer.draw('graph_0.svg', graph, {})
+    assert len(rendered) == 1
+    assert rendered[0][2].endswith(vis.graph_fingerprint(graph, {}, 'svg') + '.svg')
+
+
+def test_drawing_filename(tmp_path, monkeypatch):
+    monkeypatch.setattr(setting, 'DRAW_DIR', None)
+    assert vis.drawing_filename(3, 'svg') == 'graph_3.svg'
+    monkeypatch.setattr(setting, 'DRAW_DIR', str(tmp_path / 'graphs'))
+    assert vis.Renderer(fmt='svg', jobs=0).filename(3) == str(tmp_path / 'graphs' / 'graph_3.svg')
+    assert (tmp_path / 'graphs').is_dir()
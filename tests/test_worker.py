@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+#   Author  :   renyuneyun
+#   E-mail  :   renyuneyun@gmail.com
+#   Date    :   21/07/13 15:12:09
+#   License :   Apache 2.0 (See LICENSE)
+#
+
+'''
+
+'''
+
+import json
+import pickle
+
+import pytest
+
+from rdflib import URIRef
+
+from draid import setting
+from draid import rule_database_helper as rdbh
+from draid.defs.exception import IllegalStateError
+from draid.rule import ActivatedObligation, Attribute
+from draid.worker import GraphResult, _init_worker, injected_functions, iter_sprov_parallel, settings_snapshot
+
+
+def test_settings_snapshot(monkeypatch):
+    monkeypatch.setattr(setting, 'AIO', True)
+    monkeypatch.setattr(setting, 'INJECTED_DATA_RULE', {None: {URIRef('http://example.org/d'): 'rule'}})
+    snapshot = pickle.loads(pickle.dumps(settings_snapshot()))
+    assert snapshot['AIO'] is True
+    assert '_source_dir' not in snapshot
+
+    monkeypatch.setattr(setting, 'AIO', False)
+    monkeypatch.setattr(setting, 'INJECTED_DATA_RULE', {})
+    _init_worker(snapshot)
+    assert setting.AIO is True
+    assert setting.INJECTED_DATA_RULE == {None: {URIRef('http://example.org/d'): 'rule'}}
+
+
+def test_injected_functions(monkeypatch):
+    monkeypatch.setattr(setting, 'INJECTED_DATA_RULE', {None: {URIRef('http://example.org/d'): 'rule'}})
+    assert injected_functions() == []
+    monkeypatch.setattr(setting, 'INJECTED_IMPORTED_RULE', {None: {'function': {'f': {'port': lambda component_info: 'rule'}}}})
+    assert injected_functions() == ['INJECTED_IMPORTED_RULE']
+    with pytest.raises(IllegalStateError, match='INJECTED_IMPORTED_RULE'):
+        next(iter_sprov_parallel('http://127.0.0.1:1/sparql', 2))
+
+
+def test_graph_result_pickle():
+    component = URIRef('http://example.org/component')
+    result = GraphResult(URIRef('http://example.org/graph'), {'http://example.org/d': 'rule'}, {component: [ActivatedObligation('http://example.org/ob#Ack', [Attribute('a', 'str', 'v')])]})
+    loaded = pickle.loads(pickle.dumps(result))
+    assert loaded.graph == result.graph
+    assert loaded.data_rules == result.data_rules
+    assert loaded.obligations[component][0].name == 'http://example.org/ob#Ack'
+
+
+def test_update_db_with_data_rules(monkeypatch, tmp_path):
+    db = tmp_path / 'rule-db.json'
+    monkeypatch.setattr(setting, 'RULE_DB', [str(db)])
+    monkeypatch.setattr(setting, 'DB_WRITE_TO', True)
+    rdbh.update_db_with_data_rules({'http://example.org/d1': 'rule1'})
+    rdbh.update_db_with_data_rules({'http://example.org/d2': 'rule2'})
+    assert json.loads(db.read_text())['data_rules'][''] == {'http://example.org/d1': 'rule1', 'http://example.org/d2': 'rule2'}